@@ -0,0 +1,3 @@
+"""
+JCR分区表MCP服务器基准测试包
+"""
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+JCR分区表MCP服务器基准测试
+在合成数据库上运行每个工具与数据导入，输出JSON结果并可与历史结果对比
+"""
+
+import argparse
+import asyncio
+import functools
+import http.server
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+REPO_DIR = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(REPO_DIR))
+
+from benchmarks.synthetic import export_table_csv, generate_database  # noqa: E402
+
+# 工具基准场景: 名称 -> (工具名, 参数)
+TOOL_SCENARIOS = {
+    "search_journal": ("search_journal", {"journal_name": "Nature"}),
+    "search_journal_broad": ("search_journal", {"journal_name": "Journal of Applied"}),
+    "search_journal_broad_compact": ("search_journal", {"journal_name": "Journal of Applied",
+                                                        "output_format": "compact"}),
+    "get_partition_trends": ("get_partition_trends", {"journal_name": "Science"}),
+    "check_warning_journals_all": ("check_warning_journals", {}),
+    "check_warning_journals_keyword": ("check_warning_journals", {"keywords": "Journal"}),
+    "check_warning_journals_compact": ("check_warning_journals", {"output_format": "compact", "limit": 1000}),
+    "compare_journals": ("compare_journals", {"journal_list": "Nature,Science,Cell"}),
+    "filter_journals": ("filter_journals", {"partition": "1区", "category": "医学", "limit": 50}),
+    "filter_journals_facets": ("filter_journals", {"partition": "1区", "include_facets": True}),
+    "query_journals": ("query_journals", {"where": "partition<=1 AND quartile=Q1 AND if>5 AND warned=0"}),
+    "rank_journals": ("rank_journals", {"metric": "if", "top_k": 20}),
+    "batch_query_journals": ("batch_query_journals", {"journal_names": "Nature,Science,Cell,PNAS",
+                                                      "output_format": "json"}),
+    "lookup_by_issn": ("lookup_by_issn", {"issns": "1000-0000,1000-0019,5000-0005,0028-0836"}),
+    "suggest_journals": ("suggest_journals", {"prefix": "Journal of Appl"}),
+    "annotate_bibliography": ("annotate_bibliography", {
+        "source": "@article{a, journal={Nature}, issn={0028-0836}}\n@article{b, journal={Science}}"}),
+    "similar_journals": ("similar_journals", {"journal_name": "Nature Communications"}),
+    "journal_movers": ("journal_movers", {"from_year": "2023", "to_year": "2025", "from_partition": 1}),
+    "get_available_categories": ("get_available_categories", {}),
+    "check_data_update": ("check_data_update", {}),
+    "sync_database": ("sync_database", {}),
+}
+
+
+def git_commit() -> Optional[str]:
+    """当前提交号"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """计时统计（毫秒）"""
+    return {
+        "runs": len(samples),
+        "min_ms": min(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "mean_ms": statistics.mean(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+    }
+
+
+async def time_async(fn: Callable[[], Awaitable[Any]], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """对异步调用计时"""
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def time_sync(fn: Callable[[], Any], repeat: int, setup: Callable[[], Any] = None) -> Dict[str, float]:
+    """对同步调用计时，setup在每次计时前执行且不计入耗时"""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def serve_directory(directory: str) -> http.server.ThreadingHTTPServer:
+    """在本地随机端口提供静态文件（模拟远程数据源）"""
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """不输出访问日志的静态文件处理器"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def run_tool_benchmarks(server_module, repeat: int, selected: Optional[List[str]]) -> Dict[str, Dict]:
+    """运行所有工具场景"""
+    results = {}
+    registered = {tool.name for tool in await server_module.app.list_tools()}
+    covered = {tool for tool, _ in TOOL_SCENARIOS.values()}
+    for missing in sorted(registered - covered):
+        print(f"⚠️ 工具 {missing} 缺少基准场景")
+
+    for name, (tool, arguments) in TOOL_SCENARIOS.items():
+        if selected and name not in selected:
+            continue
+        if tool not in registered:
+            continue
+        fn = getattr(server_module, tool)
+        tool_repeat = 1 if tool == "sync_database" else repeat
+        results[name] = await time_async(lambda: fn(**arguments), tool_repeat,
+                                         warmup=0 if tool == "sync_database" else 1)
+        print(f"  {name:<36} median {results[name]['median_ms']:>10.2f} ms")
+    return results
+
+
+def run_import_benchmark(db_path: str, work_dir: str, repeat: int) -> Dict[str, Dict]:
+    """DataSyncer.import_csv_to_db 基准"""
+    from data_sync import DataSyncer
+
+    csv_path = os.path.join(work_dir, "FQBJCR2025.csv")
+    rows = export_table_csv(db_path, "FQBJCR2025", csv_path)
+    import_db = os.path.join(work_dir, "import.db")
+    syncer = DataSyncer(import_db)
+    syncer.create_database_tables()
+
+    stats = time_sync(lambda: syncer.import_csv_to_db(csv_path, "FQBJCR2025"), repeat)
+    stats["rows"] = rows
+    print(f"  {'import_csv_to_db':<36} median {stats['median_ms']:>10.2f} ms（{rows}行）")
+    return {"import_csv_to_db": stats}
+
+
+def run_derived_benchmark(db_path: str, work_dir: str) -> Dict[str, Dict]:
+    """派生表构建基准"""
+    from jcr_index import build_derived_tables
+
+    copy_path = os.path.join(work_dir, "derived.db")
+    shutil.copy2(db_path, copy_path)
+    stats = time_sync(lambda: build_derived_tables(copy_path), 1)
+    print(f"  {'build_derived_tables':<36} median {stats['median_ms']:>10.2f} ms")
+    return {"build_derived_tables": stats}
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """与历史结果对比，返回超过阈值的退化项"""
+    regressions = []
+    print(f"\n📊 与基线对比（{baseline.get('meta', {}).get('commit')} → {current['meta'].get('commit')}）")
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = stats["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = " ❌ 退化"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = " ✅ 提升"
+        print(f"  {name:<36} {base['median_ms']:>10.2f} → {stats['median_ms']:>10.2f} ms ({ratio:.2f}x){flag}")
+    return regressions
+
+
+async def main() -> int:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="JCR分区表MCP服务器基准测试")
+    parser.add_argument("--journals", type=int, default=10_000, help="合成期刊数量（1万到100万）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景的计时次数")
+    parser.add_argument("--seed", type=int, default=2025, help="随机种子")
+    parser.add_argument("--scenario", action="append", help="只运行指定场景（可重复）")
+    parser.add_argument("--output", default="benchmarks/results.json", help="结果JSON路径")
+    parser.add_argument("--compare", help="对比的历史结果JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定退化的相对阈值，默认20%%")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="jcr_bench_")
+    try:
+        # 远程数据源目录：提供jcr.db供 check_data_update / sync_database 使用
+        remote_dir = os.path.join(work_dir, "remote")
+        os.makedirs(remote_dir)
+        source_db = os.path.join(remote_dir, "jcr.db")
+
+        print(f"🧪 生成合成数据库（{args.journals}个期刊）...")
+        start = time.perf_counter()
+        generate_database(source_db, args.journals, args.seed)
+        print(f"   完成，用时 {time.perf_counter() - start:.1f}s")
+
+        results: Dict[str, Dict] = {}
+        results.update(run_derived_benchmark(source_db, work_dir))
+
+        from jcr_index import build_derived_tables
+        build_derived_tables(source_db)
+        db_path = os.path.join(work_dir, "jcr.db")
+        shutil.copy2(source_db, db_path)
+
+        http_server = serve_directory(remote_dir)
+        os.environ["JCR_DB_PATH"] = db_path
+        os.environ["JCR_DB_URL"] = f"http://127.0.0.1:{http_server.server_address[1]}/jcr.db"
+        import jcr_mcp_server
+
+        print("\n⏱️ 工具基准:")
+        try:
+            results.update(await run_tool_benchmarks(jcr_mcp_server, args.repeat, args.scenario))
+        finally:
+            http_server.shutdown()
+
+        print("\n⏱️ 数据导入基准:")
+        results.update(run_import_benchmark(source_db, work_dir, args.repeat))
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now().isoformat(),
+                "journals": args.journals,
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "results": results,
+        }
+
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存: {args.output}")
+
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                baseline = json.load(f)
+            if compare_results(report, baseline, args.threshold):
+                return 1
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
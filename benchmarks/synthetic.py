@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+合成JCR数据库生成器
+按ShowJCR真实列名生成多年份 JCR / FQBJCR / GJQKYJMD / CCF 数据表，规模可配置
+"""
+
+import argparse
+import csv
+import random
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 各数据表的真实列名
+JCR_YEARS = ["2022", "2023", "2024"]
+FQBJCR_YEARS = ["2022", "2023", "2025"]
+GJQKYJMD_YEARS = ["2020", "2021", "2023", "2024", "2025"]
+
+CAS_CATEGORIES = [
+    "计算机科学", "医学", "化学", "物理与天体物理", "生物学", "材料科学", "工程技术", "数学",
+    "环境科学与生态学", "地球科学", "农林科学", "心理学", "社会学", "经济学", "管理学", "综合性期刊",
+]
+JCR_CATEGORIES = [
+    "COMPUTER SCIENCE, ARTIFICIAL INTELLIGENCE(SCIE)", "ONCOLOGY(SCIE)", "CHEMISTRY, MULTIDISCIPLINARY(SCIE)",
+    "PHYSICS, APPLIED(SCIE)", "BIOLOGY(SCIE)", "MATERIALS SCIENCE, MULTIDISCIPLINARY(SCIE)",
+    "ENGINEERING, ELECTRICAL & ELECTRONIC(SCIE)", "MATHEMATICS(SCIE)", "ENVIRONMENTAL SCIENCES(SCIE)",
+    "GEOSCIENCES, MULTIDISCIPLINARY(SCIE)", "PSYCHOLOGY(SSCI)", "ECONOMICS(SSCI)", "MANAGEMENT(SSCI)",
+]
+TITLE_PREFIXES = ["Journal of", "Advances in", "International Journal of", "Annals of", "Reviews in",
+                  "Frontiers in", "Letters in", "Transactions on", "Progress in", "Current Opinion in"]
+TITLE_SUBJECTS = ["Applied Physics", "Machine Learning", "Clinical Oncology", "Organic Chemistry", "Ecology",
+                  "Materials Research", "Signal Processing", "Pure Mathematics", "Cell Biology", "Economics",
+                  "Geophysics", "Neuroscience", "Catalysis", "Robotics", "Public Health", "Management Science"]
+WARNING_LEVELS = ["高", "中", "低"]
+FAMOUS_TITLES = ["Nature", "Science", "Cell", "Nature Communications", "PNAS",
+                 "IEEE Transactions on Pattern Analysis and Machine Intelligence"]
+
+
+def issn_from_number(number: int) -> str:
+    """由序号生成带合法校验位的ISSN"""
+    body = f"{number % 10_000_000:07d}"
+    total = sum(int(digit) * (8 - i) for i, digit in enumerate(body))
+    check = (11 - total % 11) % 11
+    return f"{body[:4]}-{body[4:]}{'X' if check == 10 else check}"
+
+
+def make_journals(count: int, rng: random.Random) -> List[Dict]:
+    """生成期刊主数据"""
+    journals = []
+    for i in range(count):
+        if i < len(FAMOUS_TITLES):
+            title = FAMOUS_TITLES[i]
+        else:
+            title = f"{rng.choice(TITLE_PREFIXES)} {rng.choice(TITLE_SUBJECTS)} {i}"
+        journals.append({
+            "title": title,
+            "issn": issn_from_number(1_000_000 + i),
+            "eissn": issn_from_number(5_000_000 + i),
+            "if": round(rng.lognormvariate(1.0, 0.9), 3),
+            "category": rng.randrange(len(CAS_CATEGORIES)),
+            "jcr_categories": rng.sample(range(len(JCR_CATEGORIES)), rng.choice([1, 1, 1, 2, 3])),
+            "oa": rng.random() < 0.25,
+        })
+    return journals
+
+
+def _partition_for(impact: float) -> int:
+    """按影响因子粗略划分分区"""
+    if impact >= 8:
+        return 1
+    if impact >= 4:
+        return 2
+    if impact >= 2:
+        return 3
+    return 4
+
+
+def generate_database(db_path: str, journals: int = 10_000, seed: int = 2025) -> Dict[str, int]:
+    """生成合成数据库，返回各表记录数"""
+    rng = random.Random(seed)
+    records = make_journals(journals, rng)
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    counts = {}
+    try:
+        for year in JCR_YEARS:
+            table = f"JCR{year}"
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f'CREATE TABLE {table} ("Journal" TEXT, "ISSN" TEXT, "eISSN" TEXT, "Category" TEXT, '
+                         f'"IF({year})" REAL, "IF Quartile({year})" TEXT, "IF Rank({year})" TEXT)')
+            drift = 1 + (int(year) - 2022) * 0.05
+            rows = []
+            for journal in records:
+                impact = round(journal["if"] * drift * rng.uniform(0.85, 1.15), 3)
+                title = journal["title"].upper() if year == "2022" else journal["title"]
+                for category in journal["jcr_categories"]:
+                    quartile = min(4, max(1, _partition_for(impact) + rng.choice([-1, 0, 0, 1])))
+                    rank = rng.randint((quartile - 1) * 50 + 1, quartile * 50)
+                    rows.append((title, journal["issn"], journal["eissn"], JCR_CATEGORIES[category],
+                                 impact, f"Q{quartile}", f"{rank}/200"))
+            conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            counts[table] = len(rows)
+
+        for year in FQBJCR_YEARS:
+            table = f"FQBJCR{year}"
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f'CREATE TABLE {table} ("Journal" TEXT, "ISSN/EISSN" TEXT, "Review" TEXT, '
+                         f'"Open Access" TEXT, "Web of Science" TEXT, "大类" TEXT, "大类分区" TEXT, "Top" TEXT, '
+                         f'"小类1" TEXT, "小类1分区" TEXT)')
+            rows = []
+            for journal in records:
+                partition = min(4, max(1, _partition_for(journal["if"]) + rng.choice([-1, 0, 0, 0, 1])))
+                rows.append((journal["title"], f"{journal['issn']}/{journal['eissn']}",
+                             "是" if rng.random() < 0.05 else None, "是" if journal["oa"] else None, "SCIE",
+                             CAS_CATEGORIES[journal["category"]], f"{partition}区",
+                             "是" if partition == 1 and rng.random() < 0.6 else "否",
+                             JCR_CATEGORIES[journal["jcr_categories"][0]], f"{partition}区"))
+            conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            counts[table] = len(rows)
+
+        warned_count = max(1, journals // 200)
+        for year in GJQKYJMD_YEARS:
+            table = f"GJQKYJMD{year}"
+            level_column = "预警等级" if year < "2024" else "预警原因"
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f'CREATE TABLE {table} ("Journal" TEXT, "{level_column}" TEXT)')
+            warned = rng.sample(records[len(FAMOUS_TITLES):], min(warned_count, journals - len(FAMOUS_TITLES)))
+            rows = [(journal["title"], rng.choice(WARNING_LEVELS)) for journal in warned]
+            conn.executemany(f"INSERT INTO {table} VALUES (?, ?)", rows)
+            counts[table] = len(rows)
+
+        conn.execute("DROP TABLE IF EXISTS CCF2022")
+        conn.execute('CREATE TABLE CCF2022 ("序号" INTEGER, "刊物简称" TEXT, "Journal" TEXT, "出版社" TEXT, '
+                     '"CCF推荐类型" TEXT, "领域" TEXT)')
+        conn.execute("DROP TABLE IF EXISTS CCFT2022")
+        conn.execute('CREATE TABLE CCFT2022 ("Journal" TEXT, "CCFT2022等级" TEXT, "领域" TEXT)')
+        ccf_rows, ccft_rows = [], []
+        for i, journal in enumerate(records[:max(1, journals // 50)], 1):
+            abbreviation = "".join(word[0] for word in journal["title"].split() if word[0].isupper())
+            ccf_rows.append((i, abbreviation, journal["title"], "IEEE", rng.choice("ABC"), "人工智能"))
+            ccft_rows.append((journal["title"], rng.choice(["T1", "T2", "T3"]), "人工智能"))
+        conn.executemany("INSERT INTO CCF2022 VALUES (?, ?, ?, ?, ?, ?)", ccf_rows)
+        conn.executemany("INSERT INTO CCFT2022 VALUES (?, ?, ?)", ccft_rows)
+        counts["CCF2022"] = len(ccf_rows)
+        counts["CCFT2022"] = len(ccft_rows)
+
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+
+def export_table_csv(db_path: str, table: str, csv_path: str, limit: Optional[int] = None) -> int:
+    """把合成表导出为CSV（用于导入基准）"""
+    conn = sqlite3.connect(db_path)
+    try:
+        query = f"SELECT * FROM {table}" + (f" LIMIT {int(limit)}" if limit else "")
+        cursor = conn.execute(query)
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow([description[0] for description in cursor.description])
+            count = 0
+            for row in cursor:
+                writer.writerow(row)
+                count += 1
+    finally:
+        conn.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成JCR数据库")
+    parser.add_argument("output", nargs="?", default="benchmarks/data/jcr.db", help="输出数据库路径")
+    parser.add_argument("--journals", type=int, default=10_000, help="期刊数量（1万到100万）")
+    parser.add_argument("--seed", type=int, default=2025, help="随机种子")
+    args = parser.parse_args()
+
+    for table_name, count in generate_database(args.output, args.journals, args.seed).items():
+        print(f"{table_name}: {count}")
@@ -0,0 +1,398 @@
+"""
+JCR分区表参考文献标注
+流式解析 BibTeX / RIS / CSL-JSON 参考文献列表，按批去重解析期刊并逐条标注
+"""
+
+import json
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 读取文件的块大小
+CHUNK_SIZE = 64 * 1024
+# 每批解析的条目数
+BATCH_SIZE = 500
+# 跨批次缓存的期刊解析结果数量上限
+VENUE_CACHE_SIZE = 20_000
+
+# BibTeX 中表示期刊/会议的字段，按优先级
+BIBTEX_VENUE_FIELDS = ("journal", "journaltitle", "booktitle", "series")
+# RIS 中表示期刊的标签，按优先级
+RIS_VENUE_TAGS = ("JF", "JO", "T2", "JA", "J2", "J1")
+# 非文献条目
+BIBTEX_SKIP_TYPES = {"comment", "string", "preamble"}
+
+_ISSN_PATTERN = re.compile(r"\b(\d{4})-?(\d{3}[\dXx])\b")
+_BIBTEX_FIELD = re.compile(r"\s*,?\s*([A-Za-z][\w:-]*)\s*=\s*")
+_BIBTEX_HEAD = re.compile(r"@\s*(\w+)\s*[{(]\s*([^,\s{}()]*)\s*,?")
+_RIS_LINE = re.compile(r"^([A-Z][A-Z0-9])  -\s?(.*)$")
+
+
+@dataclass
+class BibEntry:
+    """一条参考文献"""
+    key: str
+    title: Optional[str] = None
+    journal: Optional[str] = None
+    issns: List[str] = field(default_factory=list)
+    entry_type: Optional[str] = None
+
+    def venue_key(self) -> Optional[Tuple[Tuple[str, ...], str]]:
+        """期刊去重键：(ISSN, 刊名)，两者都缺失时为None"""
+        journal = " ".join(self.journal.split()) if self.journal else ""
+        if not journal and not self.issns:
+            return None
+        return tuple(sorted(set(self.issns))), journal
+
+
+def extract_issns(value) -> List[str]:
+    """从字段值中提取ISSN（可能包含多个，如 "0028-0836 (Print) 1476-4687 (Linking)"）"""
+    if not value:
+        return []
+    values = value if isinstance(value, list) else [value]
+    issns = []
+    for item in values:
+        for body, tail in _ISSN_PATTERN.findall(str(item)):
+            issns.append(f"{body}-{tail.upper()}")
+    return issns
+
+
+def read_chunks(source: str) -> Iterator[str]:
+    """按块切分文献文本
+
+    source 只作为文本处理，不当作服务器上的文件路径打开：HTTP 传输下任何客户端都能调用工具，
+    读取路径会泄露服务器上的任意文件。
+    """
+    for start in range(0, len(source), CHUNK_SIZE):
+        yield source[start:start + CHUNK_SIZE]
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """把文本块拆成行"""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split("\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def detect_format(head: str) -> str:
+    """根据开头的内容判断格式：bibtex / ris / csl-json"""
+    text = head.lstrip("\ufeff \t\r\n")
+    if text.startswith("[") or text.startswith("{"):
+        return "csl-json"
+    if re.search(r"^TY  -", text, re.MULTILINE):
+        return "ris"
+    if "@" in text:
+        return "bibtex"
+    raise ValueError("无法识别参考文献格式，请指定 format 为 bibtex、ris 或 csl-json")
+
+
+def _clean_bibtex_value(value: str) -> str:
+    """去掉BibTeX值的花括号与LaTeX转义"""
+    value = value.replace("\\&", "&")
+    value = re.sub(r"\\[a-zA-Z]+\s*", "", value)
+    return " ".join(value.replace("{", "").replace("}", "").split())
+
+
+def _parse_bibtex_fields(body: str) -> Dict[str, str]:
+    """解析 `key = {value}` / `key = "value"` / `key = value` 形式的字段"""
+    fields = {}
+    i, length = 0, len(body)
+    while i < length:
+        match = _BIBTEX_FIELD.match(body, i)
+        if not match:
+            break
+        name = match.group(1).lower()
+        i = match.end()
+        if i >= length:
+            break
+        if body[i] == "{":
+            depth, start = 0, i
+            while i < length:
+                if body[i] == "{":
+                    depth += 1
+                elif body[i] == "}":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+            value = body[start + 1:i]
+            i += 1
+        elif body[i] == '"':
+            start = i + 1
+            i = start
+            depth = 0
+            while i < length and not (body[i] == '"' and depth == 0):
+                depth += {"{": 1, "}": -1}.get(body[i], 0)
+                i += 1
+            value = body[start:i]
+            i += 1
+        else:
+            end = body.find(",", i)
+            end = length if end < 0 else end
+            value = body[i:end]
+            i = end
+        fields[name] = _clean_bibtex_value(value)
+    return fields
+
+
+def iter_bibtex(chunks: Iterable[str]) -> Iterator[BibEntry]:
+    """流式解析BibTeX：逐条累积到花括号闭合后解析，内存只保留当前条目"""
+    buffer: List[str] = []
+    depth = 0
+    opened = False
+    in_entry = False
+    for line in iter_lines(chunks):
+        if not in_entry:
+            at = line.find("@")
+            if at < 0:
+                continue
+            line = line[at:]
+            in_entry = True
+            buffer = []
+            depth = 0
+            opened = False
+        buffer.append(line)
+        # 转义的 \{ \} 不计入嵌套深度
+        depth += line.count("{") - line.count("\\{") - line.count("}") + line.count("\\}")
+        opened = opened or "{" in line
+        if depth > 0 or not opened:
+            continue
+
+        in_entry = False
+        text = "\n".join(buffer)
+        match = _BIBTEX_HEAD.match(text)
+        if not match or match.group(1).lower() in BIBTEX_SKIP_TYPES:
+            continue
+        body = text[match.end():text.rfind("}")]
+        fields = _parse_bibtex_fields(body)
+        yield BibEntry(
+            key=match.group(2),
+            title=fields.get("title"),
+            journal=next((fields[f] for f in BIBTEX_VENUE_FIELDS if fields.get(f)), None),
+            issns=extract_issns(fields.get("issn")),
+            entry_type=match.group(1).lower(),
+        )
+
+
+def iter_ris(chunks: Iterable[str]) -> Iterator[BibEntry]:
+    """流式解析RIS：TY开始、ER结束"""
+    tags: Dict[str, List[str]] = {}
+    count = 0
+    for line in iter_lines(chunks):
+        match = _RIS_LINE.match(line.rstrip("\r"))
+        if not match:
+            continue
+        tag, value = match.group(1), match.group(2).strip()
+        if tag == "TY":
+            tags = {"TY": [value]}
+        elif tag == "ER":
+            count += 1
+            yield BibEntry(
+                key=(tags.get("ID") or [str(count)])[0],
+                title=(tags.get("TI") or tags.get("T1") or [None])[0],
+                journal=next((tags[t][0] for t in RIS_VENUE_TAGS if tags.get(t)), None),
+                issns=extract_issns(tags.get("SN")),
+                entry_type=(tags.get("TY") or [None])[0],
+            )
+            tags = {}
+        else:
+            tags.setdefault(tag, []).append(value)
+
+
+def iter_csl_json(chunks: Iterable[str]) -> Iterator[BibEntry]:
+    """流式解析CSL-JSON数组：逐个解码数组元素，不把整个数组读入内存"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    count = 0
+    exhausted = False
+    chunks = iter(chunks)
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,\ufeff")
+        if not started and buffer:
+            if buffer[0] == "[":
+                buffer = buffer[1:]
+            started = True
+            continue
+        if buffer.startswith("]"):
+            return
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise ValueError("CSL-JSON格式错误或内容不完整")
+                item = None
+            if item is not None:
+                buffer = buffer[end:]
+                count += 1
+                if isinstance(item, dict):
+                    yield _csl_entry(item, count)
+                continue
+        if exhausted:
+            return
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+        else:
+            buffer += chunk
+
+
+def _csl_entry(item: Dict, index: int) -> BibEntry:
+    """CSL-JSON条目"""
+    journal = item.get("container-title") or item.get("journalAbbreviation") or item.get("container-title-short")
+    if isinstance(journal, list):
+        journal = journal[0] if journal else None
+    title = item.get("title")
+    if isinstance(title, list):
+        title = title[0] if title else None
+    return BibEntry(
+        key=str(item.get("id") or item.get("citation-key") or index),
+        title=title,
+        journal=journal,
+        issns=extract_issns(item.get("ISSN")),
+        entry_type=item.get("type"),
+    )
+
+
+PARSERS: Dict[str, Callable[[Iterable[str]], Iterator[BibEntry]]] = {
+    "bibtex": iter_bibtex,
+    "ris": iter_ris,
+    "csl-json": iter_csl_json,
+}
+
+
+def iter_entries(source: str, fmt: str = "auto") -> Iterator[BibEntry]:
+    """解析文本中的参考文献，fmt为auto时根据开头内容判断格式"""
+    chunks = read_chunks(source)
+    first = next(chunks, "")
+    fmt = (fmt or "auto").lower().replace("_", "-")
+    if fmt in ("json", "csl"):
+        fmt = "csl-json"
+    if fmt == "auto":
+        fmt = detect_format(first[:4096])
+    if fmt not in PARSERS:
+        raise ValueError(f"不支持的格式: {fmt}，可选 bibtex、ris、csl-json")
+
+    def all_chunks():
+        yield first
+        yield from chunks
+
+    return PARSERS[fmt](all_chunks())
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """按固定大小分批"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+VenueKey = Tuple[Tuple[str, ...], str]
+
+
+def annotate_entries(entries: Iterable[BibEntry],
+                     resolve: Callable[[List[VenueKey]], Dict[VenueKey, Optional[Dict]]],
+                     batch_size: int = BATCH_SIZE,
+                     cache_size: int = VENUE_CACHE_SIZE) -> Iterator[Tuple[BibEntry, Optional[Dict]]]:
+    """逐条标注参考文献
+
+    条目按批读取，每批只解析尚未缓存的不同期刊；解析结果保存在有上限的LRU缓存中，
+    内存占用与参考文献总数无关。无期刊信息的条目标注为None。
+    """
+    cache: "OrderedDict[VenueKey, Optional[Dict]]" = OrderedDict()
+    for batch in batched(entries, batch_size):
+        keys = {entry.venue_key() for entry in batch} - {None}
+        missing = [key for key in keys if key not in cache]
+        if missing:
+            cache.update(resolve(missing))
+        for key in keys:
+            cache.move_to_end(key)
+        while len(cache) > cache_size:
+            cache.popitem(last=False)
+        for entry in batch:
+            key = entry.venue_key()
+            yield entry, (cache.get(key) if key else None)
+
+
+class AnnotationSummary:
+    """标注汇总（计数与少量样例，不保存全部条目）"""
+
+    def __init__(self, max_samples: int = 100):
+        self.max_samples = max_samples
+        self.total = 0
+        self.without_venue = 0
+        self.resolved = 0
+        self.unresolved = 0
+        self.venues: set = set()
+        self.cas_partitions: Dict[str, int] = {}
+        self.jcr_quartiles: Dict[str, int] = {}
+        # 期刊名 -> {预警记录, 条目数, 前几个条目键}
+        self.warned: Dict[str, Dict] = {}
+        self.warned_count = 0
+        self.unresolved_venues: Dict[str, int] = {}
+
+    def add(self, entry: BibEntry, annotation: Optional[Dict]):
+        """计入一条标注结果"""
+        self.total += 1
+        if entry.venue_key() is None:
+            self.without_venue += 1
+            return
+        if not annotation or not annotation.get("found"):
+            self.unresolved += 1
+            name = entry.journal or ", ".join(entry.issns)
+            if name in self.unresolved_venues or len(self.unresolved_venues) < self.max_samples:
+                self.unresolved_venues[name] = self.unresolved_venues.get(name, 0) + 1
+            return
+
+        self.resolved += 1
+        self.venues.add(annotation["journal_id"])
+        if annotation.get("cas_partition"):
+            self.cas_partitions[annotation["cas_partition"]] = self.cas_partitions.get(annotation["cas_partition"], 0) + 1
+        if annotation.get("jcr_quartile"):
+            self.jcr_quartiles[annotation["jcr_quartile"]] = self.jcr_quartiles.get(annotation["jcr_quartile"], 0) + 1
+        if annotation.get("warning"):
+            self.warned_count += 1
+            name = annotation["journal_name"]
+            if name in self.warned:
+                item = self.warned[name]
+                item["entries"] += 1
+                if len(item["keys"]) < 5:
+                    item["keys"].append(entry.key)
+            elif len(self.warned) < self.max_samples:
+                self.warned[name] = {"warning": annotation["warning"], "entries": 1, "keys": [entry.key]}
+
+    def to_dict(self) -> Dict:
+        return {
+            "total_entries": self.total,
+            "entries_without_venue": self.without_venue,
+            "resolved": self.resolved,
+            "unresolved": self.unresolved,
+            "distinct_journals": len(self.venues),
+            "cas_partitions": dict(sorted(self.cas_partitions.items())),
+            "jcr_quartiles": dict(sorted(self.jcr_quartiles.items())),
+            "warned_entries": self.warned_count,
+            "warned": self.warned,
+            "unresolved_venues": self.unresolved_venues,
+        }
+
+
+def annotation_record(entry: BibEntry, annotation: Optional[Dict]) -> Dict:
+    """单条标注的输出记录"""
+    record = {"key": entry.key, "journal": entry.journal, "issns": entry.issns}
+    if annotation:
+        record.update(annotation)
+    else:
+        record["found"] = False
+    return record
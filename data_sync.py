@@ -5,31 +5,256 @@ JCR分区表数据同步脚本
 """
 
 import asyncio
+import argparse
+import hashlib
 import httpx
+import json
+import queue
+import shutil
 import sqlite3
+import sys
 import os
+import tempfile
+import threading
+import time
 import pandas as pd
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 import logging
-from typing import Dict, List, Optional
-from datetime import datetime
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('data_sync.log'),
-        logging.StreamHandler()
-    ]
+from typing import Dict, List, Optional, Tuple
+
+from jcr_http import HttpClient
+from jcr_optimize import DEFAULT_PAGE_SIZE, REPORT_TABLE, optimize_database
+from jcr_index import (
+    DERIVED_TABLES, build_derived_tables, ensure_sync_metadata, find_column, normalize_title, parse_float, read_sync_metadata,
+    write_sync_metadata
 )
+
 logger = logging.getLogger(__name__)
 
+# 命令行退出码
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_FAILED = 2
+
+# CSV可能使用的编码
+CSV_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'utf-8-sig']
+
+# 校验时单表最多抽样的行数（0表示全表）
+VALIDATION_SAMPLE_ROWS = 50_000
+
+# 各数据源的表结构约定：
+# columns: 必需列 -> 候选关键字；unique_title: 期刊名是否应唯一；
+# if_column: 影响因子列；continuity: 是否检查相邻年份期刊的延续性
+SCHEMA_CONTRACTS = {
+    "JCR": {
+        "columns": {"journal": ["Journal"], "if": ["IF(", "IF "], "quartile": ["Quartile"], "category": ["Category"]},
+        "unique_title": False, "if_column": "if", "continuity": True,
+    },
+    "FQBJCR": {
+        "columns": {"journal": ["Journal"], "category": ["大类", "学科", "Subject"], "partition": ["分区", "Partition"]},
+        "unique_title": True, "continuity": True,
+    },
+    "GJQKYJMD": {
+        "columns": {"journal": ["Journal"], "level": ["预警原因", "预警等级", "Warning"]},
+        "unique_title": True,
+    },
+    "CCFT": {"columns": {"journal": ["Journal"]}, "unique_title": True},
+    "CCF": {"columns": {"journal": ["Journal"]}, "unique_title": True},
+}
+
+# 不参与校验的内部表
+INTERNAL_TABLES = {"sync_metadata", REPORT_TABLE}
+
+# 校验阈值
+MAX_NULL_TITLE_RATE = 0.01
+MAX_DUP_TITLE_RATE = 0.05
+MAX_BAD_IF_RATE = 0.01
+IF_RANGE = (0.0, 1000.0)
+MIN_CONTINUITY = 0.5
+
+
+def contract_for(table: str) -> Optional[Tuple[str, Dict]]:
+    """查找数据表对应的表结构约定，返回(数据源, 约定)"""
+    for source, contract in SCHEMA_CONTRACTS.items():
+        if table.startswith(source) and table[len(source):].isdigit():
+            return source, contract
+    return None
+
+
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    """只读连接（校验不会修改数据库，也不会阻塞写入）"""
+    return sqlite3.connect(f"file:{Path(db_path).absolute()}?mode=ro", uri=True, check_same_thread=False)
+
+
+def check_table(db_path: str, table: str, sample_rows: int = VALIDATION_SAMPLE_ROWS) -> Dict:
+    """校验单个数据表，返回统计与问题列表（在线程池中执行，每次使用独立连接）"""
+    result = {"table": table, "issues": [], "warnings": []}
+    conn = connect_readonly(db_path)
+    try:
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        result["rows"] = rows
+        if rows == 0:
+            result["issues"].append("无数据")
+            return result
+
+        found = contract_for(table)
+        if found is None:
+            return result
+        source, contract = found
+        result["source"] = source
+
+        # 表结构约定
+        resolved = {name: find_column(columns, keywords) for name, keywords in contract["columns"].items()}
+        missing = [name for name, column in resolved.items() if column is None]
+        if missing:
+            result["issues"].append(f"缺少必需列: {', '.join(missing)}")
+            return result
+
+        # 大表按rowid等距抽样
+        step = max(1, -(-rows // sample_rows)) if sample_rows else 1
+        where = f"WHERE rowid % {step} = 0" if step > 1 else ""
+        result["sampled"] = step > 1
+
+        journal_column = resolved["journal"]
+        titles = [row[0] for row in conn.execute(f'SELECT "{journal_column}" FROM "{table}" {where}')]
+        checked = len(titles) or 1
+        keys = [normalize_title(t) for t in titles if t is not None and str(t).strip()]
+        result["null_title_rate"] = round(1 - len(keys) / checked, 4)
+        if result["null_title_rate"] > MAX_NULL_TITLE_RATE:
+            result["issues"].append(f"期刊名缺失率 {result['null_title_rate']:.1%}")
+
+        result["dup_title_rate"] = round(1 - len(set(keys)) / (len(keys) or 1), 4)
+        if contract.get("unique_title") and result["dup_title_rate"] > MAX_DUP_TITLE_RATE:
+            result["warnings"].append(f"期刊名重复率 {result['dup_title_rate']:.1%}")
+
+        # 影响因子取值范围
+        if contract.get("if_column"):
+            if_column = resolved[contract["if_column"]]
+            values = [row[0] for row in conn.execute(f'SELECT "{if_column}" FROM "{table}" {where}')]
+            present = [v for v in values if v not in (None, '', 'N/A', 'n/a')]
+            parsed = [parse_float(v) for v in present]
+            bad = sum(1 for v in parsed if v is None or not IF_RANGE[0] <= v <= IF_RANGE[1])
+            result["bad_if_rate"] = round(bad / (len(present) or 1), 4)
+            if result["bad_if_rate"] > MAX_BAD_IF_RATE:
+                result["issues"].append(f"影响因子异常率 {result['bad_if_rate']:.1%}")
+
+        # 相邻年份延续性需要完整的期刊名集合
+        if contract.get("continuity"):
+            result["title_keys"] = {
+                normalize_title(row[0]) for row in
+                conn.execute(f'SELECT DISTINCT "{journal_column}" FROM "{table}" WHERE "{journal_column}" IS NOT NULL')
+            }
+        return result
+    except sqlite3.Error as e:
+        result["issues"].append(f"验证失败: {e}")
+        return result
+    finally:
+        conn.close()
+
+
+def check_continuity(results: List[Dict]) -> List[Dict]:
+    """同一数据源相邻年份的期刊重合度"""
+    by_source: Dict[str, List[Dict]] = {}
+    for result in results:
+        if "title_keys" in result:
+            by_source.setdefault(result["source"], []).append(result)
+
+    checks = []
+    for source, tables in by_source.items():
+        tables.sort(key=lambda r: r["table"])
+        for previous, current in zip(tables, tables[1:]):
+            # 上一年份的期刊在新年份中仍存在的比例
+            overlap = len(previous["title_keys"] & current["title_keys"]) / (len(previous["title_keys"]) or 1)
+            checks.append({"source": source, "from": previous["table"], "to": current["table"],
+                           "overlap": round(overlap, 4), "ok": overlap >= MIN_CONTINUITY})
+    return checks
+
+
+def setup_logging():
+    """配置日志（输出到文件与stderr，stdout留给机器可读结果）"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('data_sync.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+
+def read_csv_file(csv_path: str) -> Tuple[pd.DataFrame, str]:
+    """读取CSV文件（依次尝试多种编码），在进程池中执行"""
+    for encoding in CSV_ENCODINGS:
+        try:
+            return pd.read_csv(csv_path, encoding=encoding), encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"无法识别CSV文件编码: {csv_path}")
+
+
+def file_sha256(path: str) -> str:
+    """计算文件SHA256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TableWriter(threading.Thread):
+    """单写线程：所有数据表由同一连接串行写入，避免多连接争用写锁"""
+
+    def __init__(self, syncer: "DataSyncer"):
+        super().__init__(name="jcr-table-writer", daemon=True)
+        self.syncer = syncer
+        self._queue: "queue.Queue" = queue.Queue()
+
+    def submit(self, table_name: str, df: Optional[pd.DataFrame], **metadata) -> Future:
+        """提交写入任务，返回的Future结果为写入耗时（秒）
+
+        metadata 为写入sync_metadata的校验信息；df为None时只更新sync_metadata（需提供record_count）。
+        """
+        future: Future = Future()
+        self._queue.put((table_name, df, metadata, future))
+        return future
+
+    def close(self):
+        """写完队列中的任务后退出"""
+        self._queue.put(None)
+        self.join()
+
+    def run(self):
+        conn = sqlite3.connect(self.syncer.db_path)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                table_name, df, metadata, future = item
+                start = time.perf_counter()
+                try:
+                    if df is None:
+                        write_sync_metadata(conn, table_name, **metadata)
+                        conn.commit()
+                    else:
+                        self.syncer.write_table(conn, table_name, df, **metadata)
+                    future.set_result(time.perf_counter() - start)
+                except Exception as e:
+                    conn.rollback()
+                    future.set_exception(e)
+        finally:
+            conn.close()
+
+
 class DataSyncer:
     """数据同步器类"""
     
-    def __init__(self, db_path: str = "jcr.db"):
+    def __init__(self, db_path: str = "jcr.db", http: Optional[HttpClient] = None):
         self.db_path = db_path
+        # 所有下载共用一个客户端（连接复用，连接数上限即并发节流）
+        self.http = http or HttpClient()
         self.base_url = "https://raw.githubusercontent.com/hitfyd/ShowJCR/master/"
         self.data_folder = "中科院分区表及JCR原始数据文件"
         
@@ -57,42 +282,48 @@ class DataSyncer:
             "CCFT2022": "计算领域高质量科技期刊分级目录2022.csv"
         }
     
-    async def download_file(self, url: str, local_path: str) -> bool:
-        """下载文件"""
+    async def download_file(self, url: str, local_path: str,
+                            validators: Optional[Dict] = None) -> Optional[Dict[str, any]]:
+        """下载文件
+
+        validators 为上次同步记录的ETag/Last-Modified，传入时发送条件请求，
+        远程未变化（304）时不下载。返回本次响应的校验信息，失败时返回None。
+        """
+        headers = {}
+        if validators and validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators and validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"正在下载: {url}")
-                response = await client.get(url)
-                response.raise_for_status()
-                
-                # 确保目录存在
-                Path(local_path).parent.mkdir(parents=True, exist_ok=True)
-                
-                # 保存文件
-                with open(local_path, 'wb') as f:
-                    f.write(response.content)
-                
-                logger.info(f"文件已保存: {local_path}")
-                return True
+            logger.info(f"正在下载: {url}")
+            
+            # 确保目录存在
+            Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+            
+            # 流式保存文件
+            try:
+                response = await self.http.download(url, local_path, headers=headers)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 304:
+                    raise
+                logger.info(f"远程文件未变化: {url}")
+                return {"not_modified": True, "etag": validators.get("etag"),
+                        "last_modified": validators.get("last_modified")}
+            
+            logger.info(f"文件已保存: {local_path}")
+            return {"not_modified": False, "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified")}
                 
         except Exception as e:
             logger.error(f"下载失败 {url}: {e}")
-            return False
+            return None
     
     def create_database_tables(self):
         """创建数据库表结构"""
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
         # 创建元数据表
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sync_metadata (
-            table_name TEXT PRIMARY KEY,
-            last_updated TEXT,
-            record_count INTEGER,
-            file_hash TEXT
-        )
-        """)
+        ensure_sync_metadata(conn)
         
         conn.commit()
         conn.close()
@@ -107,18 +338,8 @@ class DataSyncer:
             
             # 读取CSV文件
             try:
-                # 尝试不同的编码
-                for encoding in ['utf-8', 'gbk', 'gb2312', 'utf-8-sig']:
-                    try:
-                        df = pd.read_csv(csv_path, encoding=encoding)
-                        logger.info(f"使用编码 {encoding} 成功读取文件")
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                else:
-                    logger.error(f"无法读取CSV文件 {csv_path}")
-                    return False
-                
+                df, encoding = read_csv_file(csv_path)
+                logger.info(f"使用编码 {encoding} 成功读取文件")
             except Exception as e:
                 logger.error(f"读取CSV文件失败 {csv_path}: {e}")
                 return False
@@ -129,81 +350,168 @@ class DataSyncer:
             
             # 连接数据库
             conn = sqlite3.connect(self.db_path)
-            
-            # 删除现有表（如果存在）
-            conn.execute(f"DROP TABLE IF EXISTS {table_name}")
-            
-            # 导入数据
-            df.to_sql(table_name, conn, if_exists='replace', index=False)
-            
-            # 更新元数据
-            current_time = datetime.now().isoformat()
-            record_count = len(df)
-            
-            cursor = conn.cursor()
-            cursor.execute("""
-            INSERT OR REPLACE INTO sync_metadata 
-            (table_name, last_updated, record_count, file_hash)
-            VALUES (?, ?, ?, ?)
-            """, (table_name, current_time, record_count, ""))
-            
-            conn.commit()
-            conn.close()
-            
-            logger.info(f"成功导入 {table_name}: {record_count} 条记录")
+            try:
+                self.write_table(conn, table_name, df)
+            finally:
+                conn.close()
             return True
             
         except Exception as e:
             logger.error(f"导入CSV失败 {csv_path}: {e}")
             return False
     
-    async def sync_all_data(self, force_download: bool = False) -> Dict[str, bool]:
-        """同步所有数据"""
-        results = {}
+    def write_table(self, conn: sqlite3.Connection, table_name: str, df: pd.DataFrame, file_hash: str = "",
+                    etag: Optional[str] = None, last_modified: Optional[str] = None,
+                    source_url: Optional[str] = None):
+        """替换数据表并更新元数据
+
+        数据先写入临时表（to_sql 会自行提交），再在一个显式事务内删除旧表、重命名临时表并写入元数据，
+        中途失败时旧表与元数据保持不变。
+        """
+        staging = f"{table_name}__staging"
+        record_count = len(df)
+        try:
+            # 导入数据
+            df.to_sql(staging, conn, if_exists='replace', index=False, chunksize=10000)
+            
+            conn.execute("BEGIN")
+            conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+            conn.execute(f"ALTER TABLE {staging} RENAME TO {table_name}")
+            # 更新元数据
+            write_sync_metadata(conn, table_name, record_count, file_hash, etag, last_modified, source_url)
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            # 临时表名以数据源前缀开头，不能留在库中被当作数据表
+            conn.execute(f"DROP TABLE IF EXISTS {staging}")
+            raise
+        logger.info(f"成功导入 {table_name}: {record_count} 条记录")
+    
+    def select_sources(self, sources: Optional[List[str]] = None,
+                       years: Optional[List[str]] = None) -> Dict[str, str]:
+        """按数据源前缀（如JCR、FQBJCR2025）与年份筛选数据源"""
+        selected = {}
+        for table_name, filename in self.data_sources.items():
+            prefix = table_name.rstrip('0123456789')
+            if sources and not any(table_name == s or prefix == s for s in sources):
+                continue
+            if years and not any(table_name.endswith(y) for y in years):
+                continue
+            selected[table_name] = filename
+        return selected
+    
+    def stored_metadata(self) -> Dict[str, Dict]:
+        """已导入数据源的同步记录（文件哈希、ETag、Last-Modified）"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                return read_sync_metadata(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return {}
+    
+    async def sync_sources(self, sources: Optional[List[str]] = None, years: Optional[List[str]] = None,
+                           force: bool = False, dry_run: bool = False,
+                           workers: Optional[int] = None) -> Dict[str, Dict]:
+        """同步数据源：并发下载，进程池解析CSV，单写线程批量写入
+
+        返回每个数据源的状态与各阶段耗时。按上次记录的ETag/Last-Modified发送条件请求，
+        远程未变化或文件哈希未变化时跳过导入（force时强制下载并导入）。
+        """
+        selected = self.select_sources(sources, years)
+        report = {
+            name: {"file": filename, "url": f"{self.base_url}{self.data_folder}/{filename}", "status": "pending"}
+            for name, filename in selected.items()
+        }
+        if dry_run:
+            stored = self.stored_metadata()
+            for name, entry in report.items():
+                entry["status"] = "planned"
+                entry["previous_hash"] = stored.get(name, {}).get("file_hash")
+            return report
         
         # 创建数据库表
         self.create_database_tables()
+        stored = self.stored_metadata()
         
         # 创建临时下载目录
-        download_dir = Path("temp_data")
-        download_dir.mkdir(exist_ok=True)
+        download_dir = Path(tempfile.mkdtemp(prefix="jcr_sync_"))
+        logger.info(f"开始同步JCR分区表数据（{len(selected)}个数据源）...")
         
-        logger.info("开始同步JCR分区表数据...")
+        loop = asyncio.get_running_loop()
+        writer = TableWriter(self)
+        writer.start()
         
-        for table_name, filename in self.data_sources.items():
+        async def process(name: str, pool: ProcessPoolExecutor):
+            entry = report[name]
+            local_path = download_dir / entry["file"]
             try:
-                # 构建下载URL
-                url = f"{self.base_url}{self.data_folder}/{filename}"
-                local_path = download_dir / filename
+                start = time.perf_counter()
+                previous = stored.get(name, {})
+                downloaded = await self.download_file(entry["url"], str(local_path),
+                                                      None if force or not previous.get("file_hash") else previous)
+                entry["download_s"] = round(time.perf_counter() - start, 3)
+                if not downloaded:
+                    entry["status"] = "download_failed"
+                    return
+                if downloaded["not_modified"]:
+                    entry["status"] = "unchanged"
+                    return
                 
-                # 下载文件
-                download_success = await self.download_file(url, str(local_path))
+                file_hash = await loop.run_in_executor(None, file_sha256, str(local_path))
+                entry["file_hash"] = file_hash
+                if not force and previous.get("file_hash") == file_hash:
+                    # 内容未变化，只记录新的校验信息，下次即可用条件请求跳过下载
+                    await asyncio.wrap_future(writer.submit(
+                        name, None, record_count=previous.get("record_count"), file_hash=file_hash,
+                        etag=downloaded["etag"], last_modified=downloaded["last_modified"], source_url=entry["url"]
+                    ))
+                    entry["status"] = "unchanged"
+                    return
                 
-                if download_success:
-                    # 导入到数据库
-                    import_success = self.import_csv_to_db(str(local_path), table_name)
-                    results[table_name] = import_success
-                    
-                    # 清理临时文件
-                    if local_path.exists():
-                        os.remove(local_path)
-                        
-                else:
-                    results[table_name] = False
-                    logger.error(f"数据源 {table_name} 同步失败")
+                start = time.perf_counter()
+                df, encoding = await loop.run_in_executor(pool, read_csv_file, str(local_path))
+                entry["parse_s"] = round(time.perf_counter() - start, 3)
+                entry["encoding"] = encoding
+                if df.empty:
+                    entry["status"] = "empty"
+                    return
                 
+                entry["rows"] = len(df)
+                written = writer.submit(name, df, file_hash=file_hash, etag=downloaded["etag"],
+                                        last_modified=downloaded["last_modified"], source_url=entry["url"])
+                entry["write_s"] = round(await asyncio.wrap_future(written), 3)
+                entry["status"] = "imported"
             except Exception as e:
-                logger.error(f"处理数据源 {table_name} 时出错: {e}")
-                results[table_name] = False
+                logger.error(f"处理数据源 {name} 时出错: {e}")
+                entry["status"] = "failed"
+                entry["error"] = str(e)
+        
+        try:
+            async with self.http.hold():
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    await asyncio.gather(*(process(name, pool) for name in selected))
+        finally:
+            writer.close()
+            # 清理临时目录
+            shutil.rmtree(download_dir, ignore_errors=True)
         
-        # 清理临时目录
-        if download_dir.exists():
+        # 构建派生表（分面统计等），再建立索引并整理数据库
+        if any(entry["status"] == "imported" for entry in report.values()):
+            build_derived_tables(self.db_path)
             try:
-                download_dir.rmdir()
-            except:
-                pass
+                optimize_database(self.db_path)
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"数据库优化失败: {e}")
         
-        return results
+        return report
+    
+    async def sync_all_data(self, force_download: bool = False) -> Dict[str, bool]:
+        """同步所有数据"""
+        report = await self.sync_sources(force=force_download)
+        return {name: entry["status"] in ("imported", "unchanged") for name, entry in report.items()}
     
     def get_sync_status(self) -> Dict[str, any]:
         """获取同步状态"""
@@ -211,7 +519,10 @@ class DataSyncer:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute("SELECT * FROM sync_metadata ORDER BY last_updated DESC")
+            cursor.execute("""
+            SELECT table_name, last_updated, record_count, etag, last_modified
+            FROM sync_metadata ORDER BY last_updated DESC
+            """)
             rows = cursor.fetchall()
             
             status = {
@@ -220,11 +531,13 @@ class DataSyncer:
             }
             
             for row in rows:
-                table_name, last_updated, record_count, file_hash = row
+                table_name, last_updated, record_count, etag, last_modified = row
                 status["tables"].append({
                     "name": table_name,
                     "last_updated": last_updated,
-                    "record_count": record_count
+                    "record_count": record_count,
+                    "etag": etag,
+                    "last_modified": last_modified
                 })
             
             conn.close()
@@ -234,58 +547,72 @@ class DataSyncer:
             logger.error(f"获取同步状态失败: {e}")
             return {"total_tables": 0, "tables": []}
     
-    def validate_data_integrity(self) -> Dict[str, any]:
-        """验证数据完整性"""
+    def validate_data_integrity(self, sample_rows: int = VALIDATION_SAMPLE_ROWS,
+                                workers: Optional[int] = None) -> Dict[str, any]:
+        """验证数据完整性
+
+        按表结构约定检查必需列、期刊名缺失/重复率、影响因子取值范围以及相邻年份的延续性。
+        各表在线程池中以只读连接并行检查，大表按 sample_rows 抽样（0表示全表）。
+        issues 非空表示数据不可用，warnings 仅提示。
+        """
+        start = time.perf_counter()
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            conn = connect_readonly(self.db_path)
+            try:
+                tables = [row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+                )]
+            finally:
+                conn.close()
+            tables = [t for t in tables if t not in INTERNAL_TABLES]
             
-            # 获取所有表
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [table[0] for table in cursor.fetchall()]
+            with ThreadPoolExecutor(max_workers=workers or min(8, len(tables) or 1)) as pool:
+                results = list(pool.map(lambda t: check_table(self.db_path, t, sample_rows), tables))
             
             validation_results = {
                 "total_tables": len(tables),
                 "valid_tables": 0,
-                "issues": []
+                "issues": [],
+                "warnings": [],
+                "tables": {},
+                "continuity": check_continuity(results),
             }
             
-            for table in tables:
-                if table == 'sync_metadata':
-                    continue
-                
-                try:
-                    # 检查表结构
-                    cursor.execute(f"PRAGMA table_info({table})")
-                    columns = [col[1] for col in cursor.fetchall()]
-                    
-                    # 检查记录数
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    count = cursor.fetchone()[0]
-                    
-                    if count > 0 and 'Journal' in columns:
-                        validation_results["valid_tables"] += 1
-                    else:
-                        validation_results["issues"].append({
-                            "table": table,
-                            "issue": f"表结构异常或无数据 (记录数: {count})"
-                        })
-                        
-                except Exception as e:
+            for result in results:
+                table = result["table"]
+                validation_results["issues"].extend({"table": table, "issue": issue} for issue in result["issues"])
+                validation_results["warnings"].extend({"table": table, "issue": w} for w in result["warnings"])
+                if not result["issues"]:
+                    validation_results["valid_tables"] += 1
+                result.pop("title_keys", None)
+                validation_results["tables"][table] = result
+            
+            for check in validation_results["continuity"]:
+                if not check["ok"]:
                     validation_results["issues"].append({
-                        "table": table,
-                        "issue": f"验证失败: {e}"
+                        "table": check["to"],
+                        "issue": f"与 {check['from']} 的期刊重合度仅 {check['overlap']:.1%}"
                     })
             
-            conn.close()
+            # 派生表（只检查非空）缺失时服务端的查询、排名与别名解析不可用，提示重建
+            for name in sorted(DERIVED_TABLES - set(tables)):
+                validation_results["warnings"].append({"table": name, "issue": "派生表缺失，请运行 rebuild-indexes"})
+            
+            # 至少要有分区数据表
+            if not any("source" in result for result in results):
+                validation_results["issues"].append({"table": "*", "issue": "未找到任何分区数据表"})
+            
+            validation_results["elapsed_s"] = round(time.perf_counter() - start, 3)
             return validation_results
             
         except Exception as e:
             logger.error(f"数据完整性验证失败: {e}")
-            return {"total_tables": 0, "valid_tables": 0, "issues": [{"table": "unknown", "issue": str(e)}]}
+            return {"total_tables": 0, "valid_tables": 0, "issues": [{"table": "unknown", "issue": str(e)}],
+                    "warnings": []}
 
-async def main():
-    """主函数"""
+
+async def interactive():
+    """交互式菜单"""
     print("🔄 JCR分区表数据同步工具")
     print("=" * 50)
     
@@ -337,6 +664,8 @@ async def main():
                     print(f"  • {issue['table']}: {issue['issue']}")
             else:
                 print("✅ 数据完整性验证通过")
+            for warning in validation.get('warnings', []):
+                print(f"  💡 {warning['table']}: {warning['issue']}")
         
         elif choice == "4":
             print("👋 再见！")
@@ -345,5 +674,139 @@ async def main():
         else:
             print("❌ 无效选择")
 
+
+def _split_list(value: Optional[str]) -> Optional[List[str]]:
+    """解析逗号分隔的参数"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """命令行参数"""
+    parser = argparse.ArgumentParser(description="JCR分区表数据同步工具（无参数时进入交互菜单）")
+    parser.add_argument("--db", default="jcr.db", help="数据库路径，默认jcr.db")
+    parser.add_argument("--json", action="store_true", help="以JSON输出结果（机器可读）")
+    # 子命令也接受 --json；未给出时不覆盖主命令上的取值
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help="以JSON输出结果（机器可读）")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    sync_parser = subparsers.add_parser("sync", parents=[common], help="下载并导入数据源")
+    sync_parser.add_argument("--sources", help="数据源或前缀，逗号分隔，如 JCR,FQBJCR2025,GJQKYJMD")
+    sync_parser.add_argument("--years", help="年份，逗号分隔，如 2024,2025")
+    sync_parser.add_argument("--force", action="store_true", help="文件未变化时也重新导入")
+    sync_parser.add_argument("--dry-run", action="store_true", help="只列出将要同步的数据源")
+    sync_parser.add_argument("--workers", type=int, help="CSV解析进程数，默认为CPU核数")
+    
+    subparsers.add_parser("status", parents=[common], help="查看同步状态")
+    validate_parser = subparsers.add_parser("validate", parents=[common], help="验证数据完整性")
+    validate_parser.add_argument("--sample", type=int, default=VALIDATION_SAMPLE_ROWS,
+                                 help=f"单表最多抽样行数，0为全表，默认{VALIDATION_SAMPLE_ROWS}")
+    validate_parser.add_argument("--workers", type=int, help="并行校验线程数")
+    subparsers.add_parser("rebuild-indexes", parents=[common], help="重建派生表与索引")
+    optimize_parser = subparsers.add_parser("optimize", parents=[common], help="建立数据源表索引、ANALYZE并整理数据库")
+    optimize_parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                                 help=f"整理后的页大小，默认{DEFAULT_PAGE_SIZE}")
+    split_parser = subparsers.add_parser("split", parents=[common], help="导出为分库存储（每个数据源年度一个文件）")
+    split_parser.add_argument("--data-dir", required=True, help="分库目录，即服务端的 JCR_DATA_DIR")
+    return parser
+
+
+def run_command(args: argparse.Namespace) -> Tuple[int, Dict]:
+    """执行子命令，返回(退出码, 结果)"""
+    syncer = DataSyncer(args.db)
+    start = time.perf_counter()
+    
+    if args.command == "sync":
+        report = asyncio.run(syncer.sync_sources(
+            sources=_split_list(args.sources), years=_split_list(args.years),
+            force=args.force, dry_run=args.dry_run, workers=args.workers
+        ))
+        succeeded = [n for n, e in report.items() if e["status"] in ("imported", "unchanged", "planned")]
+        if not report:
+            code = EXIT_FAILED
+        elif len(succeeded) == len(report):
+            code = EXIT_OK
+        else:
+            code = EXIT_PARTIAL if succeeded else EXIT_FAILED
+        result = {"sources": report}
+    elif args.command == "status":
+        code, result = EXIT_OK, syncer.get_sync_status()
+    elif args.command == "validate":
+        result = syncer.validate_data_integrity(sample_rows=args.sample, workers=args.workers)
+        code = EXIT_OK if not result["issues"] else EXIT_PARTIAL
+    elif args.command == "optimize":
+        code, result = EXIT_OK, optimize_database(args.db, args.page_size)
+    elif args.command == "split":
+        from jcr_storage import ShardedStore
+        code, result = EXIT_OK, {"data_dir": args.data_dir,
+                                 "shards": ShardedStore(args.data_dir).import_database(args.db)}
+    else:
+        result = {"derived_tables": build_derived_tables(args.db)}
+        failed = [name for name, count in result["derived_tables"].items() if count < 0]
+        code = EXIT_OK if not failed else EXIT_PARTIAL
+    
+    result = {"command": args.command, "exit_code": code,
+              "elapsed_s": round(time.perf_counter() - start, 3), **result}
+    return code, result
+
+
+def print_result(result: Dict):
+    """以文本形式输出命令结果"""
+    command = result["command"]
+    if command == "sync":
+        print(f"📊 同步完成（用时 {result['elapsed_s']}s）")
+        for name, entry in result["sources"].items():
+            icon = "✅" if entry["status"] in ("imported", "unchanged", "planned") else "❌"
+            timings = " ".join(f"{k}={entry[k]}s" for k in ("download_s", "parse_s", "write_s") if k in entry)
+            rows = f" {entry['rows']}行" if "rows" in entry else ""
+            print(f"  {icon} {name}: {entry['status']}{rows} {timings}".rstrip())
+    elif command == "status":
+        print(f"总表数: {result['total_tables']}")
+        for table_info in result["tables"]:
+            print(f"  📋 {table_info['name']}: {table_info['record_count']} 条记录，最后更新 {table_info['last_updated']}")
+    elif command == "validate":
+        print(f"总表数: {result['total_tables']}，有效表数: {result['valid_tables']}（用时 {result.get('elapsed_s')}s）")
+        for issue in result["issues"]:
+            print(f"  ⚠️ {issue['table']}: {issue['issue']}")
+        for warning in result.get("warnings", []):
+            print(f"  💡 {warning['table']}: {warning['issue']}")
+        for check in result.get("continuity", []):
+            icon = "✅" if check["ok"] else "❌"
+            print(f"  {icon} {check['from']} → {check['to']} 重合度 {check['overlap']:.1%}")
+    elif command == "optimize":
+        print(f"⚙️ 数据库优化完成（用时 {result['elapsed_s']}s）: {result['indexes']} 个索引，页大小 {result['page_size']}，"
+              f"{result['size_before'] / 1024 / 1024:.1f} MB → {result['size_after'] / 1024 / 1024:.1f} MB")
+        for row in result["queries"]:
+            print(f"  {row['table']} {row['query']}: {row['before_ms']}ms → {row['after_ms']}ms（{row['plan_after']}）")
+    elif command == "split":
+        print(f"🗂️ 分库目录: {result['data_dir']}（用时 {result['elapsed_s']}s）")
+        for table, change in sorted(result["shards"].items()):
+            icon = "✅" if change == "unchanged" else "🔄"
+            print(f"  {icon} {table}: {change}")
+    else:
+        for name, count in result["derived_tables"].items():
+            icon = "✅" if count >= 0 else "❌"
+            print(f"  {icon} {name}: {count}")
+
+
+def main() -> int:
+    """主函数"""
+    setup_logging()
+    args = build_parser().parse_args()
+    
+    if args.command is None:
+        asyncio.run(interactive())
+        return EXIT_OK
+    
+    code, result = run_command(args)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_result(result)
+    return code
+
+
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+JCR数据库增量下载（zsync方式）
+远程数据库旁发布一份块校验清单（每块的滚动弱校验与强校验，以及整个文件的SHA256）。
+客户端在本地旧文件上滚动计算弱校验，找出远程各块在本地的位置，只用HTTP Range请求下载
+本地没有的字节区间，在临时文件中重组后校验整个文件的SHA256。
+"""
+
+import argparse
+import asyncio
+import email.utils
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data_sync import file_sha256
+from jcr_http import HttpClient
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = "jcr-delta/1"
+# 清单文件名后缀：jcr.db 的清单为 jcr.db.manifest.json
+MANIFEST_SUFFIX = ".manifest.json"
+# 默认块大小，为SQLite页大小（4096）的整数倍，页内修改不会使相邻块失配
+DEFAULT_BLOCK_SIZE = 32 * 1024
+# 扫描本地文件时每次处理的字节数（滚动校验在该窗口内向量化计算）
+SCAN_CHUNK = 4 * 1024 * 1024
+# 相隔不超过该块数的缺失块合并为一个Range请求
+MERGE_GAP_BLOCKS = 1
+# 单个Range请求的最大字节数（便于并发与失败重试）
+MAX_RANGE_BYTES = 8 * 1024 * 1024
+
+
+class DeltaUnavailable(Exception):
+    """无法增量下载（无清单、服务器不支持Range、重组结果校验失败等），调用方应改为完整下载"""
+
+
+def weak_checksums(data: np.ndarray, block_size: int) -> np.ndarray:
+    """data 中每个长度为 block_size 的窗口的rsync滚动弱校验（a | b << 16）
+
+    a = Σx，b = Σ(block_size - i)·x_i，均取模 2^16。用前缀和一次算出全部窗口，
+    uint32 溢出回绕不影响模 2^16 的结果。
+    """
+    count = len(data) - block_size + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint32)
+    x = data.astype(np.uint32)
+    s1 = np.zeros(len(data) + 1, dtype=np.uint32)
+    np.cumsum(x, out=s1[1:])
+    x *= np.arange(len(data), dtype=np.uint32)
+    s2 = np.zeros(len(data) + 1, dtype=np.uint32)
+    np.cumsum(x, out=s2[1:])
+    a = s1[block_size:] - s1[:count]
+    b = np.arange(block_size, block_size + count, dtype=np.uint32) * a - (s2[block_size:] - s2[:count])
+    return (a & np.uint32(0xFFFF)) | (b << np.uint32(16))
+
+
+def block_checksums(data: np.ndarray, block_size: int) -> np.ndarray:
+    """按块对齐的弱校验（与 weak_checksums 在对齐偏移处的值相同），len(data) 须为块大小的整数倍"""
+    blocks = data.reshape(-1, block_size).astype(np.uint64)
+    a = blocks.sum(axis=1)
+    b = blocks @ np.arange(block_size, 0, -1, dtype=np.uint64)
+    return ((a & np.uint64(0xFFFF)) | ((b & np.uint64(0xFFFF)) << np.uint64(16))).astype(np.uint32)
+
+
+def strong_checksum(block: bytes) -> str:
+    """块的强校验（弱校验命中后确认）"""
+    return hashlib.blake2b(block, digest_size=8).hexdigest()
+
+
+def build_manifest(path: str, block_size: int = DEFAULT_BLOCK_SIZE) -> Dict:
+    """计算文件的块校验清单；末块不足 block_size 时以0填充后计算"""
+    weak: List[int] = []
+    strong: List[str] = []
+    digest = hashlib.sha256()
+    size = 0
+    chunk_blocks = max(SCAN_CHUNK // block_size, 1)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_blocks * block_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            padded = chunk + b"\0" * (-len(chunk) % block_size)
+            weak.extend(block_checksums(np.frombuffer(padded, dtype=np.uint8), block_size).tolist())
+            strong.extend(strong_checksum(padded[i:i + block_size]) for i in range(0, len(padded), block_size))
+    return {
+        "format": MANIFEST_FORMAT,
+        "size": size,
+        "block_size": block_size,
+        "sha256": digest.hexdigest(),
+        "weak": weak,
+        "strong": strong,
+    }
+
+
+def write_manifest(path: str, output: Optional[str] = None, block_size: int = DEFAULT_BLOCK_SIZE) -> str:
+    """生成清单并写到 output（默认与文件同目录），返回清单路径"""
+    output = output or path + MANIFEST_SUFFIX
+    manifest = build_manifest(path, block_size)
+    temp_path = output + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(temp_path, output)
+    return output
+
+
+def check_manifest(manifest: Dict):
+    """校验清单格式，不可用时抛出 DeltaUnavailable"""
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise DeltaUnavailable(f"不支持的清单格式: {manifest.get('format')}")
+    blocks = -(-manifest["size"] // manifest["block_size"])
+    if len(manifest["weak"]) != blocks or len(manifest["strong"]) != blocks:
+        raise DeltaUnavailable("清单块数与文件大小不符")
+
+
+def locate_blocks(local_path: str, manifest: Dict) -> Dict[int, int]:
+    """在本地文件中查找远程各块，返回 {远程块号: 本地偏移}
+
+    对本地文件每个字节偏移计算滚动弱校验（分段向量化），弱校验命中的位置再比对强校验。
+    本地文件末尾视为以0填充，以便匹配远程的末块。
+    """
+    block_size = manifest["block_size"]
+    by_weak: Dict[int, List[int]] = {}
+    for index, weak in enumerate(manifest["weak"]):
+        by_weak.setdefault(weak, []).append(index)
+    remote_weak = np.sort(np.fromiter(by_weak, dtype=np.uint32, count=len(by_weak)))
+    # 弱校验高20位的位图（1MB，可放入CPU缓存），先用它筛掉绝大多数偏移，再对少量候选精确比对
+    prefilter = np.zeros(1 << 20, dtype=bool)
+    prefilter[remote_weak >> 12] = True
+    strong = manifest["strong"]
+
+    found: Dict[int, int] = {}
+    wanted = len(strong)
+    local_size = os.path.getsize(local_path)
+    with open(local_path, 'rb') as f:
+        position = 0
+        while position < local_size and len(found) < wanted:
+            f.seek(position)
+            # 每段多读 block_size - 1 字节，使跨段的窗口也能被计算
+            data = f.read(SCAN_CHUNK + block_size - 1)
+            data += b"\0" * (SCAN_CHUNK + block_size - 1 - len(data))
+            window_count = min(SCAN_CHUNK, local_size - position)
+            weak = weak_checksums(np.frombuffer(data, dtype=np.uint8), block_size)[:window_count]
+            hits = np.flatnonzero(prefilter[weak >> 12])
+            positions = np.searchsorted(remote_weak, weak[hits]).clip(max=len(remote_weak) - 1)
+            for offset in hits[remote_weak[positions] == weak[hits]]:
+                candidates = [i for i in by_weak[int(weak[offset])] if i not in found]
+                if not candidates:
+                    continue
+                checksum = strong_checksum(data[offset:offset + block_size])
+                for index in candidates:
+                    if strong[index] == checksum:
+                        found[index] = position + int(offset)
+            position += SCAN_CHUNK
+    return found
+
+
+def missing_ranges(manifest: Dict, found: Dict[int, int]) -> List[Tuple[int, int]]:
+    """本地缺失的块合并成字节区间 [(起始, 结束)]（含结束字节）"""
+    block_size, size = manifest["block_size"], manifest["size"]
+    max_blocks = max(MAX_RANGE_BYTES // block_size, 1)
+    runs: List[List[int]] = []
+    for index in range(len(manifest["weak"])):
+        if index in found:
+            continue
+        if runs and index - runs[-1][1] <= MERGE_GAP_BLOCKS + 1 and index - runs[-1][0] < max_blocks:
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    return [(first * block_size, min((last + 1) * block_size, size) - 1) for first, last in runs]
+
+
+def write_local_blocks(local_path: str, temp_path: str, manifest: Dict, found: Dict[int, int]) -> int:
+    """把本地已有的块按远程布局写入临时文件，返回复用的字节数"""
+    block_size, size = manifest["block_size"], manifest["size"]
+    reused = 0
+    with open(local_path, 'rb') as src, open(temp_path, 'wb') as dst:
+        dst.truncate(size)
+        for index, offset in sorted(found.items()):
+            length = min(block_size, size - index * block_size)
+            src.seek(offset)
+            block = src.read(length)
+            block += b"\0" * (length - len(block))
+            dst.seek(index * block_size)
+            dst.write(block)
+            reused += length
+    return reused
+
+
+@dataclass
+class DeltaResult:
+    """增量下载结果"""
+    size: int
+    sha256: str
+    reused_bytes: int = 0
+    fetched_bytes: int = 0
+    requests: int = 0
+    unchanged: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    elapsed_s: float = 0.0
+
+    @property
+    def saved_ratio(self) -> float:
+        """相对完整下载节省的传输比例"""
+        return 1 - self.fetched_bytes / self.size if self.size else 1.0
+
+
+async def fetch_manifest(client: HttpClient, manifest_url: str) -> Dict:
+    """下载块校验清单，不存在或格式不对时抛出 DeltaUnavailable"""
+    response = await client.get(manifest_url, budget=60.0)
+    if response.status_code != 200:
+        raise DeltaUnavailable(f"清单不可用，状态码: {response.status_code}")
+    try:
+        manifest = response.json()
+    except ValueError as e:
+        raise DeltaUnavailable(f"清单解析失败: {e}") from e
+    check_manifest(manifest)
+    return manifest
+
+
+async def _fetch_range(client: HttpClient, url: str, start: int, end: int, f) -> Tuple[int, Dict]:
+    """下载一个字节区间并写到临时文件对应位置，返回(字节数, 响应头)"""
+    async with client.stream("GET", url, headers={"Range": f"bytes={start}-{end}"}) as response:
+        if response.status_code != 206:
+            raise DeltaUnavailable(f"服务器不支持Range请求，状态码: {response.status_code}")
+        content_range = response.headers.get("content-range", "")
+        if not content_range.startswith(f"bytes {start}-{end}/"):
+            raise DeltaUnavailable(f"Range响应区间不符: {content_range}")
+        offset = start
+        async for chunk in response.aiter_bytes(1024 * 1024):
+            # seek与write之间没有await，并发的区间写入不会交错
+            f.seek(offset)
+            f.write(chunk)
+            offset += len(chunk)
+        if offset != end + 1:
+            raise DeltaUnavailable(f"区间 {start}-{end} 数据不完整")
+        return offset - start, dict(response.headers)
+
+
+async def delta_download(client: HttpClient, url: str, local_path: str, temp_path: str,
+                         manifest_url: Optional[str] = None, known_sha256: Optional[str] = None,
+                         parallel: int = 4) -> DeltaResult:
+    """以本地文件为基准增量下载远程文件到 temp_path
+
+    清单中的SHA256等于 known_sha256（上次同步记录）时不下载，返回 unchanged=True。
+    重组完成后校验整个文件的SHA256，不一致时删除临时文件并抛出 DeltaUnavailable。
+    """
+    start = time.perf_counter()
+    manifest = await fetch_manifest(client, manifest_url or url + MANIFEST_SUFFIX)
+    if known_sha256 and manifest["sha256"] == known_sha256:
+        return DeltaResult(manifest["size"], manifest["sha256"], unchanged=True,
+                           elapsed_s=time.perf_counter() - start)
+
+    found = await asyncio.to_thread(locate_blocks, local_path, manifest)
+    reused = await asyncio.to_thread(write_local_blocks, local_path, temp_path, manifest, found)
+    ranges = missing_ranges(manifest, found)
+    result = DeltaResult(manifest["size"], manifest["sha256"], reused_bytes=reused, requests=len(ranges))
+
+    try:
+        semaphore = asyncio.Semaphore(parallel)
+
+        async def fetch(span: Tuple[int, int]) -> Tuple[int, Dict]:
+            async with semaphore:
+                return await _fetch_range(client, url, span[0], span[1], f)
+
+        with open(temp_path, 'r+b') as f:
+            fetched = await asyncio.gather(*(fetch(span) for span in ranges))
+        result.fetched_bytes = sum(count for count, _ in fetched)
+        if fetched:
+            headers = fetched[0][1]
+        else:
+            headers = dict((await client.head(url, budget=30.0)).headers)
+        result.etag = headers.get("etag")
+        result.last_modified = headers.get("last-modified")
+
+        sha256 = await asyncio.to_thread(file_sha256, temp_path)
+        if sha256 != manifest["sha256"]:
+            raise DeltaUnavailable("重组文件的SHA256与清单不一致（远程文件可能正在更新）")
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    result.elapsed_s = time.perf_counter() - start
+    logger.info(f"增量下载完成: 复用 {reused} 字节，下载 {result.fetched_bytes} 字节（{len(ranges)} 个区间）")
+    return result
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """支持单区间Range请求的静态文件服务（http.server 默认不支持），用于本地测试增量下载"""
+
+    _range_remaining: Optional[int] = None
+
+    def send_head(self):
+        range_header = self.headers.get("Range")
+        path = self.translate_path(self.path)
+        if not range_header or os.path.isdir(path):
+            return super().send_head()
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        stat = os.fstat(f.fileno())
+        size = stat.st_size
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+        if not match or not (match.group(1) or match.group(2)):
+            f.close()
+            self.send_error(416, "Invalid range")
+            return None
+        if match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        else:
+            start, end = max(size - int(match.group(2)), 0), size - 1
+        if start >= size or start > end:
+            f.close()
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return None
+
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+        self.send_header("ETag", f'"{stat.st_mtime_ns:x}-{size:x}"')
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        f.seek(start)
+        self._range_remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        if self._range_remaining is None:
+            return super().copyfile(source, outputfile)
+        while self._range_remaining > 0:
+            chunk = source.read(min(64 * 1024, self._range_remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            self._range_remaining -= len(chunk)
+
+
+def serve(directory: str, host: str = "127.0.0.1", port: int = 8000):
+    """以支持Range的静态文件服务发布目录（数据库文件与清单）"""
+    handler = functools.partial(RangeRequestHandler, directory=directory)
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"🌐 http://{host}:{server.server_address[1]}/ → {os.path.abspath(directory)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+async def fetch(url: str, local_path: str, output: str, manifest_url: Optional[str] = None) -> DeltaResult:
+    """命令行增量下载：结果写到 output（校验通过后原子替换）"""
+    client = HttpClient()
+    async with client.hold():
+        temp_path = output + ".download"
+        result = await delta_download(client, url, local_path, temp_path, manifest_url)
+        os.replace(temp_path, output)
+        return result
+
+
+def main() -> int:
+    """命令行入口"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="JCR数据库增量下载（块校验清单 + HTTP Range）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    manifest_parser = subparsers.add_parser("manifest", help="为数据库文件生成块校验清单")
+    manifest_parser.add_argument("path", help="数据库文件")
+    manifest_parser.add_argument("-o", "--output", help=f"清单路径，默认为 <文件>{MANIFEST_SUFFIX}")
+    manifest_parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="块大小（字节）")
+
+    serve_parser = subparsers.add_parser("serve", help="以支持Range的HTTP服务发布目录（本地测试）")
+    serve_parser.add_argument("directory", help="发布的目录")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+
+    fetch_parser = subparsers.add_parser("fetch", help="以本地文件为基准增量下载")
+    fetch_parser.add_argument("url", help="远程数据库URL")
+    fetch_parser.add_argument("--local", required=True, help="本地旧文件")
+    fetch_parser.add_argument("-o", "--output", required=True, help="输出文件")
+    fetch_parser.add_argument("--manifest-url", help=f"清单URL，默认为 <URL>{MANIFEST_SUFFIX}")
+
+    args = parser.parse_args()
+    if args.command == "manifest":
+        start = time.perf_counter()
+        output = write_manifest(args.path, args.output, args.block_size)
+        print(f"✅ 清单已写入 {output}（用时 {time.perf_counter() - start:.2f}s）")
+    elif args.command == "serve":
+        serve(args.directory, args.host, args.port)
+    else:
+        try:
+            result = asyncio.run(fetch(args.url, args.local, args.output, args.manifest_url))
+        except DeltaUnavailable as e:
+            print(f"❌ 无法增量下载: {e}")
+            return 1
+        print(f"✅ 增量下载完成（用时 {result.elapsed_s:.2f}s）: 复用 {result.reused_bytes} 字节，"
+              f"下载 {result.fetched_bytes} 字节（{result.requests} 个请求，节省 {result.saved_ratio:.1%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+JCR分区表HTTP客户端
+进程内共享的异步HTTP客户端：连接复用、HTTP/2（安装h2时启用）、失败重试与总超时预算
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 需要重试的响应状态码
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# 默认参数，可通过环境变量调整
+DEFAULT_RETRIES = int(os.environ.get("JCR_HTTP_RETRIES", "3"))
+DEFAULT_BACKOFF = float(os.environ.get("JCR_HTTP_BACKOFF", "0.5"))
+DEFAULT_BUDGET = float(os.environ.get("JCR_HTTP_BUDGET", "300"))
+MAX_CONNECTIONS = int(os.environ.get("JCR_HTTP_MAX_CONNECTIONS", "8"))
+
+
+def http2_available() -> bool:
+    """是否安装了HTTP/2支持（h2）"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class BudgetExceeded(httpx.TimeoutException):
+    """超出调用的总超时预算（含重试与退避等待）"""
+
+
+class HttpClient:
+    """共享的异步HTTP客户端
+
+    首次使用时创建 httpx.AsyncClient，之后复用其连接池（keep-alive，HTTP/2可用时多路复用），
+    连接数上限即并发下载的节流。每次调用有总超时预算，连接错误与可重试状态码按指数退避重试。
+    生命周期通过 hold() 引用计数管理，最后一个持有者退出时关闭连接池。
+    """
+
+    def __init__(self, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 budget: float = DEFAULT_BUDGET, max_connections: int = MAX_CONNECTIONS,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.retries = retries
+        self.backoff = backoff
+        self.budget = budget
+        self.max_connections = max_connections
+        # 可注入 httpx.MockTransport 等，便于对本地模拟服务测试
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._holders = 0
+        self.requests = 0
+        self.retried = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """惰性创建的底层客户端（连接池绑定事件循环，换了事件循环时重新创建）"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                http2=self.transport is None and http2_available(),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                follow_redirects=True,
+                transport=self.transport,
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator["HttpClient"]:
+        """持有客户端；所有持有者退出后关闭连接池"""
+        self._holders += 1
+        try:
+            yield self
+        finally:
+            self._holders -= 1
+            if self._holders == 0:
+                await self.aclose()
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """退避时间：优先使用Retry-After，否则指数退避加随机抖动"""
+        if response is not None:
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, budget: Optional[float] = None,
+                     **kwargs) -> AsyncIterator[httpx.Response]:
+        """发送请求并以流式响应返回，建立响应前的失败按预算重试"""
+        deadline = time.monotonic() + (budget or self.budget)
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise BudgetExceeded(f"请求 {url} 超出总超时预算")
+
+            response = None
+            self.requests += 1
+            try:
+                request = self.client.build_request(method, url, **kwargs)
+                response = await asyncio.wait_for(self.client.send(request, stream=True), remaining)
+                if response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    break
+                await response.aclose()
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise BudgetExceeded(f"请求 {url} 超出总超时预算") from e
+                    raise
+
+            delay = min(self._delay(attempt, response), max(deadline - time.monotonic(), 0))
+            logger.info(f"请求 {url} 失败，{delay:.1f}s 后第 {attempt + 1} 次重试")
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(delay)
+
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def request(self, method: str, url: str, budget: Optional[float] = None, **kwargs) -> httpx.Response:
+        """发送请求并读取完整响应体"""
+        async with self.stream(method, url, budget, **kwargs) as response:
+            await response.aread()
+            return response
+
+    async def get(self, url: str, budget: Optional[float] = None, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, budget, **kwargs)
+
+    async def head(self, url: str, budget: Optional[float] = None, **kwargs) -> httpx.Response:
+        return await self.request("HEAD", url, budget, **kwargs)
+
+    async def download(self, url: str, path: str, budget: Optional[float] = None, **kwargs) -> httpx.Response:
+        """流式下载到文件（不把整个文件读入内存），非2xx响应抛出 httpx.HTTPStatusError，中途失败时不留下残缺文件"""
+        async with self.stream("GET", url, budget, **kwargs) as response:
+            response.raise_for_status()
+            try:
+                with open(path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(1024 * 1024):
+                        f.write(chunk)
+            except BaseException:
+                # 下载中途失败（连接中断、请求被取消）时删除不完整的文件
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                raise
+            return response
+
+    def stats(self) -> dict:
+        """请求统计"""
+        return {
+            "requests": self.requests,
+            "retried": self.retried,
+            "http2": http2_available(),
+            "open": self._client is not None and not self._client.is_closed,
+        }
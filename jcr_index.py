@@ -0,0 +1,921 @@
+#!/usr/bin/env python3
+"""
+JCR分区表索引模块
+基于数据库构建常驻内存的查询索引，供MCP服务器复用
+"""
+
+import re
+import math
+import sqlite3
+import logging
+import heapq
+import unicodedata
+from bisect import bisect_left
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+_TITLE_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_title(name: Optional[str]) -> str:
+    """规范化期刊名称，作为索引键
+
+    统一全半角与大小写，'&' 视为 'and'，标点视为空格，去掉开头的 'The'。
+    """
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKC", str(name)).casefold().replace("&", " and ")
+    text = " ".join(_TITLE_SEPARATORS.sub(" ", text).split())
+    if text.startswith("the "):
+        text = text[4:]
+    return text
+
+
+def find_column(columns: Iterable[str], keywords: Iterable[str]) -> Optional[str]:
+    """按关键字顺序查找列名（不区分大小写）"""
+    columns = list(columns)
+    for keyword in keywords:
+        for column in columns:
+            if keyword.lower() in column.lower():
+                return column
+    return None
+
+
+def list_tables(conn: sqlite3.Connection, prefix: Optional[str] = None) -> List[str]:
+    """列出数据库中的数据表（含ATTACH的分库），可按前缀过滤"""
+    try:
+        cursor = conn.execute("SELECT name FROM pragma_table_list WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+    except sqlite3.OperationalError:
+        # SQLite 3.37 之前没有 pragma_table_list，只能看到主库
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = list(dict.fromkeys(row[0] for row in cursor.fetchall()))
+    if prefix:
+        tables = [t for t in tables if t.startswith(prefix)]
+    return tables
+
+
+class WarningIndex:
+    """国际期刊预警名单索引：按规范化刊名聚合各年份预警等级"""
+
+    TABLE_PREFIX = "GJQKYJMD"
+
+    def __init__(self):
+        # 规范化刊名 -> {年份: 预警等级/原因}
+        self._entries: Dict[str, Dict[str, str]] = {}
+        # 规范化刊名 -> 原始刊名（用于展示）
+        self._titles: Dict[str, str] = {}
+        self._sorted_keys: Optional[List[str]] = None
+        self.years: List[str] = []
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "WarningIndex":
+        """从所有GJQKYJMD表一次性加载预警索引"""
+        index = cls()
+        index.load_tables(conn)
+        return index
+
+    def load_tables(self, conn: sqlite3.Connection):
+        """加载连接中可见的全部GJQKYJMD表（分库模式下按ATTACH分组逐个连接调用）"""
+        for table in sorted(list_tables(conn, self.TABLE_PREFIX), reverse=True):
+            year = table.replace(self.TABLE_PREFIX, '')
+            columns = [col[1] for col in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+            if 'Journal' not in columns:
+                continue
+
+            level_column = find_column(columns, ['预警原因', '预警等级', 'Warning'])
+            level_expr = f'"{level_column}"' if level_column else "NULL"
+            rows = conn.execute(f'SELECT Journal, {level_expr} FROM {table} WHERE Journal IS NOT NULL')
+
+            self.years.append(year)
+            for journal, level in rows:
+                self.add(journal, year, level)
+        self.years.sort(reverse=True)
+
+    def add(self, journal: str, year: str, level: Optional[str] = None):
+        """添加一条预警记录"""
+        key = normalize_title(journal)
+        if not key:
+            return
+        self._titles.setdefault(key, str(journal).strip())
+        self._sorted_keys = None
+        self._entries.setdefault(key, {})[year] = level if level else '未知原因'
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, journal: str) -> bool:
+        return normalize_title(journal) in self._entries
+
+    def is_warned(self, journal: str, year: Optional[str] = None) -> bool:
+        """判断期刊是否在（指定年份或任一年份的）预警名单中"""
+        levels = self._entries.get(normalize_title(journal))
+        if not levels:
+            return False
+        return year is None or year in levels
+
+    def lookup(self, journal: str) -> Dict[str, str]:
+        """返回期刊各年份的预警等级，未预警时返回空字典"""
+        return dict(self._entries.get(normalize_title(journal), {}))
+
+    def probe_many(self, journals: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """批量探测，仅返回在预警名单中的期刊"""
+        hits = {}
+        for journal in journals:
+            levels = self._entries.get(normalize_title(journal))
+            if levels:
+                hits[journal] = dict(levels)
+        return hits
+
+    def search(self, keyword: str) -> List[str]:
+        """按关键词查找预警期刊，精确命中优先，其次为包含匹配"""
+        key = normalize_title(keyword)
+        if not key:
+            return []
+        matches = [key] if key in self._entries else []
+        matches.extend(k for k in self._entries if key in k and k != key)
+        return matches
+
+    def page(self, year: Optional[str] = None, keyword: Optional[str] = None,
+             offset: int = 0, limit: int = 100) -> Tuple[int, List[Tuple[str, Dict[str, str]]]]:
+        """分页列出预警期刊，返回(总数, [(刊名, {年份: 等级})])"""
+        if keyword:
+            keys = self.search(keyword)
+        else:
+            if self._sorted_keys is None:
+                self._sorted_keys = sorted(self._entries)
+            keys = self._sorted_keys
+        if year:
+            keys = [k for k in keys if year in self._entries[k]]
+
+        offset = max(offset, 0)
+        items = [(self._titles[k], dict(self._entries[k])) for k in keys[offset:offset + max(limit, 0)]]
+        return len(keys), items
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """获取表的列名"""
+    return [col[1] for col in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    """判断数据表是否存在（含ATTACH的分库）"""
+    return table in list_tables(conn)
+
+
+# sync_metadata 的列：每个数据源（CSV文件或整个数据库文件）最近一次同步的记录
+SYNC_METADATA_COLUMNS = {
+    "table_name": "TEXT PRIMARY KEY",
+    "last_updated": "TEXT",
+    "record_count": "INTEGER",
+    "file_hash": "TEXT",
+    "etag": "TEXT",
+    "last_modified": "TEXT",
+    "source_url": "TEXT",
+}
+
+
+def ensure_sync_metadata(conn: sqlite3.Connection):
+    """创建同步元数据表，旧版本的表补齐新增列"""
+    columns = ", ".join(f"{name} {kind}" for name, kind in SYNC_METADATA_COLUMNS.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS sync_metadata ({columns})")
+    existing = table_columns(conn, 'sync_metadata')
+    for name, kind in SYNC_METADATA_COLUMNS.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE sync_metadata ADD COLUMN {name} {kind}")
+
+
+def write_sync_metadata(conn: sqlite3.Connection, name: str, record_count: int, file_hash: str = "",
+                        etag: Optional[str] = None, last_modified: Optional[str] = None,
+                        source_url: Optional[str] = None):
+    """记录数据源的同步结果与远程校验信息（ETag/Last-Modified/SHA256）"""
+    ensure_sync_metadata(conn)
+    conn.execute("""
+    INSERT OR REPLACE INTO sync_metadata
+    (table_name, last_updated, record_count, file_hash, etag, last_modified, source_url)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (name, datetime.now().isoformat(), record_count, file_hash, etag, last_modified, source_url))
+
+
+def read_sync_metadata(conn: sqlite3.Connection, name: Optional[str] = None) -> Dict[str, Dict]:
+    """读取同步元数据，返回{数据源: 记录}；表不存在时返回空字典"""
+    if not table_exists(conn, 'sync_metadata'):
+        return {}
+    cursor = conn.execute("SELECT * FROM sync_metadata" + (" WHERE table_name = ?" if name else ""),
+                          (name,) if name else ())
+    columns = [description[0] for description in cursor.description]
+    records = {}
+    for row in cursor:
+        record = dict(zip(columns, row))
+        records[record["table_name"]] = record
+    return records
+
+
+def source_tables(conn: sqlite3.Connection) -> List[Tuple[str, str, str]]:
+    """列出分区数据表，返回[(表名, 数据源, 年份)]，数据源为FQBJCR或JCR"""
+    tables = []
+    for table in list_tables(conn):
+        if table.startswith('FQBJCR'):
+            tables.append((table, 'FQBJCR', table.replace('FQBJCR', '')))
+        elif table.startswith('JCR'):
+            tables.append((table, 'JCR', table.replace('JCR', '')))
+    return sorted(tables)
+
+
+def build_facets(conn: sqlite3.Connection) -> int:
+    """预计算分面统计表：按(数据源, 年份, 学科, 分区, Top, OA)计数"""
+    conn.execute("DROP TABLE IF EXISTS journal_facets")
+    conn.execute("""
+    CREATE TABLE journal_facets (
+        source TEXT,
+        year TEXT,
+        category TEXT,
+        partition TEXT,
+        is_top INTEGER,
+        is_oa INTEGER,
+        journal_count INTEGER
+    )
+    """)
+
+    for table, source, year in source_tables(conn):
+        columns = table_columns(conn, table)
+        if 'Journal' not in columns:
+            continue
+
+        if source == 'FQBJCR':
+            category_column = '大类' if '大类' in columns else find_column(columns, ['学科', 'Subject'])
+            partition_column = '大类分区' if '大类分区' in columns else find_column(columns, ['分区', 'Partition'])
+        else:
+            category_column = find_column(columns, ['Category', '类别'])
+            partition_column = find_column(columns, ['Quartile', '分区'])
+
+        category_expr = f'"{category_column}"' if category_column else "NULL"
+        partition_expr = f'"{partition_column}"' if partition_column else "NULL"
+        top_expr = "CASE WHEN Top = '是' THEN 1 ELSE 0 END" if 'Top' in columns else "NULL"
+        oa_expr = ("CASE WHEN \"Open Access\" IS NOT NULL AND \"Open Access\" != '' THEN 1 ELSE 0 END"
+                   if 'Open Access' in columns else "NULL")
+
+        conn.execute(f"""
+        INSERT INTO journal_facets
+        SELECT ?, ?, {category_expr}, {partition_expr}, {top_expr}, {oa_expr}, COUNT(*)
+        FROM {table}
+        GROUP BY 3, 4, 5, 6
+        """, (source, year))
+
+    conn.execute("CREATE INDEX idx_journal_facets ON journal_facets (source, year)")
+    return conn.execute("SELECT COUNT(*) FROM journal_facets").fetchone()[0]
+
+
+def parse_float(value) -> Optional[float]:
+    """解析数值（影响因子等），无法解析时返回None"""
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+
+
+def parse_partition(value) -> Optional[int]:
+    """解析分区/分区数字：'1区'、'1'、'Q1' -> 1"""
+    if value is None:
+        return None
+    match = re.search(r'[1-4]', str(value))
+    return int(match.group()) if match else None
+
+
+def parse_rank(value) -> Tuple[Optional[int], Optional[int]]:
+    """解析学科排名：'12/200' -> (12, 200)"""
+    match = re.match(r'\s*(\d+)\s*/\s*(\d+)', str(value or ''))
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+def _jcr_edition(conn: sqlite3.Connection, table: str) -> Dict[str, Dict]:
+    """读取一个JCR年度表，按规范化刊名保留最佳分区的一行"""
+    columns = table_columns(conn, table)
+    if_column = find_column(columns, ['IF(', 'IF '])
+    quartile_column = find_column(columns, ['Quartile'])
+    category_column = find_column(columns, ['Category'])
+    rank_column = find_column(columns, ['Rank'])
+    selected = [f'"{col}"' if col else "NULL" for col in (if_column, quartile_column, category_column, rank_column)]
+
+    edition: Dict[str, Dict] = {}
+    for journal, impact, quartile, category, rank in conn.execute(
+            f'SELECT Journal, {", ".join(selected)} FROM {table} WHERE Journal IS NOT NULL'):
+        key = normalize_title(journal)
+        record = {
+            "journal": str(journal).strip(),
+            "jcr_if": parse_float(impact),
+            "jcr_quartile": parse_partition(quartile),
+            "jcr_category": category,
+        }
+        record["jcr_rank"], record["jcr_rank_total"] = parse_rank(rank)
+        current = edition.get(key)
+        if current is None or (record["jcr_quartile"] or 5) < (current["jcr_quartile"] or 5):
+            edition[key] = record
+    return edition
+
+
+def _cas_edition(conn: sqlite3.Connection, table: str) -> Dict[str, Dict]:
+    """读取一个中科院分区年度表，按规范化刊名索引"""
+    columns = table_columns(conn, table)
+    category_column = '大类' if '大类' in columns else find_column(columns, ['学科', 'Subject'])
+    partition_column = '大类分区' if '大类分区' in columns else find_column(columns, ['分区', 'Partition'])
+    selected = [f'"{col}"' if col else "NULL" for col in (category_column, partition_column)]
+    selected.append("Top" if 'Top' in columns else "NULL")
+    has_oa = 'Open Access' in columns
+    selected.append('"Open Access"' if has_oa else "NULL")
+
+    edition: Dict[str, Dict] = {}
+    for journal, category, partition, top, oa in conn.execute(
+            f'SELECT Journal, {", ".join(selected)} FROM {table} WHERE Journal IS NOT NULL'):
+        edition.setdefault(normalize_title(journal), {
+            "journal": str(journal).strip(),
+            "cas_category": category,
+            "cas_partition": parse_partition(partition),
+            "cas_top": None if top is None else int(top == '是'),
+            "cas_oa": int(bool(oa)) if has_oa else None,
+        })
+    return edition
+
+
+# journal_metrics 字段（除主键外）
+METRIC_COLUMNS = [
+    "jcr_year", "jcr_if", "jcr_if_change", "jcr_quartile", "jcr_category", "jcr_rank", "jcr_rank_total",
+    "cas_category", "cas_partition", "cas_top", "cas_oa", "warned",
+]
+
+
+def build_journal_metrics(conn: sqlite3.Connection) -> int:
+    """构建期刊指标宽表：每个(期刊, 年份)一行，合并JCR与中科院分区数据
+
+    年份Y的JCR字段取不晚于Y的最新JCR年度表，中科院字段取FQBJCR{Y}；
+    jcr_if_change 为相对上一JCR年度表的影响因子变化。
+    """
+    conn.execute("DROP TABLE IF EXISTS journal_metrics")
+    conn.execute("""
+    CREATE TABLE journal_metrics (
+        journal TEXT,
+        title_key TEXT,
+        year TEXT,
+        jcr_year TEXT,
+        jcr_if REAL,
+        jcr_if_change REAL,
+        jcr_quartile INTEGER,
+        jcr_category TEXT,
+        jcr_rank INTEGER,
+        jcr_rank_total INTEGER,
+        cas_category TEXT,
+        cas_partition INTEGER,
+        cas_top INTEGER,
+        cas_oa INTEGER,
+        warned INTEGER
+    )
+    """)
+
+    jcr_tables = {year: table for table, source, year in source_tables(conn) if source == 'JCR'}
+    cas_tables = {year: table for table, source, year in source_tables(conn) if source == 'FQBJCR'}
+    warnings = WarningIndex.load(conn)
+
+    jcr_cache: Dict[str, Dict[str, Dict]] = {}
+    rows = []
+    for year in sorted(set(jcr_tables) | set(cas_tables)):
+        jcr_year = max((y for y in jcr_tables if y <= year), default=None)
+        previous_year = max((y for y in jcr_tables if jcr_year and y < jcr_year), default=None)
+        for edition_year in (jcr_year, previous_year):
+            if edition_year and edition_year not in jcr_cache:
+                jcr_cache[edition_year] = _jcr_edition(conn, jcr_tables[edition_year])
+        jcr = jcr_cache.get(jcr_year, {})
+        previous = jcr_cache.get(previous_year, {})
+        cas = _cas_edition(conn, cas_tables[year]) if year in cas_tables else {}
+
+        for key in set(jcr) | set(cas):
+            record = {"jcr_year": jcr_year if key in jcr else None}
+            record.update(jcr.get(key, {}))
+            record.update(cas.get(key, {}))
+            record["warned"] = int(warnings.is_warned(key))
+            previous_if = previous.get(key, {}).get("jcr_if")
+            if record.get("jcr_if") is not None and previous_if is not None:
+                record["jcr_if_change"] = round(record["jcr_if"] - previous_if, 3)
+            rows.append([record["journal"], key, year] + [record.get(col) for col in METRIC_COLUMNS])
+
+    conn.executemany(f"INSERT INTO journal_metrics VALUES ({', '.join('?' * 15)})", rows)
+
+    for column in ["title_key", "year, jcr_if", "year, jcr_if_change", "year, jcr_quartile", "year, jcr_category", "year, jcr_rank",
+                   "year, cas_category", "year, cas_partition", "year, cas_top", "year, cas_oa", "year, warned"]:
+        name = "idx_journal_metrics_" + column.replace("year, ", "")
+        conn.execute(f"CREATE INDEX {name} ON journal_metrics ({column})")
+    conn.execute("ANALYZE journal_metrics")
+    return len(rows)
+
+
+# journal_features 字段：相似期刊推荐使用的指标向量（除刊名键外）
+FEATURE_COLUMNS = [
+    "journal", "year", "cas_category", "jcr_category", "log_if", "if_trend",
+    "jcr_quartile", "cas_partition", "cas_top", "cas_oa", "warned",
+]
+
+
+def build_feature_table(conn: sqlite3.Connection) -> int:
+    """构建期刊特征表：每个期刊一行，合并各年份指标（较新年份的非空值优先）
+
+    log_if 为 ln(1+IF)，if_trend 为相对上一JCR年度的影响因子变化率（截断到±1）。
+    """
+    conn.execute("DROP TABLE IF EXISTS journal_features")
+    conn.execute("""
+    CREATE TABLE journal_features (
+        title_key TEXT PRIMARY KEY,
+        journal TEXT,
+        year TEXT,
+        cas_category TEXT,
+        jcr_category TEXT,
+        log_if REAL,
+        if_trend REAL,
+        jcr_quartile INTEGER,
+        cas_partition INTEGER,
+        cas_top INTEGER,
+        cas_oa INTEGER,
+        warned INTEGER
+    ) WITHOUT ROWID
+    """)
+    if not table_exists(conn, 'journal_metrics'):
+        return 0
+
+    names = ["journal", "year", "cas_category", "jcr_category", "jcr_if", "jcr_if_change",
+             "jcr_quartile", "cas_partition", "cas_top", "cas_oa", "warned"]
+    merged: Dict[str, Dict] = {}
+    for row in conn.execute(f"SELECT title_key, {', '.join(names)} FROM journal_metrics ORDER BY year"):
+        record = merged.setdefault(row[0], {})
+        record.update((name, value) for name, value in zip(names, row[1:]) if value is not None)
+
+    rows = []
+    for key, record in merged.items():
+        impact, change = record.get("jcr_if"), record.get("jcr_if_change")
+        record["log_if"] = math.log1p(impact) if impact is not None and impact >= 0 else None
+        if impact is not None and change is not None and impact - change > 0:
+            record["if_trend"] = max(-1.0, min(1.0, change / (impact - change)))
+        rows.append([key] + [record.get(column) for column in FEATURE_COLUMNS])
+
+    conn.executemany(f"INSERT INTO journal_features VALUES ({', '.join('?' * (len(FEATURE_COLUMNS) + 1))})", rows)
+    return len(rows)
+
+
+def issn_check_digit(body: str) -> str:
+    """计算ISSN校验位（前7位加权求和模11）"""
+    total = sum(int(digit) * (8 - i) for i, digit in enumerate(body))
+    check = (11 - total % 11) % 11
+    return "X" if check == 10 else str(check)
+
+
+def normalize_issn(value) -> Optional[str]:
+    """规范化ISSN：去除连字符与空白，校验位统一大写，格式不符时返回None"""
+    if value is None:
+        return None
+    text = re.sub(r'[^0-9Xx]', '', str(value)).upper()
+    if len(text) != 8 or not text[:7].isdigit():
+        return None
+    return text
+
+
+def issn_is_valid(issn: str) -> bool:
+    """校验位是否正确（issn需已规范化）"""
+    return issn_check_digit(issn[:7]) == issn[7]
+
+
+def _collect_issns(conn: sqlite3.Connection) -> List[Tuple[str, str, str, str]]:
+    """从JCR与中科院分区表收集ISSN，返回[(issn, 类型, 刊名, 规范化刊名)]"""
+    records = {}
+    for table, source, _ in source_tables(conn):
+        columns = table_columns(conn, table)
+        if 'Journal' not in columns:
+            continue
+
+        if source == 'JCR':
+            issn_columns = [(col, 'eissn' if col.lower().startswith('e') else 'issn')
+                            for col in columns if col.lower() in ('issn', 'eissn')]
+        else:
+            combined = find_column(columns, ['ISSN'])
+            issn_columns = [(combined, 'issn/eissn')] if combined else []
+
+        for column, kind in issn_columns:
+            for journal, value in conn.execute(f'SELECT Journal, "{column}" FROM {table} WHERE "{column}" IS NOT NULL'):
+                key = normalize_title(journal)
+                parts = str(value).split('/') if kind == 'issn/eissn' else [value]
+                for i, part in enumerate(parts):
+                    issn = normalize_issn(part)
+                    if issn and key:
+                        part_kind = kind if kind != 'issn/eissn' else ('issn' if i == 0 else 'eissn')
+                        records.setdefault((issn, key), (issn, part_kind, str(journal).strip(), key))
+    return list(records.values())
+
+
+def build_issn_index(conn: sqlite3.Connection) -> int:
+    """构建ISSN/eISSN反查表"""
+    conn.execute("DROP TABLE IF EXISTS journal_issn")
+    conn.execute("""
+    CREATE TABLE journal_issn (
+        issn TEXT,
+        kind TEXT,
+        journal TEXT,
+        title_key TEXT
+    )
+    """)
+    records = _collect_issns(conn)
+    conn.executemany("INSERT INTO journal_issn VALUES (?, ?, ?, ?)", records)
+    conn.execute("CREATE INDEX idx_journal_issn ON journal_issn (issn)")
+    return len(records)
+
+
+class IssnIndex:
+    """ISSN/eISSN 哈希索引：规范化ISSN -> 规范化刊名"""
+
+    def __init__(self):
+        # 规范化ISSN -> {规范化刊名: 刊名}
+        self._by_issn: Dict[str, Dict[str, str]] = {}
+        # ISSN前7位 -> 完整ISSN集合（用于校验位错误时的回退）
+        self._by_body: Dict[str, set] = {}
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "IssnIndex":
+        """加载同步时构建的反查表，未构建时直接扫描源表"""
+        if table_exists(conn, 'journal_issn'):
+            records = conn.execute("SELECT issn, kind, journal, title_key FROM journal_issn").fetchall()
+        else:
+            records = _collect_issns(conn)
+
+        index = cls()
+        for issn, _, journal, key in records:
+            index._by_issn.setdefault(issn, {}).setdefault(key, journal)
+            index._by_body.setdefault(issn[:7], set()).add(issn)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._by_issn)
+
+    def resolve(self, value) -> Tuple[Optional[str], Dict[str, str]]:
+        """解析单个ISSN，返回(规范化ISSN, {规范化刊名: 刊名})"""
+        issn = normalize_issn(value)
+        if issn is None:
+            return None, {}
+        journals = self._by_issn.get(issn)
+        if journals:
+            return issn, journals
+
+        # 校验位不符时按前7位回退
+        if not issn_is_valid(issn):
+            for candidate in self._by_body.get(issn[:7], ()):
+                if issn_is_valid(candidate):
+                    return candidate, self._by_issn[candidate]
+        return issn, {}
+
+    def resolve_many(self, values: Iterable[str]) -> Dict[str, Tuple[Optional[str], Dict[str, str]]]:
+        """批量解析，重复输入只解析一次"""
+        resolved = {}
+        for value in values:
+            if value not in resolved:
+                resolved[value] = self.resolve(value)
+        return resolved
+
+
+def load_latest_profiles(conn: sqlite3.Connection) -> Dict[str, Dict]:
+    """加载每个期刊最新年份的指标（来自journal_metrics），按规范化刊名索引"""
+    if not table_exists(conn, 'journal_metrics'):
+        return {}
+    cursor = conn.execute("SELECT * FROM journal_metrics ORDER BY year")
+    columns = [description[0] for description in cursor.description]
+    profiles: Dict[str, Dict] = {}
+    for row in cursor:
+        record = dict(zip(columns, row))
+        profiles[record["title_key"]] = record
+    return profiles
+
+
+# 含期刊名的原始数据表前缀
+TITLE_TABLE_PREFIXES = ('FQBJCR', 'JCR', 'GJQKYJMD', 'CCFT', 'CCF')
+
+
+def _title_tables(conn: sqlite3.Connection) -> List[Tuple[str, str]]:
+    """列出含Journal列的原始数据表，返回[(表名, 年份)]"""
+    tables = []
+    for table in list_tables(conn):
+        prefix = next((p for p in TITLE_TABLE_PREFIXES if table.startswith(p)), None)
+        if prefix and table[len(prefix):].isdigit() and 'Journal' in table_columns(conn, table):
+            tables.append((table, table[len(prefix):]))
+    return sorted(tables, key=lambda item: (item[1], item[0]))
+
+
+def _collect_aliases(conn: sqlite3.Connection) -> Tuple[Dict[str, int], Dict[int, str], List[Tuple[str, int, str, str]]]:
+    """归并期刊别名并分配规范期刊ID
+
+    规范化刊名相同视为同一期刊；不同刊名共享ISSN时（如期刊更名）也合并。
+    返回(规范化刊名 -> ID, ID -> 规范刊名, [(别名键, ID, 别名, 类型)])，规范刊名取最新年份的写法。
+    """
+    parent: Dict[str, str] = {}
+
+    def find(key: str) -> str:
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    latest: Dict[str, str] = {}
+    # 规范化刊名 -> 最后出现的位置（表按年份升序遍历，越大越新）
+    last_seen: Dict[str, int] = {}
+    variants: Dict[str, set] = {}
+    abbreviations: List[Tuple[str, str]] = []
+    position = 0
+    for table, _ in _title_tables(conn):
+        columns = table_columns(conn, table)
+        abbreviation_column = find_column(columns, ['Abbreviation', 'Abbr', '简称'])
+        abbreviation_expr = f'"{abbreviation_column}"' if abbreviation_column else "NULL"
+        for journal, abbreviation in conn.execute(
+            f'SELECT Journal, {abbreviation_expr} FROM {table} WHERE Journal IS NOT NULL'
+        ):
+            key = normalize_title(journal)
+            if not key:
+                continue
+            position += 1
+            parent.setdefault(key, key)
+            latest[key] = str(journal).strip()
+            last_seen[key] = position
+            variants.setdefault(key, set()).add(latest[key])
+            if abbreviation:
+                abbreviations.append((key, str(abbreviation).strip()))
+
+    # 共享ISSN的不同刊名合并为同一期刊
+    by_issn: Dict[str, str] = {}
+    for issn, _, _, key in _collect_issns(conn):
+        if key not in parent:
+            continue
+        root, other = find(by_issn.setdefault(issn, key)), find(key)
+        if root != other:
+            parent[other] = root
+
+    groups: Dict[str, List[str]] = {}
+    for key in parent:
+        groups.setdefault(find(key), []).append(key)
+
+    ids: Dict[str, int] = {}
+    canonical: Dict[int, str] = {}
+    for journal_id, root in enumerate(sorted(groups), 1):
+        members = groups[root]
+        canonical[journal_id] = latest[max(members, key=last_seen.__getitem__)]
+        for key in members:
+            ids[key] = journal_id
+
+    records = [(key, ids[key], variant, 'title') for key in ids for variant in sorted(variants[key])]
+    for key, abbreviation in abbreviations:
+        alias_key = normalize_title(abbreviation)
+        if alias_key and alias_key not in ids:
+            ids[alias_key] = ids[key]
+            records.append((alias_key, ids[key], abbreviation, 'abbreviation'))
+    return ids, canonical, records
+
+
+def build_alias_table(conn: sqlite3.Connection) -> int:
+    """构建期刊别名表(journal_alias)与规范期刊表(journal_canonical)"""
+    conn.execute("DROP TABLE IF EXISTS journal_alias")
+    conn.execute("DROP TABLE IF EXISTS journal_canonical")
+    conn.execute("""
+    CREATE TABLE journal_alias (
+        alias_key TEXT,
+        journal_id INTEGER,
+        alias TEXT,
+        kind TEXT,
+        PRIMARY KEY (alias_key, alias)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("""
+    CREATE TABLE journal_canonical (
+        journal_id INTEGER PRIMARY KEY,
+        title TEXT,
+        title_key TEXT
+    )
+    """)
+    _, canonical, records = _collect_aliases(conn)
+    conn.executemany("INSERT OR IGNORE INTO journal_alias VALUES (?, ?, ?, ?)", records)
+    conn.executemany("INSERT INTO journal_canonical VALUES (?, ?, ?)",
+                     [(journal_id, title, normalize_title(title)) for journal_id, title in canonical.items()])
+    conn.execute("CREATE INDEX idx_journal_alias_id ON journal_alias (journal_id)")
+    return len(records)
+
+
+class AliasIndex:
+    """期刊别名哈希索引：任一写法/缩写 -> 规范期刊ID"""
+
+    def __init__(self):
+        # 别名键 -> 期刊ID
+        self._ids: Dict[str, int] = {}
+        # 期刊ID -> 规范刊名
+        self._canonical: Dict[int, str] = {}
+        # 期刊ID -> 原始刊名写法（用于精确查询原始数据表）
+        self._titles: Dict[int, List[str]] = {}
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "AliasIndex":
+        """加载同步时构建的别名表，未构建时直接扫描源表"""
+        index = cls()
+        if table_exists(conn, 'journal_alias') and table_exists(conn, 'journal_canonical'):
+            records = conn.execute("SELECT alias_key, journal_id, alias, kind FROM journal_alias").fetchall()
+            index._canonical = dict(conn.execute("SELECT journal_id, title FROM journal_canonical"))
+        else:
+            _, index._canonical, records = _collect_aliases(conn)
+
+        for alias_key, journal_id, alias, kind in records:
+            index._ids.setdefault(alias_key, journal_id)
+            if kind == 'title':
+                index._titles.setdefault(journal_id, []).append(alias)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._canonical)
+
+    def resolve(self, name: str) -> Optional[int]:
+        """按规范化刊名精确查找期刊ID"""
+        return self._ids.get(normalize_title(name))
+
+    def resolve_key(self, key: str) -> Optional[int]:
+        """按已规范化的刊名键查找期刊ID"""
+        return self._ids.get(key)
+
+    def canonical(self, journal_id: int) -> Optional[str]:
+        """规范刊名"""
+        return self._canonical.get(journal_id)
+
+    def titles(self, journal_id: int) -> List[str]:
+        """期刊在各数据源/年份中出现过的全部原始写法"""
+        return list(self._titles.get(journal_id, []))
+
+    def canonical_name(self, name: str) -> str:
+        """返回刊名对应的规范刊名，未收录时返回原刊名"""
+        journal_id = self.resolve(name)
+        return self._canonical.get(journal_id, name) if journal_id is not None else name
+
+    def items(self) -> Iterable[Tuple[str, int]]:
+        """全部(别名键, 期刊ID)"""
+        return self._ids.items()
+
+
+class TitleSuggester:
+    """刊名前缀补全：全部规范化刊名与缩写构成的排序数组，二分定位后按影响因子取Top-N"""
+
+    def __init__(self, entries: Iterable[Tuple[str, int]], canonical: Dict[int, str], scores: Dict[int, float]):
+        entries = sorted(entries)
+        self._keys = [key for key, _ in entries]
+        self._ids = [journal_id for _, journal_id in entries]
+        self._canonical = canonical
+        self._scores = scores
+
+    @classmethod
+    def build(cls, aliases: AliasIndex, profiles: Dict[str, Dict]) -> "TitleSuggester":
+        """由别名索引与最新指标构建，影响因子取期刊各写法中的最大值"""
+        scores: Dict[int, float] = {}
+        for key, profile in profiles.items():
+            journal_id = aliases.resolve(key)
+            if journal_id is not None and profile.get("jcr_if") is not None:
+                scores[journal_id] = max(scores.get(journal_id, 0.0), profile["jcr_if"])
+        canonical = {journal_id: aliases.canonical(journal_id) for _, journal_id in aliases.items()}
+        return cls(aliases.items(), canonical, scores)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _tokens_match(query_tokens: List[str], key: str) -> bool:
+        """查询词依次是刊名中某些词的前缀（允许跳过中间的词，如 'ieee trans pat'）"""
+        title_tokens = key.split()
+        position = 1
+        for token in query_tokens:
+            while position < len(title_tokens) and not title_tokens[position].startswith(token):
+                position += 1
+            if position >= len(title_tokens):
+                return False
+            position += 1
+        return True
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[int, str, Optional[float]]]:
+        """返回补全结果[(期刊ID, 规范刊名, 影响因子)]，完全匹配优先，其余按影响因子降序"""
+        tokens = normalize_title(prefix).split()
+        if not tokens or limit <= 0:
+            return []
+        head, rest = tokens[0], tokens[1:]
+        start = bisect_left(self._keys, head)
+        end = bisect_left(self._keys, head + "\U0010ffff", start)
+
+        query_key = " ".join(tokens)
+        matched: Dict[int, bool] = {}
+        for i in range(start, end):
+            key = self._keys[i]
+            if rest and not key.startswith(query_key) and not self._tokens_match(rest, key):
+                continue
+            journal_id = self._ids[i]
+            matched[journal_id] = matched.get(journal_id, False) or key == query_key
+
+        best = heapq.nsmallest(limit, matched.items(), key=lambda item: (
+            not item[1], -self._scores.get(item[0], -1.0), self._canonical.get(item[0]) or ""
+        ))
+        return [(journal_id, self._canonical.get(journal_id), self._scores.get(journal_id))
+                for journal_id, _ in best]
+
+
+# 同步后需要重建的派生表: (表名, 构建函数)
+DERIVED_BUILDERS: List[Tuple[str, Callable[[sqlite3.Connection], int]]] = [
+    ("journal_facets", build_facets),
+    ("journal_metrics", build_journal_metrics),
+    ("journal_features", build_feature_table),
+    ("journal_issn", build_issn_index),
+    ("journal_alias", build_alias_table),
+]
+
+# 全部派生表：各构建函数的主表，以及别名表附带生成的规范刊名表
+DERIVED_TABLES = {name for name, _ in DERIVED_BUILDERS} | {"journal_canonical"}
+
+
+def build_derived_tables(db_path: str) -> Dict[str, int]:
+    """在数据同步完成后构建全部派生表，返回各表记录数"""
+    results = {}
+    conn = sqlite3.connect(db_path)
+    try:
+        for name, builder in DERIVED_BUILDERS:
+            try:
+                results[name] = builder(conn)
+                conn.commit()
+                logger.info(f"派生表 {name} 已构建: {results[name]} 条记录")
+            except sqlite3.Error as e:
+                conn.rollback()
+                logger.error(f"构建派生表 {name} 失败: {e}")
+                results[name] = -1
+    finally:
+        conn.close()
+    return results
+
+
+class FacetTable:
+    """分面统计的内存副本，用于学科列表与筛选计数"""
+
+    def __init__(self, rows: Optional[List[Tuple]] = None):
+        # (source, year, category, partition, is_top, is_oa, journal_count)
+        self.rows = rows or []
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "FacetTable":
+        """加载分面表，未构建时返回空表"""
+        if not table_exists(conn, 'journal_facets'):
+            return cls()
+        return cls(conn.execute("SELECT * FROM journal_facets").fetchall())
+
+    def __bool__(self) -> bool:
+        return bool(self.rows)
+
+    def categories(self, source: str, year: str) -> List[Tuple[str, int]]:
+        """返回指定数据源与年份的学科及期刊数量"""
+        counts: Dict[str, int] = {}
+        for row_source, row_year, category, _, _, _, count in self.rows:
+            if row_source == source and row_year == year and category is not None:
+                counts[category] = counts.get(category, 0) + count
+        return sorted(counts.items())
+
+    def counts(self, source: str, year: str, category: Optional[str] = None,
+               partition: Optional[str] = None, is_top: Optional[bool] = None,
+               is_oa: Optional[bool] = None) -> Dict[str, Dict]:
+        """按筛选条件汇总分区/Top/OA计数，学科与分区为包含匹配（同LIKE）"""
+        facets = {"total": 0, "partition": {}, "top": {}, "oa": {}}
+        for row_source, row_year, row_category, row_partition, top, oa, count in self.rows:
+            if row_source != source or row_year != year:
+                continue
+            if category and (row_category is None or category.casefold() not in str(row_category).casefold()):
+                continue
+            if partition and (row_partition is None or partition.casefold() not in str(row_partition).casefold()):
+                continue
+            if is_top is not None and top is not None and bool(top) != is_top:
+                continue
+            if is_oa is not None and oa is not None and bool(oa) != is_oa:
+                continue
+            add_facet_count(facets, row_partition, top, oa, count)
+        return facets
+
+
+def add_facet_count(facets: Dict[str, Dict], partition, top, oa, count: int):
+    """累加一组分面计数"""
+    facets["total"] += count
+    partition_key = str(partition) if partition is not None else "未知"
+    facets["partition"][partition_key] = facets["partition"].get(partition_key, 0) + count
+    if top is not None:
+        top_key = "是" if top else "否"
+        facets["top"][top_key] = facets["top"].get(top_key, 0) + count
+    if oa is not None:
+        oa_key = "是" if oa else "否"
+        facets["oa"][oa_key] = facets["oa"].get(oa_key, 0) + count
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    target = sys.argv[1] if len(sys.argv) > 1 else "jcr.db"
+    for table_name, count in build_derived_tables(target).items():
+        print(f"{table_name}: {count}")
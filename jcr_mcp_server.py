@@ -2,18 +2,83 @@ import asyncio
 import sqlite3
 import os
 import json
-from typing import Optional, Dict, List, Any
+import re
+import string
+import threading
+import functools
+import time
+from typing import Optional, Dict, List, Any, AsyncIterator, Callable, Iterable, Tuple
+from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass
 import httpx
 from pathlib import Path
+from datetime import datetime
+from urllib.parse import unquote
 
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp import Context
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from jcr_index import (
+    AliasIndex, WarningIndex, FacetTable, IssnIndex, TitleSuggester, add_facet_count, build_derived_tables,
+    list_tables, load_latest_profiles, normalize_title, read_sync_metadata, table_exists, write_sync_metadata
+)
+from jcr_query import (
+    JournalQueryEngine, MetricSnapshot, QueryError, RankingStore, SimilarityIndex, MOVER_METRICS, MOVER_SOURCES,
+    RANK_METRICS, compare_snapshots, parse_predicates
+)
+from jcr_runtime import (
+    AdmissionScheduler, CachedValue, CostClass, DeadlineExceeded, QueryDeadline, SchedulerBusy, SingleFlight,
+    run_with_deadline
+)
+from jcr_http import HttpClient
+from jcr_storage import ATTACH_LIMIT, ShardedStore
+from jcr_resources import Payload, ResourceCatalog, etag_for, etag_matches, resource_uri
+from jcr_response import (
+    Page, ResponseBudget, compact_cell, compact_row, compact_size, compact_table, cursor_key, page_start, paginate, text_footer
+)
+from bibliography import AnnotationSummary, annotate_entries, annotation_record, iter_entries
 
 # 配置常量 - 使用脚本所在目录的绝对路径
 SCRIPT_DIR = Path(__file__).parent.absolute()
-DATABASE_PATH = str(SCRIPT_DIR / "jcr.db")
+DATABASE_PATH = os.environ.get("JCR_DB_PATH", str(SCRIPT_DIR / "jcr.db"))
+# 分库存储目录：设置后每个数据源年度表存为独立文件，按需ATTACH（见 jcr_storage.py）
+DATA_DIR = os.environ.get("JCR_DATA_DIR")
 DATA_UPDATE_URL = "https://raw.githubusercontent.com/hitfyd/ShowJCR/master/中科院分区表及JCR原始数据文件/"
+DATABASE_URL = os.environ.get("JCR_DB_URL", DATA_UPDATE_URL + "jcr.db")
+# 增量下载：远程数据库旁的块校验清单（由 delta_sync.py manifest 生成），不存在时改为完整下载
+DELTA_SYNC = os.environ.get("JCR_DELTA_SYNC", "1") != "0"
+DATABASE_MANIFEST_URL = os.environ.get("JCR_DB_MANIFEST_URL", DATABASE_URL + ".manifest.json")
+# 只读连接的内存映射大小；多进程部署时各worker共享操作系统页缓存
+MMAP_SIZE = int(os.environ.get("JCR_MMAP_SIZE", 256 * 1024 * 1024))
+# 远程数据库在 sync_metadata 中的记录名
+DATABASE_SOURCE = "jcr.db"
+# 更新检查结果的缓存时间与后台轮询间隔（秒，0表示不轮询）
+UPDATE_CHECK_TTL = float(os.environ.get("JCR_UPDATE_CHECK_TTL", 3600))
+UPDATE_POLL_INTERVAL = float(os.environ.get("JCR_UPDATE_POLL_INTERVAL", 0))
+# 单次工具调用的数据库执行期限（秒，0表示不限），超时后返回已取得的部分结果
+QUERY_DEADLINE = float(os.environ.get("JCR_QUERY_DEADLINE", 10))
+# 各工具的执行期限，未列出的工具使用 QUERY_DEADLINE
+TOOL_DEADLINES: Dict[str, float] = {
+    "batch_query_journals": QUERY_DEADLINE * 3,
+}
+# 期限截断时附在结果后的提示
+TRUNCATED_NOTE = "⏱️ 查询超出执行期限，结果不完整，请缩小查询范围"
+# 同时执行的工具调用上限，默认与 asyncio.to_thread 线程池大小一致，避免调用在线程池中隐性排队
+MAX_CONCURRENCY = int(os.environ.get("JCR_MAX_CONCURRENCY", min(32, (os.cpu_count() or 1) + 4)))
+# 标准/批量类工具的并发上限，默认合计不超过总上限的一半，其余名额留给交互式查询
+STANDARD_CONCURRENCY = int(os.environ.get("JCR_STANDARD_CONCURRENCY", max(1, MAX_CONCURRENCY // 3)))
+BULK_CONCURRENCY = int(os.environ.get("JCR_BULK_CONCURRENCY", max(1, MAX_CONCURRENCY // 6)))
+# 批量查询内部的并行查询数（不占满线程池，交互式查询仍能及时执行）
+BATCH_PARALLELISM = int(os.environ.get("JCR_BATCH_PARALLELISM", 4))
+# HTTP资源接口的缓存时间（秒），过期后代理与客户端凭ETag重新验证
+RESOURCE_MAX_AGE = int(os.environ.get("JCR_RESOURCE_MAX_AGE", 300))
+# 只折叠ASCII大小写，与 SQLite LIKE 的大小写规则一致
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+# ISSN写法（连字符可省略），如 0028-0836、00280836、1234-567X
+_ISSN_PATTERN = re.compile(r"\d{4}-?\d{3}[\dXx]")
 
 @dataclass
 class JournalInfo:
@@ -25,63 +90,411 @@ class JournalInfo:
     warning_status: Optional[str] = None
     ccf_level: Optional[str] = None
     year: Optional[str] = None
+    canonical_name: Optional[str] = None
 
 class JCRDatabase:
     """JCR数据库管理类"""
     
-    def __init__(self, db_path: str = DATABASE_PATH):
-        self.db_path = db_path
+    def __init__(self, db_path: str = DATABASE_PATH, data_dir: Optional[str] = DATA_DIR):
+        # 分库模式下 db_path 仅作为下载临时文件的路径前缀
+        self.store = ShardedStore(data_dir) if data_dir else None
+        self.db_path = str(self.store.data_dir / "jcr.db") if self.store else db_path
+        # 内存索引缓存: 名称 -> (数据库版本, 索引对象)
+        self._cache: Dict[str, Any] = {}
+        self._cache_lock = threading.RLock()
+        # 当前线程的执行期限，在其中构建的内存索引受期限约束
+        self._local = threading.local()
+        # 相同参数的并发查询合并为一次数据库访问
+        self.single_flight = SingleFlight()
         self.init_database()
     
     def init_database(self):
         """初始化数据库"""
-        if not os.path.exists(self.db_path):
+        if self.store is not None:
+            self.store.ensure()
+        elif not os.path.exists(self.db_path):
             # 如果数据库不存在，创建基本表结构
             conn = sqlite3.connect(self.db_path)
             conn.close()
     
-    def search_journal(self, journal_name: str, year: Optional[str] = None) -> List[JournalInfo]:
-        """搜索期刊信息"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        results = []
+    def exists(self) -> bool:
+        """本地是否已有数据（单文件或分库目录）"""
+        return self.store.exists() if self.store is not None else os.path.exists(self.db_path)
+    
+    def connect(self, deadline: Optional[QueryDeadline] = None, tables: Iterable[str] = ()) -> sqlite3.Connection:
+        """打开只读连接，通过mmap读取数据库页，多个worker进程不各自复制数据
+
+        分库模式下只ATTACH tables 中列出的数据源年度表，派生表总是可用。
+        传入 deadline 时在连接上安装进度检查，超时或请求取消后中断正在执行的语句。
+        """
+        if self.store is not None:
+            conn = self.store.connect(tables, MMAP_SIZE)
+        else:
+            uri = Path(self.db_path).absolute().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        if deadline is not None:
+            deadline.attach(conn)
+        return conn
+    
+    def table_names(self, prefix: Optional[str] = None, year: Optional[str] = None) -> List[str]:
+        """数据源年度表名，可按前缀与年份过滤（分库模式读取目录，无需打开分库）"""
+        if self.store is not None:
+            return self.store.tables(prefix, year)
+        conn = self.connect()
+        try:
+            tables = list_tables(conn, prefix)
+        finally:
+            conn.close()
+        return [t for t in tables if not year or t.endswith(year)]
+    
+    def route(self, tables: List[str]) -> List[List[str]]:
+        """把需要访问的表按ATTACH上限分组；单文件模式下一个连接即可访问全部表"""
+        if self.store is not None:
+            return self.store.route(tables, ATTACH_LIMIT)
+        return [tables]
+    
+    def generation(self) -> str:
+        """数据库版本标识，数据库文件被替换或修改后随之变化"""
+        if self.store is not None:
+            return self.store.generation()
+        try:
+            st = os.stat(self.db_path)
+        except OSError:
+            return "missing"
+        return f"{st.st_ino}-{st.st_size}-{st.st_mtime_ns}"
+    
+    @contextmanager
+    def bounded(self, deadline: QueryDeadline):
+        """在当前线程内以 deadline 约束索引构建：到期时中断构建语句，未完成的索引不写入缓存"""
+        previous = getattr(self._local, "deadline", None)
+        self._local.deadline = deadline
         try:
-            # 获取所有表名
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [table[0] for table in cursor.fetchall()]
+            yield
+        finally:
+            self._local.deadline = previous
+    
+    def _cached(self, name: str, builder: Callable[[sqlite3.Connection], Any], tables: Iterable[str] = ()) -> Any:
+        """按数据库版本缓存内存索引，数据库同步后自动重建；tables 为构建时需要ATTACH的分库"""
+        generation = self.generation()
+        with self._cache_lock:
+            cached = self._cache.get(name)
+            if cached and cached[0] == generation:
+                return cached[1]
             
-            # 在各个表中搜索期刊
-            for table in tables:
+            # 等待其他线程构建期间可能已经到期
+            deadline = getattr(self._local, "deadline", None)
+            if deadline is not None:
+                deadline.ensure()
+            conn = self.connect(deadline, tables=tables)
+            try:
+                value = builder(conn)
+            finally:
+                conn.close()
+            self._cache[name] = (generation, value)
+            return value
+    
+    @property
+    def warning_index(self) -> WarningIndex:
+        """预警名单索引（一次加载，O(1)探测）"""
+        if self.store is None:
+            return self._cached("warning_index", WarningIndex.load)
+        
+        def build(_) -> WarningIndex:
+            # 分库模式下按ATTACH上限分组，逐组加载全部年份的预警名单
+            index = WarningIndex()
+            for group in self.route(sorted(self.table_names(WarningIndex.TABLE_PREFIX), reverse=True)):
+                conn = self.connect(getattr(self._local, "deadline", None), tables=group)
                 try:
-                    # 检查表结构
-                    cursor.execute(f"PRAGMA table_info({table})")
-                    columns = [col[1] for col in cursor.fetchall()]
-                    
-                    if 'Journal' not in columns:
-                        continue
-                    
-                    # 构建查询语句
-                    query = f"SELECT * FROM {table} WHERE Journal LIKE ? COLLATE NOCASE"
-                    cursor.execute(query, (f"%{journal_name}%",))
-                    
-                    rows = cursor.fetchall()
-                    column_names = [description[0] for description in cursor.description]
-                    
-                    for row in rows:
-                        row_dict = dict(zip(column_names, row))
-                        journal_info = self._parse_journal_info(row_dict, table)
-                        if journal_info:
-                            results.append(journal_info)
-                
-                except sqlite3.Error:
+                    index.load_tables(conn)
+                finally:
+                    conn.close()
+            return index
+        
+        return self._cached("warning_index", build)
+    
+    @property
+    def facets(self) -> FacetTable:
+        """同步时预计算的分面统计（学科/分区/Top/OA计数）"""
+        return self._cached("facets", FacetTable.load)
+    
+    @property
+    def issn_index(self) -> IssnIndex:
+        """ISSN/eISSN 反查索引"""
+        return self._cached("issn_index", IssnIndex.load)
+    
+    @property
+    def alias_index(self) -> AliasIndex:
+        """期刊别名索引（各种写法/缩写 -> 规范期刊ID）"""
+        return self._cached("alias_index", AliasIndex.load)
+    
+    @property
+    def suggester(self) -> TitleSuggester:
+        """刊名前缀补全索引（基于别名索引与最新指标构建）"""
+        return self._cached("suggester", lambda conn: TitleSuggester.build(self.alias_index, self.latest_profiles))
+    
+    @property
+    def sync_record(self) -> Optional[Dict]:
+        """上次同步远程数据库时记录的ETag/Last-Modified/SHA256"""
+        return self._cached("sync_record",
+                            lambda conn: read_sync_metadata(conn, DATABASE_SOURCE).get(DATABASE_SOURCE))
+    
+    @property
+    def latest_profiles(self) -> Dict[str, Dict]:
+        """各期刊最新年份指标，按规范化刊名索引"""
+        return self._cached("latest_profiles", load_latest_profiles)
+    
+    def ranking_store(self, year: str) -> RankingStore:
+        """指定年份的列式排名存储"""
+        return self._cached(f"ranking:{year}", lambda conn: RankingStore.load(conn, year))
+    
+    @property
+    def resource_catalog(self) -> ResourceCatalog:
+        """期刊/学科/预警名单资源目录（载荷按数据库版本缓存）"""
+        return self._cached("resource_catalog",
+                            lambda conn: ResourceCatalog.load(conn, self.alias_index, self.warning_index))
+    
+    def resolve_journal_id(self, value: str) -> Optional[int]:
+        """资源URI中的期刊标识：期刊ID，也可以是刊名（含缩写）或ISSN
+
+        不带连字符的ISSN（如 00280836）也是纯数字，先按ISSN反查，未收录时才作为期刊ID。
+        """
+        value = value.strip()
+        aliases = self.alias_index
+        if _ISSN_PATTERN.fullmatch(value):
+            issn, journals = self.issn_index.resolve(value)
+            # 纯数字只接受精确收录的ISSN，不做校验位回退，以免把期刊ID误当作相近的ISSN
+            if journals and (not value.isdigit() or issn == value):
+                for journal in journals.values():
+                    journal_id = aliases.resolve(journal)
+                    if journal_id is not None:
+                        return journal_id
+        if value.isdigit():
+            return int(value)
+        return aliases.resolve(value)
+    
+    def resource_payload(self, kind: str, parts: List[str]) -> Optional[Payload]:
+        """按资源类型与路径取预计算的资源载荷，不存在时返回None"""
+        catalog = self.resource_catalog
+        if kind == "journal" and len(parts) == 1:
+            journal_id = self.resolve_journal_id(parts[0])
+            return catalog.journal(journal_id) if journal_id is not None else None
+        if kind == "category" and len(parts) == 2:
+            return catalog.category(parts[0], parts[1])
+        if kind == "warnings" and len(parts) == 1:
+            return catalog.warning_list(parts[0])
+        return None
+    
+    @property
+    def similarity_index(self) -> SimilarityIndex:
+        """期刊指标向量的最近邻索引"""
+        return self._cached("similarity_index", SimilarityIndex.load)
+    
+    def similar_journals(self, journal_name: str, k: int = 10, same_category: bool = False,
+                         include_warned: bool = False) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """按指标向量查找相似期刊，同一期刊的不同写法只保留一个；未收录时返回None"""
+        index = self.similarity_index
+        aliases = self.alias_index
+        journal_id = aliases.resolve(journal_name)
+        row = index.position(normalize_title(journal_name))
+        if row is None and journal_id is not None:
+            for title in aliases.titles(journal_id):
+                row = index.position(normalize_title(title))
+                if row is not None:
+                    break
+        if row is None:
+            return None
+        
+        seen = {journal_id} if journal_id is not None else set()
+        results = []
+        # 多取一些候选，去掉同一期刊的其他写法后仍能凑满K个
+        for candidate, distance in index.neighbors(row, k * 2 + 5, exclude_warned=not include_warned,
+                                                   same_category=same_category):
+            candidate_id = aliases.resolve(index.keys[candidate])
+            if candidate_id is not None:
+                if candidate_id in seen:
                     continue
+                seen.add(candidate_id)
+            results.append(index.record(candidate, distance))
+            if len(results) >= k:
+                break
+        return index.record(row), results
+    
+    def metric_snapshot(self, source: str, year: str) -> MetricSnapshot:
+        """指定数据源与年份的NumPy列式快照（跨年份比较用）"""
+        return self._cached(f"snapshot:{source}:{year}", lambda conn: MetricSnapshot.load(conn, source, year))
+    
+    def lookup_issns(self, issns: List[str]) -> List[Dict[str, Any]]:
+        """按ISSN/eISSN批量反查期刊，单次遍历完成解析"""
+        index = self.issn_index
+        profiles = self.latest_profiles
+        warnings = self.warning_index
         
-        finally:
-            conn.close()
+        results = []
+        for query, (issn, journals) in index.resolve_many(issns).items():
+            if not journals:
+                results.append({"query": query, "issn": issn, "found": False})
+                continue
+            for key, journal in journals.items():
+                profile = profiles.get(key, {})
+                results.append({
+                    "query": query,
+                    "issn": f"{issn[:4]}-{issn[4:]}",
+                    "found": True,
+                    "journal_name": profile.get("journal", journal),
+                    "year": profile.get("year"),
+                    "impact_factor": profile.get("jcr_if"),
+                    "jcr_quartile": f"Q{profile['jcr_quartile']}" if profile.get("jcr_quartile") else None,
+                    "cas_partition": f"{profile['cas_partition']}区" if profile.get("cas_partition") else None,
+                    "category": profile.get("cas_category") or profile.get("jcr_category"),
+                    "warning": warnings.lookup(key) or None,
+                })
+        return results
+    
+    @property
+    def profiles_by_id(self) -> Dict[int, Dict]:
+        """各规范期刊最新年份的指标（同一期刊的不同写法取最新年份）"""
+        def build(conn):
+            aliases = self.alias_index
+            profiles: Dict[int, Dict] = {}
+            for key, profile in self.latest_profiles.items():
+                journal_id = aliases.resolve(key)
+                if journal_id is not None and profile["year"] >= profiles.get(journal_id, {}).get("year", ""):
+                    profiles[journal_id] = profile
+            return profiles
+        return self._cached("profiles_by_id", build)
+    
+    def resolve_venues(self, venues: List[Tuple[Tuple[str, ...], str]]) -> Dict[Tuple, Dict[str, Any]]:
+        """批量解析参考文献中的期刊：先按ISSN，再按刊名/缩写精确匹配，返回{(ISSN, 刊名): 标注}"""
+        issn_index = self.issn_index
+        aliases = self.alias_index
+        profiles = self.profiles_by_id
+        warnings = self.warning_index
+        
+        resolved = {}
+        for venue in venues:
+            issns, journal = venue
+            journal_id, matched_by = None, None
+            for issn in issns:
+                for key in issn_index.resolve(issn)[1]:
+                    journal_id = aliases.resolve(key)
+                    if journal_id is not None:
+                        matched_by = "issn"
+                        break
+                if journal_id is not None:
+                    break
+            if journal_id is None and journal:
+                journal_id, matched_by = aliases.resolve(journal), "title"
+            if journal_id is None:
+                resolved[venue] = {"found": False}
+                continue
+            
+            profile = profiles.get(journal_id, {})
+            warning: Dict[str, str] = {}
+            for title in aliases.titles(journal_id):
+                warning.update(warnings.lookup(title))
+            resolved[venue] = {
+                "found": True,
+                "matched_by": matched_by,
+                "journal_id": journal_id,
+                "journal_name": aliases.canonical(journal_id),
+                "year": profile.get("year"),
+                "impact_factor": profile.get("jcr_if"),
+                "jcr_quartile": f"Q{profile['jcr_quartile']}" if profile.get("jcr_quartile") else None,
+                "cas_partition": f"{profile['cas_partition']}区" if profile.get("cas_partition") else None,
+                "cas_top": bool(profile.get("cas_top")),
+                "warning": dict(sorted(warning.items())) or None,
+            }
+        return resolved
+    
+    def search_journal(self, journal_name: str, year: Optional[str] = None,
+                       deadline: Optional[QueryDeadline] = None) -> List[JournalInfo]:
+        """搜索期刊信息
+
+        刊名（含缩写、旧刊名）命中别名表时按该期刊的全部原始写法精确查询，
+        未命中时回退到模糊匹配。超出 deadline 时返回已查到的部分结果（deadline.truncated 为真）。
+        """
+        aliases = self.alias_index
+        journal_id = aliases.resolve(journal_name)
+        if journal_id is not None:
+            titles = aliases.titles(journal_id)
+            condition = f"Journal COLLATE NOCASE IN ({', '.join('?' * len(titles))})"
+            params = tuple(titles)
+        else:
+            condition = "Journal LIKE ? COLLATE NOCASE"
+            params = (f"%{journal_name}%",)
+        
+        results = []
+        # 指定年份时只查询（分库模式下只ATTACH）该年份的数据表
+        for group in self.route(self.table_names(year=year)):
+            if deadline is not None and deadline.check():
+                break
+            conn = self.connect(deadline, group)
+            cursor = conn.cursor()
+            try:
+                # 在各个表中搜索期刊
+                for table in group:
+                    if deadline is not None and deadline.check():
+                        break
+                    try:
+                        # 检查表结构
+                        cursor.execute(f"PRAGMA table_info({table})")
+                        columns = [col[1] for col in cursor.fetchall()]
+                        
+                        if 'Journal' not in columns:
+                            continue
+                        
+                        # 构建查询语句，逐行读取以便中断时保留已取得的行
+                        cursor.execute(f"SELECT * FROM {table} WHERE {condition}", params)
+                        column_names = [description[0] for description in cursor.description]
+                        
+                        for row in cursor:
+                            row_dict = dict(zip(column_names, row))
+                            journal_info = self._parse_journal_info(row_dict, table)
+                            if journal_info:
+                                journal_info.canonical_name = aliases.canonical_name(journal_info.journal_name)
+                                results.append(journal_info)
+                    
+                    except sqlite3.Error as e:
+                        if deadline is not None and deadline.interrupted(e):
+                            break
+                        continue
+            
+            finally:
+                conn.close()
         
         return results
     
+    async def search_journal_async(self, journal_name: str, year: Optional[str] = None,
+                                   seconds: Optional[float] = QUERY_DEADLINE) -> Tuple[List[JournalInfo], bool]:
+        """在线程池中搜索期刊，相同参数的并发请求只访问一次数据库
+
+        返回 (结果, 是否因超出执行期限而截断)；所有等待者都取消时中断数据库查询。
+        """
+        def search(deadline: QueryDeadline) -> Tuple[List[JournalInfo], bool]:
+            # 别名索引首次访问时在此构建，同样受执行期限约束
+            with self.bounded(deadline):
+                try:
+                    return self.search_journal(journal_name, year, deadline), deadline.truncated
+                except DeadlineExceeded:
+                    return [], True
+                except sqlite3.OperationalError as e:
+                    if deadline.interrupted(e):
+                        return [], True
+                    raise
+        
+        key = ("search_journal", self.search_key(journal_name), year)
+        return await self.single_flight.do(key, lambda: run_with_deadline(search, seconds))
+    
+    @staticmethod
+    def search_key(journal_name: str) -> str:
+        """搜索请求的合并键：原始刊名只折叠ASCII大小写
+
+        未命中别名时按原始刊名做 LIKE 模糊匹配（SQLite 的 LIKE 只忽略ASCII大小写），
+        不能用 normalize_title 合并，否则 "A & B" 与 "A and B" 等不同查询会共享结果。
+        """
+        return journal_name.translate(_ASCII_LOWER)
+    
     def _parse_journal_info(self, row_dict: Dict, table_name: str) -> Optional[JournalInfo]:
         """解析数据库行为期刊信息对象"""
         try:
@@ -140,68 +553,247 @@ class JCRDatabase:
             return None
 
 # 初始化FastMCP服务器
-app = FastMCP("jcr-partition-server", port=8080)
+# 进程内共享的HTTP客户端（检查更新、同步数据库）
+http_client = HttpClient()
+
+
+async def probe_remote_database() -> Dict[str, Any]:
+    """HEAD请求远程数据库，返回校验信息"""
+    response = await http_client.head(DATABASE_URL, budget=30.0)
+    if response.status_code != 200:
+        raise RuntimeError(f"无法连接数据源，状态码: {response.status_code}")
+    return {
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+        "size": int(response.headers.get("content-length", 0)),
+        "checked_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+# 远程数据库状态缓存：请求路径直接读缓存，过期后刷新或由后台轮询刷新
+remote_status = CachedValue(probe_remote_database, UPDATE_CHECK_TTL)
+
+
+@asynccontextmanager
+async def server_resources() -> AsyncIterator[None]:
+    """持有共享HTTP客户端与更新轮询，最后一个持有者退出时关闭"""
+    async with http_client.hold(), remote_status.polling(UPDATE_POLL_INTERVAL):
+        yield
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """会话生命周期"""
+    async with server_resources():
+        yield
+
+
+def tool_deadline(name: str) -> float:
+    """工具的数据库执行期限（秒）"""
+    return TOOL_DEADLINES.get(name, QUERY_DEADLINE)
+
+
+async def run_indexed(tool: str, fn: Callable[[QueryDeadline], Any]) -> Any:
+    """在线程池中按工具的执行期限执行 fn(deadline)
+
+    fn 中首次访问的内存索引在工作线程中构建并受同一期限约束，冷启动不会阻塞事件循环，
+    也不会超出期限继续执行；期限中断时抛出 DeadlineExceeded。
+    """
+    def call(deadline: QueryDeadline) -> Any:
+        with db.bounded(deadline):
+            try:
+                return fn(deadline)
+            except sqlite3.OperationalError as e:
+                if deadline.interrupted(e):
+                    raise DeadlineExceeded() from e
+                raise
+
+    return await run_with_deadline(call, tool_deadline(tool))
+
+
+def page_key(tool: str, *args: Any) -> str:
+    """工具续页游标的查询标识，包含数据库版本，数据同步后旧游标失效"""
+    return cursor_key(tool, db.generation(), *args)
+
+
+# 工具成本类别：interactive（单个期刊查询）优先于 standard（整表筛选/排名）优先于 bulk（批量与同步）
+scheduler = AdmissionScheduler(MAX_CONCURRENCY, [
+    CostClass("interactive", priority=0, limit=MAX_CONCURRENCY, max_queue=256),
+    CostClass("standard", priority=1, limit=STANDARD_CONCURRENCY, max_queue=64),
+    CostClass("bulk", priority=2, limit=BULK_CONCURRENCY, max_queue=16),
+])
+
+
+def _client_key() -> str:
+    """当前调用的客户端标识，用于同一类别内的公平排队"""
+    try:
+        request_context = app.get_context().request_context
+    except ValueError:
+        return "local"
+    client_id = getattr(request_context.meta, "client_id", None) if request_context.meta else None
+    if client_id:
+        return str(client_id)
+    request = request_context.request
+    if request is not None:
+        session_id = request.headers.get("mcp-session-id")
+        if session_id:
+            return session_id
+        if request.client:
+            return request.client.host
+    return str(id(request_context.session))
+
+
+def scheduled(cost_class: str):
+    """按成本类别对工具调用做准入控制与调度的装饰器（放在 @app.tool() 之下）"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            try:
+                async with scheduler.slot(cost_class, _client_key()):
+                    return await fn(*args, **kwargs)
+            except SchedulerBusy as e:
+                return f"服务器繁忙: {str(e)}"
+        return wrapper
+    return decorator
+
+
+class JCRServer(FastMCP):
+    """读取资源时在 _meta 中附带内容ETag与数据库版本，客户端可据此缓存并重新验证"""
+
+    async def read_resource(self, uri) -> List[ReadResourceContents]:
+        version = db.generation()
+        contents = await super().read_resource(uri)
+        return [ReadResourceContents(content=item.content, mime_type=item.mime_type,
+                                     meta={**(item.meta or {}), "etag": etag_for(item.content), "version": version})
+                for item in contents]
+
+
+app = JCRServer("jcr-partition-server", port=8080, lifespan=server_lifespan)
 db = JCRDatabase()
 
+def _impact_value(value: Any) -> float:
+    """影响因子转为数值，无法解析时为0"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _search_relevance(query: str, journal: str, infos: List[JournalInfo]) -> Tuple:
+    """搜索结果的相关性排序键：刊名完全匹配 > 前缀匹配 > 整词匹配 > 其他，同级按最新影响因子、刊名长度"""
+    key = normalize_title(query)
+    titles = {normalize_title(journal)} | {normalize_title(info.journal_name) for info in infos}
+    if key in titles:
+        level = 0
+    elif any(title.startswith(key) for title in titles):
+        level = 1
+    elif any(re.search(rf"\b{re.escape(key)}\b", title) for title in titles):
+        level = 2
+    else:
+        level = 3
+    impact = max((_impact_value(info.impact_factor) for info in infos), default=0.0)
+    return level, -impact, len(journal)
+
+
+SEARCH_COLUMNS = ["journal", "year", "if", "partition", "category", "warning", "ccf"]
+
+
 @app.tool()
-async def search_journal(journal_name: str, year: Optional[str] = None) -> str:
+@scheduled("interactive")
+async def search_journal(journal_name: str, year: Optional[str] = None, output_format: str = "text",
+                         max_items: Optional[int] = None, max_chars: Optional[int] = None,
+                         cursor: Optional[str] = None) -> str:
     """
     搜索期刊信息，包括影响因子、分区、预警状态等
     
     Args:
         journal_name: 期刊名称（支持模糊搜索）
         year: 指定年份（可选，如2025、2024、2023等）
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格（每行一个期刊年份）
+        max_items: 本页最多返回的期刊数（可选）
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限；可在期刊的年份之间截断，续页从截断处继续
+        cursor: 上一页返回的续页游标
     
     Returns:
-        期刊的详细信息，包括各年份的分区、影响因子等数据
+        期刊的详细信息，包括各年份的分区、影响因子等数据；匹配期刊按相关性排序，超出预算时附带续页游标
     """
     try:
-        results = db.search_journal(journal_name, year)
+        key = page_key("search_journal", db.search_key(journal_name), year)
+        start = page_start(cursor, key)
+        results, truncated = await db.search_journal_async(journal_name, year, tool_deadline("search_journal"))
         
         if not results:
-            return f"未找到期刊 '{journal_name}' 的相关信息"
+            return TRUNCATED_NOTE if truncated else f"未找到期刊 '{journal_name}' 的相关信息"
         
-        # 按期刊名称和年份分组整理结果
+        # 按规范刊名分组整理结果（同一期刊的不同写法、旧刊名合并）
         grouped_results = {}
         for result in results:
-            key = result.journal_name
-            if key not in grouped_results:
-                grouped_results[key] = []
-            grouped_results[key].append(result)
-        
-        output = []
-        for journal, infos in grouped_results.items():
-            output.append(f"\n📚 期刊名称: {journal}")
-            output.append("=" * 50)
-            
+            group = result.canonical_name or result.journal_name
+            if group not in grouped_results:
+                grouped_results[group] = []
+            grouped_results[group].append(result)
+        for infos in grouped_results.values():
             # 按年份排序
             infos.sort(key=lambda x: x.year or "0000", reverse=True)
+        
+        # 最相关的期刊在前；按期刊年份逐行分页，字符预算可在期刊内截断，超出预算的行不做格式化
+        groups = sorted(grouped_results.items(),
+                        key=lambda item: _search_relevance(journal_name, item[0], item[1]))
+        rows = [(journal, info, i == 0) for journal, infos in groups for i, info in enumerate(infos)]
+        budget = ResponseBudget.of(max_items, max_chars)
+        
+        if output_format.lower() == "compact":
+            def render_row(row):
+                journal, info, _ = row
+                return compact_row([journal, info.year, info.impact_factor, info.partition, info.category,
+                                    info.warning_status, info.ccf_level])
             
-            for info in infos:
-                year_str = f"【{info.year}年】" if info.year else "【未知年份】"
-                output.append(f"\n{year_str}")
-                
-                if info.impact_factor:
-                    output.append(f"  📊 影响因子: {info.impact_factor}")
-                
-                if info.partition:
-                    output.append(f"  🏆 分区: {info.partition}")
-                
-                if info.category:
-                    output.append(f"  📖 学科类别: {info.category}")
-                
-                if info.warning_status:
-                    output.append(f"  ⚠️ 预警状态: {info.warning_status}")
-                
-                if info.ccf_level:
-                    output.append(f"  🏅 CCF推荐等级: {info.ccf_level}")
+            page = paginate(rows[start:], render_row, budget, start, len(rows), key,
+                            reserve=compact_size(SEARCH_COLUMNS), group=lambda row: row[0])
+            notes = [TRUNCATED_NOTE] if truncated else []
+            return compact_table(f"search_journal {journal_name}", SEARCH_COLUMNS, page, notes)
         
+        current = [None]
+        
+        def render(row):
+            journal, info, first = row
+            output = []
+            # 每个期刊的第一行（或在上一页中途截断的期刊在本页的第一行）带期刊标题
+            if current[0] != journal:
+                current[0] = journal
+                output.append(f"\n📚 期刊名称: {journal}" + ("" if first else "（续）"))
+                output.append("=" * 50)
+            
+            year_str = f"【{info.year}年】" if info.year else "【未知年份】"
+            output.append(f"\n{year_str}")
+            
+            if info.impact_factor:
+                output.append(f"  📊 影响因子: {info.impact_factor}")
+            
+            if info.partition:
+                output.append(f"  🏆 分区: {info.partition}")
+            
+            if info.category:
+                output.append(f"  📖 学科类别: {info.category}")
+            
+            if info.warning_status:
+                output.append(f"  ⚠️ 预警状态: {info.warning_status}")
+            
+            if info.ccf_level:
+                output.append(f"  🏅 CCF推荐等级: {info.ccf_level}")
+            return "\n".join(output)
+        
+        page = paginate(rows[start:], render, budget, start, len(rows), key, reserve=200, group=lambda row: row[0])
+        output = page.chunks + text_footer(page, "条记录")
+        if truncated:
+            output.append(f"\n{TRUNCATED_NOTE}")
         return "\n".join(output)
     
     except Exception as e:
         return f"查询出错: {str(e)}"
 
 @app.tool()
+@scheduled("interactive")
 async def get_partition_trends(journal_name: str) -> str:
     """
     获取期刊分区变化趋势
@@ -213,10 +805,10 @@ async def get_partition_trends(journal_name: str) -> str:
         期刊历年分区变化趋势分析
     """
     try:
-        results = db.search_journal(journal_name)
+        results, truncated = await db.search_journal_async(journal_name, seconds=tool_deadline("get_partition_trends"))
         
         if not results:
-            return f"未找到期刊 '{journal_name}' 的相关信息"
+            return TRUNCATED_NOTE if truncated else f"未找到期刊 '{journal_name}' 的相关信息"
         
         # 提取分区信息
         partition_data = []
@@ -225,7 +817,7 @@ async def get_partition_trends(journal_name: str) -> str:
                 partition_data.append((result.year, result.partition, result.journal_name))
         
         if not partition_data:
-            return f"未找到期刊 '{journal_name}' 的分区信息"
+            return TRUNCATED_NOTE if truncated else f"未找到期刊 '{journal_name}' 的分区信息"
         
         # 按年份排序
         partition_data.sort(key=lambda x: x[0])
@@ -249,70 +841,98 @@ async def get_partition_trends(journal_name: str) -> str:
             else:
                 output.append("📊 该期刊分区稳定，属于中等水平")
         
+        if truncated:
+            output.append(f"\n{TRUNCATED_NOTE}")
         return "\n".join(output)
     
     except Exception as e:
         return f"分析出错: {str(e)}"
 
 @app.tool()
-async def check_warning_journals(keywords: Optional[str] = None) -> str:
+@scheduled("standard")
+async def check_warning_journals(
+    keywords: Optional[str] = None,
+    year: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 100,
+    output_format: str = "text",
+    max_chars: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> str:
     """
     查询国际期刊预警名单
     
     Args:
         keywords: 关键词（可选，用于筛选特定期刊）
+        year: 指定预警年份（可选，如2025、2024等）
+        offset: 分页起始位置，默认0（提供cursor时忽略）
+        limit: 每页返回数量，默认100
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限
+        cursor: 上一页返回的续页游标
     
     Returns:
-        预警期刊列表及其预警原因
+        预警期刊列表及其各年份预警原因（关键词完全匹配的期刊在前）
     """
     try:
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
+        key = page_key("check_warning_journals", keywords, year)
+        start = page_start(cursor, key, offset)
         
-        # 获取预警表
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'GJQKYJMD%'")
-        warning_tables = [table[0] for table in cursor.fetchall()]
+        def load(deadline: QueryDeadline):
+            index = db.warning_index
+            deadline.ensure()
+            # 只取出本页可能用到的条目，再按字符预算截断
+            return index, index.page(year=year, keyword=keywords, offset=start, limit=limit)
         
-        if not warning_tables:
+        index, (total, items) = await run_indexed("check_warning_journals", load)
+        if not index.years:
             return "未找到预警期刊数据表"
+        budget = ResponseBudget.of(limit, max_chars)
+        
+        if output_format.lower() == "compact":
+            columns = ["journal", "warnings"]
+            
+            def render_row(item):
+                journal_name, levels = item
+                return compact_row([journal_name, {y: levels[y] for y in sorted(levels, reverse=True)}])
+            
+            page = paginate(items, render_row, budget, start, total, key, reserve=compact_size(columns))
+            return compact_table(f"check_warning_journals years={','.join(index.years)}", columns, page)
         
         output = ["🚨 国际期刊预警名单查询结果"]
         output.append("=" * 40)
+        output.append(f"收录年份: {', '.join(index.years)}")
         
-        for table in sorted(warning_tables, reverse=True):
-            year = table.replace('GJQKYJMD', '')
-            output.append(f"\n📅 {year}年预警名单:")
-            
-            query = f"SELECT * FROM {table}"
-            params = []
-            
+        if not items:
             if keywords:
-                query += " WHERE Journal LIKE ? COLLATE NOCASE"
-                params.append(f"%{keywords}%")
-            
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            column_names = [description[0] for description in cursor.description]
-            
-            if rows:
-                for row in rows:
-                    row_dict = dict(zip(column_names, row))
-                    journal_name = row_dict.get('Journal', '未知期刊')
-                    warning_reason = row_dict.get('预警原因', row_dict.get('预警等级', '未知原因'))
-                    output.append(f"  • {journal_name}: {warning_reason}")
+                output.append(f"\n无匹配 '{keywords}' 的预警期刊")
+            elif year:
+                output.append(f"\n{year}年无预警期刊数据")
             else:
-                if keywords:
-                    output.append(f"  无匹配 '{keywords}' 的预警期刊")
-                else:
-                    output.append("  该年度无预警期刊数据")
+                output.append("\n无预警期刊数据")
+            return "\n".join(output)
+        
+        def render(item):
+            journal_name, levels = item
+            detail = "；".join(f"{y}年 {levels[y]}" for y in sorted(levels, reverse=True))
+            return f"  • {journal_name}: {detail}"
+        
+        page = paginate(items, render, budget, start, total, key, reserve=300)
+        output.append(f"\n共 {total} 个期刊，显示第 {start + 1}-{page.end} 个:")
+        output.extend(page.chunks)
+        
+        if page.truncated:
+            output.append(f"\n💡 使用 offset={page.end} 或 cursor=\"{page.cursor}\" 查看下一页")
         
-        conn.close()
         return "\n".join(output)
     
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
     except Exception as e:
         return f"查询预警期刊出错: {str(e)}"
 
 @app.tool()
+@scheduled("interactive")
 async def compare_journals(journal_list: str) -> str:
     """
     比较多个期刊的综合信息
@@ -333,9 +953,17 @@ async def compare_journals(journal_list: str) -> str:
         output.append("=" * 50)
         
         all_results = {}
-        for journal in journals:
-            results = db.search_journal(journal)
+        truncated = []
+        seconds = tool_deadline("compare_journals")
+        searched = await asyncio.gather(*(db.search_journal_async(journal, seconds=seconds) for journal in journals))
+        for journal, (results, cut) in zip(journals, searched):
             all_results[journal] = results
+            if cut:
+                truncated.append(journal)
+        all_warnings = await run_indexed("compare_journals", lambda deadline: {
+            journal: db.warning_index.probe_many({r.journal_name for r in results})
+            for journal, results in all_results.items()
+        })
         
         # 生成对比表格
         output.append(f"\n{'期刊名称':<30} {'最新影响因子':<15} {'最新分区':<15} {'预警状态':<15}")
@@ -343,22 +971,20 @@ async def compare_journals(journal_list: str) -> str:
         
         for journal, results in all_results.items():
             if not results:
-                output.append(f"{journal:<30} {'无数据':<15} {'无数据':<15} {'无数据':<15}")
+                missing = "超时" if journal in truncated else "无数据"
+                output.append(f"{journal:<30} {missing:<15} {missing:<15} {missing:<15}")
                 continue
             
             # 获取最新数据
             latest_if = "无数据"
             latest_partition = "无数据"
-            warning_status = "正常"
+            warning_status = "⚠️预警" if all_warnings[journal] else "正常"
             
             for result in results:
                 if result.impact_factor:
                     latest_if = str(result.impact_factor)
                 if result.partition:
                     latest_partition = result.partition
-                if result.warning_status:
-                    warning_status = "⚠️预警"
-                    break
             
             output.append(f"{journal:<30} {latest_if:<15} {latest_partition:<15} {warning_status:<15}")
         
@@ -366,9 +992,20 @@ async def compare_journals(journal_list: str) -> str:
         output.append("\n💡 投稿建议:")
         for journal, results in all_results.items():
             if results:
-                has_warning = any(r.warning_status for r in results)
-                if has_warning:
+                if all_warnings[journal]:
                     output.append(f"  ❌ {journal}: 该期刊在预警名单中，不建议投稿")
+                    # 首次调用会构建相似度索引，超出期限时不列出相近期刊
+                    try:
+                        similar = await run_indexed("compare_journals",
+                                                    lambda deadline: db.similar_journals(journal, 3, True))
+                    except DeadlineExceeded:
+                        similar = None
+                        truncated.append(f"{journal}的相近期刊")
+                    if similar and similar[1]:
+                        alternatives = "、".join(
+                            f"{item['journal']}（IF {item['impact_factor'] or '-'}，{item['cas_partition'] or item['jcr_quartile'] or '-'}）"
+                            for item in similar[1])
+                        output.append(f"     可考虑同学科相近期刊: {alternatives}")
                 else:
                     latest_partition = None
                     for result in results:
@@ -383,12 +1020,17 @@ async def compare_journals(journal_list: str) -> str:
                     else:
                         output.append(f"  📝 {journal}: 可考虑投稿")
         
+        if truncated:
+            output.append(f"\n{TRUNCATED_NOTE}（{'、'.join(truncated)}）")
         return "\n".join(output)
     
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
     except Exception as e:
         return f"比较分析出错: {str(e)}"
 
 @app.tool()
+@scheduled("standard")
 async def filter_journals(
     partition: Optional[str] = None,
     min_if: Optional[float] = None,
@@ -397,7 +1039,12 @@ async def filter_journals(
     is_top: Optional[bool] = None,
     is_oa: Optional[bool] = None,
     year: str = "2025",
-    limit: int = 50
+    limit: int = 50,
+    include_facets: bool = False,
+    output_format: str = "text",
+    max_items: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    cursor: Optional[str] = None
 ) -> str:
     """
     按条件筛选期刊列表
@@ -411,151 +1058,712 @@ async def filter_journals(
         is_oa: 是否开放获取期刊
         year: 数据年份，默认2025
         limit: 返回结果数量限制，默认50
+        include_facets: 是否附带分面统计（符合条件的各分区/Top/OA期刊数量）
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格
+        max_items: 本页最多返回的期刊数（可选）
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限
+        cursor: 上一页返回的续页游标
 
     Returns:
         符合条件的期刊列表
     """
     try:
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-
-        # 优先使用中科院分区表（FQBJCR）
-        table_name = f"FQBJCR{year}"
-
-        # 检查表是否存在
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        if not cursor.fetchone():
-            # 尝试使用JCR表
-            table_name = f"JCR{year}"
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-            if not cursor.fetchone():
-                conn.close()
-                return f"未找到{year}年的期刊数据表"
-
-        # 获取表结构
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = [col[1] for col in cursor.fetchall()]
-
-        # 构建查询条件
-        conditions = []
-        params = []
-
-        # 分区筛选
-        if partition:
-            if '大类分区' in columns:
-                conditions.append("大类分区 LIKE ?")
-                params.append(f"%{partition}%")
-            elif any('Quartile' in col for col in columns):
-                quartile_col = [col for col in columns if 'Quartile' in col][0]
-                conditions.append(f'"{quartile_col}" LIKE ?')
-                params.append(f"%{partition}%")
-
-        # 学科筛选
-        if category:
-            if '大类' in columns:
-                conditions.append("大类 LIKE ?")
-                params.append(f"%{category}%")
-            elif 'Category' in columns:
-                conditions.append("Category LIKE ?")
-                params.append(f"%{category}%")
-
-        # Top期刊筛选
-        if is_top is not None and 'Top' in columns:
-            if is_top:
-                conditions.append("Top = '是'")
-            else:
-                conditions.append("(Top = '否' OR Top IS NULL)")
+        key = page_key("filter_journals", partition, min_if, max_if, category, is_top, is_oa, year, limit)
+        start = page_start(cursor, key)
+        return await run_indexed(
+            "filter_journals",
+            lambda deadline: _filter_journals(deadline, partition, min_if, max_if, category, is_top, is_oa,
+                                              year, limit, include_facets, output_format,
+                                              ResponseBudget.of(max_items, max_chars), start, key))
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
+    except Exception as e:
+        return f"筛选出错: {str(e)}"
 
-        # OA筛选
-        if is_oa is not None and 'Open Access' in columns:
-            if is_oa:
-                conditions.append('"Open Access" IS NOT NULL AND "Open Access" != \'\'')
-            else:
-                conditions.append('("Open Access" IS NULL OR "Open Access" = \'\')')
 
-        # 构建SQL
-        query = f"SELECT * FROM {table_name}"
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        query += f" LIMIT {limit}"
+def _filter_journals(deadline: QueryDeadline, partition: Optional[str], min_if: Optional[float],
+                     max_if: Optional[float], category: Optional[str], is_top: Optional[bool],
+                     is_oa: Optional[bool], year: str, limit: int, include_facets: bool, output_format: str,
+                     budget: ResponseBudget, start: int, page_id: str) -> str:
+    """在工作线程中执行筛选查询并按预算格式化从 start 开始的一页结果，超出执行期限时返回已取得的部分结果"""
+    conn = db.connect(deadline, [f"FQBJCR{year}", f"JCR{year}"])
+    cursor = conn.cursor()
 
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]
+    # 优先使用中科院分区表（FQBJCR）
+    table_name = f"FQBJCR{year}"
 
-        if not rows:
+    # 检查表是否存在
+    if not table_exists(conn, table_name):
+        # 尝试使用JCR表
+        table_name = f"JCR{year}"
+        if not table_exists(conn, table_name):
+            conn.close()
+            return f"未找到{year}年的期刊数据表"
+
+    # 获取表结构
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    columns = [col[1] for col in cursor.fetchall()]
+
+    # 构建查询条件
+    conditions = []
+    params = []
+
+    # 分区筛选
+    if partition:
+        if '大类分区' in columns:
+            conditions.append("大类分区 LIKE ?")
+            params.append(f"%{partition}%")
+        elif any('Quartile' in col for col in columns):
+            quartile_col = [col for col in columns if 'Quartile' in col][0]
+            conditions.append(f'"{quartile_col}" LIKE ?')
+            params.append(f"%{partition}%")
+
+    # 学科筛选
+    if category:
+        if '大类' in columns:
+            conditions.append("大类 LIKE ?")
+            params.append(f"%{category}%")
+        elif 'Category' in columns:
+            conditions.append("Category LIKE ?")
+            params.append(f"%{category}%")
+
+    # Top期刊筛选
+    if is_top is not None and 'Top' in columns:
+        if is_top:
+            conditions.append("Top = '是'")
+        else:
+            conditions.append("(Top = '否' OR Top IS NULL)")
+
+    # OA筛选
+    if is_oa is not None and 'Open Access' in columns:
+        if is_oa:
+            conditions.append('"Open Access" IS NOT NULL AND "Open Access" != \'\'')
+        else:
+            conditions.append('("Open Access" IS NULL OR "Open Access" = \'\')')
+
+    # 分面统计：无影响因子条件时直接使用预计算分面表，否则按条件聚合
+    facets = None
+    if include_facets:
+        source = 'FQBJCR' if table_name.startswith('FQBJCR') else 'JCR'
+        if min_if is None and max_if is None and db.facets:
+            facets = db.facets.counts(
+                source, year, category=category, partition=partition,
+                is_top=is_top if 'Top' in columns else None,
+                is_oa=is_oa if 'Open Access' in columns else None
+            )
+        else:
+            try:
+                facets = _aggregate_facets(cursor, table_name, columns, conditions, params, min_if, max_if)
+            except sqlite3.OperationalError as e:
+                if not deadline.interrupted(e):
+                    conn.close()
+                    raise
+
+    # 构建SQL
+    query = f"SELECT * FROM {table_name}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" LIMIT {limit}"
+
+    # 逐行读取，超出执行期限时保留已取得的行
+    rows = []
+    try:
+        if not deadline.check():
+            cursor.execute(query, params)
+            column_names = [desc[0] for desc in cursor.description]
+            for row in cursor:
+                rows.append(row)
+    except sqlite3.OperationalError as e:
+        if not deadline.interrupted(e):
             conn.close()
-            return "未找到符合条件的期刊"
+            raise
 
-        # 影响因子筛选（后处理，因为列名动态）
-        results = []
-        for row in rows:
-            row_dict = dict(zip(column_names, row))
+    if not rows:
+        conn.close()
+        return TRUNCATED_NOTE if deadline.truncated else "未找到符合条件的期刊"
 
-            # 查找影响因子
-            if_value = None
-            for key, value in row_dict.items():
-                if 'IF' in key and value is not None:
-                    try:
-                        if_value = float(value)
-                        break
-                    except (ValueError, TypeError):
-                        continue
+    # 影响因子筛选（后处理，因为列名动态）
+    results = []
+    for row in rows:
+        row_dict = dict(zip(column_names, row))
 
-            # 影响因子范围筛选
-            if min_if is not None and (if_value is None or if_value < min_if):
-                continue
-            if max_if is not None and (if_value is None or if_value > max_if):
-                continue
+        # 查找影响因子
+        if_value = None
+        for key, value in row_dict.items():
+            if 'IF' in key and value is not None:
+                try:
+                    if_value = float(value)
+                    break
+                except (ValueError, TypeError):
+                    continue
 
-            results.append(row_dict)
+        # 影响因子范围筛选
+        if min_if is not None and (if_value is None or if_value < min_if):
+            continue
+        if max_if is not None and (if_value is None or if_value > max_if):
+            continue
+
+        results.append(row_dict)
+
+    conn.close()
+
+    if not results:
+        return "未找到符合条件的期刊"
+
+    results = results[:limit]
+
+    def summarize(row):
+        partition_key = next((k for k in row if 'Quartile' in k), '')
+        partition_val = row.get('大类分区', row.get(partition_key, ''))
+        category_val = row.get('大类', row.get('Category', ''))
+        # 查找IF
+        if_val = next((str(value) for key, value in row.items() if 'IF' in key and value), '')
+        return row.get('Journal', '未知'), partition_val, if_val, category_val, row.get('Top', '')
+
+    if output_format.lower() == "compact":
+        columns = ["journal", "partition", "if", "category", "top"]
+        page = paginate(results[start:], lambda row: compact_row(summarize(row)), budget, start, len(results),
+                        page_id, reserve=compact_size(columns))
+        notes = [f"{name}={compact_cell(counts)}" for name, counts in facets.items()] if facets is not None else []
+        if deadline.truncated:
+            notes.append(TRUNCATED_NOTE)
+        return compact_table(f"filter_journals {year}", columns, page, notes)
+
+    def render(item):
+        i, row = item
+        journal, partition_val, if_val, category_val, top_val = summarize(row)
+        lines = [f"\n{i}. {journal}"]
+        if partition_val:
+            lines.append(f"   分区: {partition_val}")
+        if if_val:
+            lines.append(f"   IF: {if_val}")
+        if category_val:
+            lines.append(f"   学科: {category_val}")
+        if top_val == '是':
+            lines.append(f"   ⭐ Top期刊")
+        return "\n".join(lines)
+
+    # 格式化输出
+    output = [f"🔍 筛选结果（{year}年数据，共{len(results)}条）"]
+    output.append("=" * 50)
+
+    numbered = list(enumerate(results, 1))
+    page = paginate(numbered[start:], render, budget, start, len(results), page_id,
+                    reserve=1000 if facets else 200)
+    output.extend(page.chunks)
+    output.extend(text_footer(page))
+
+    if facets is not None:
+        output.extend(_format_facets(facets))
+    if deadline.truncated:
+        output.append(f"\n{TRUNCATED_NOTE}")
+
+    return "\n".join(output)
+
+
+def _aggregate_facets(cursor, table_name: str, columns: List[str], conditions: List[str],
+                      params: List[Any], min_if: Optional[float], max_if: Optional[float]) -> Dict[str, Dict]:
+    """按筛选条件在数据表上聚合分面计数（含影响因子条件时使用）"""
+    conditions = list(conditions)
+    params = list(params)
+
+    if_column = next((col for col in columns if 'IF' in col), None)
+    if min_if is not None or max_if is not None:
+        if not if_column:
+            return {"total": 0, "partition": {}, "top": {}, "oa": {}}
+        if min_if is not None:
+            conditions.append(f'CAST("{if_column}" AS REAL) >= ?')
+            params.append(min_if)
+        if max_if is not None:
+            conditions.append(f'CAST("{if_column}" AS REAL) <= ?')
+            params.append(max_if)
+
+    quartile_column = next((col for col in columns if 'Quartile' in col), None)
+    partition_column = '大类分区' if '大类分区' in columns else quartile_column
+    partition_expr = f'"{partition_column}"' if partition_column else "NULL"
+    top_expr = "CASE WHEN Top = '是' THEN 1 ELSE 0 END" if 'Top' in columns else "NULL"
+    oa_expr = ("CASE WHEN \"Open Access\" IS NOT NULL AND \"Open Access\" != '' THEN 1 ELSE 0 END"
+               if 'Open Access' in columns else "NULL")
+
+    query = f"SELECT {partition_expr}, {top_expr}, {oa_expr}, COUNT(*) FROM {table_name}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " GROUP BY 1, 2, 3"
+
+    facets = {"total": 0, "partition": {}, "top": {}, "oa": {}}
+    for partition_val, top, oa, count in cursor.execute(query, params).fetchall():
+        add_facet_count(facets, partition_val, top, oa, count)
+    return facets
+
+
+def _format_facets(facets: Dict[str, Dict]) -> List[str]:
+    """格式化分面统计"""
+    output = [f"\n📊 分面统计（共{facets['total']}个期刊符合条件）"]
+    labels = [("partition", "分区"), ("top", "Top期刊"), ("oa", "开放获取")]
+    for key, label in labels:
+        if facets[key]:
+            counts = " | ".join(f"{name}: {count}" for name, count in sorted(facets[key].items()))
+            output.append(f"   {label}: {counts}")
+    return output
+
+
+@app.tool()
+@scheduled("standard")
+async def query_journals(
+    where: Optional[str] = None,
+    year: str = "2025",
+    order_by: str = "if",
+    descending: bool = True,
+    limit: int = 20,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    explain: bool = False,
+    output_format: str = "text",
+    max_chars: Optional[int] = None
+) -> str:
+    """
+    多条件组合查询期刊（跨JCR、中科院分区与预警名单）
+
+    Args:
+        where: 条件表达式，用AND连接，如"partition<=1 AND quartile=Q1 AND if>10 AND warned=0"；
+               含 AND 或 & 的值可加引号，如 category~"Science & Technology"。
+               字段: if, quartile, rank, jcr_category, partition, category, top, oa, warned, journal；
+               运算符: = != > >= < <= ~（包含）
+        year: 数据年份，默认2025（JCR数据取不晚于该年份的最新版本）
+        order_by: 排序字段: if, quartile, rank, partition, journal
+        descending: 是否降序，默认True
+        limit: 每页数量，默认20
+        offset: 偏移量分页（未提供cursor时生效）
+        cursor: 上一页返回的游标，用于键集分页
+        explain: 仅返回查询计划，不执行查询
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限；超出时游标从最后显示的一行之后继续
+
+    Returns:
+        符合条件的期刊列表或查询计划
+    """
+    try:
+        return await run_with_deadline(
+            lambda deadline: _query_journals(deadline, where, year, order_by, descending, limit, offset,
+                                             cursor, explain, output_format, ResponseBudget.of(None, max_chars)),
+            tool_deadline("query_journals"))
+    except QueryError as e:
+        return f"查询条件错误: {str(e)}"
+    except Exception as e:
+        return f"查询出错: {str(e)}"
+
+
+def _query_journals(deadline: QueryDeadline, where: Optional[str], year: str, order_by: str, descending: bool,
+                    limit: int, offset: int, cursor: Optional[str], explain: bool, output_format: str,
+                    budget: ResponseBudget) -> str:
+    """在工作线程中规划并执行组合查询，超出执行期限时返回已取得的部分结果及续查游标"""
+    conn = db.connect(deadline)
+    try:
+        engine = JournalQueryEngine(conn)
+        if not engine.available():
+            return "未找到 journal_metrics 指标表，请先同步数据库或运行 python jcr_index.py 构建派生表"
+
+        try:
+            plan = engine.plan(year, parse_predicates(where), order_by=order_by, descending=descending,
+                               limit=limit, offset=offset, cursor=cursor)
+        except sqlite3.OperationalError as e:
+            if deadline.interrupted(e):
+                return TRUNCATED_NOTE
+            raise
+
+        if explain:
+            output = ["🧭 查询计划"]
+            output.append("=" * 50)
+            output.extend(engine.explain(plan))
+            return "\n".join(output)
 
+        rows, next_cursor = engine.execute(plan, deadline)
+    finally:
         conn.close()
 
-        if not results:
-            return "未找到符合条件的期刊"
+    if not rows:
+        return TRUNCATED_NOTE if deadline.truncated else "未找到符合条件的期刊"
+
+    first = plan.start + 1
+    numbered = list(enumerate(rows, first))
+
+    def finish(page: Page) -> Optional[str]:
+        # 字符预算在本页中途截断时，游标从最后显示的一行之后继续
+        if len(page.items) < len(rows):
+            return engine.cursor_after(plan, page.items[-1][1], page.end)
+        return next_cursor
+
+    if output_format.lower() == "compact":
+        columns = ["journal", "if", "jcr_year", "quartile", "partition", "category", "top", "warned"]
+
+        def render_row(item):
+            row = item[1]
+            return compact_row([row['journal'], row['jcr_if'], row['jcr_year'], row['jcr_quartile'],
+                                row['cas_partition'], row['cas_category'], row['cas_top'], row['warned']])
+
+        page = paginate(numbered, render_row, budget, first - 1, reserve=compact_size(columns))
+        # 键集分页不统计总数
+        page.total = None
+        page.cursor = finish(page)
+        notes = [TRUNCATED_NOTE] if deadline.truncated else []
+        return compact_table(f"query_journals {year}", columns, page, notes)
+
+    def render(item):
+        i, row = item
+        lines = [f"\n{i}. {row['journal']}"]
+        if row['jcr_if'] is not None:
+            lines.append(f"   IF: {row['jcr_if']}（JCR{row['jcr_year']}）")
+        if row['jcr_quartile']:
+            lines.append(f"   JCR分区: Q{row['jcr_quartile']}")
+        if row['cas_partition']:
+            lines.append(f"   中科院分区: {row['cas_partition']}区")
+        if row['cas_category']:
+            lines.append(f"   学科: {row['cas_category']}")
+        if row['cas_top']:
+            lines.append(f"   ⭐ Top期刊")
+        if row['warned']:
+            lines.append(f"   ⚠️ 存在预警记录")
+        return "\n".join(lines)
+
+    page = paginate(numbered, render, budget, first - 1, reserve=300)
+    next_cursor = finish(page)
+
+    output = [f"🔍 查询结果（{year}年数据，本页{len(page.items)}条）"]
+    output.append("=" * 50)
+    output.extend(page.chunks)
+
+    if deadline.truncated:
+        output.append(f"\n{TRUNCATED_NOTE}，可用下方游标继续")
+    if next_cursor:
+        output.append(f"\n💡 下一页: cursor=\"{next_cursor}\"")
+
+    return "\n".join(output)
+
+
+@app.tool()
+@scheduled("standard")
+async def rank_journals(
+    metric: str = "if",
+    year: str = "2025",
+    top_k: int = 20,
+    group_by: str = "category",
+    category: Optional[str] = None,
+    exclude_warned: bool = False,
+    output_format: str = "text",
+    max_items: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> str:
+    """
+    按学科分组的期刊排名（Top-K），附带学科内百分位
+
+    Args:
+        metric: 排名指标: "if"（影响因子）、"if_change"（影响因子变化）、"rank"（JCR学科内排名比例，越小越好）
+        year: 数据年份，默认2025
+        top_k: 每个学科返回的期刊数量，默认20
+        group_by: 分组方式: "category"（中科院大类）或 "jcr_category"（JCR学科）
+        category: 仅返回包含该关键词的学科（可选）
+        exclude_warned: 是否排除预警期刊
+        output_format: 输出格式，"text"、"compact"（紧凑表格）或"json"（完整结果，不受预算限制）
+        max_items: 本页最多返回的学科数（可选）
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限；可在学科的名次之间截断，续页从截断处继续
+        cursor: 上一页返回的续页游标
 
-        # 格式化输出
-        output = [f"🔍 筛选结果（{year}年数据，共{len(results)}条）"]
+    Returns:
+        各学科的Top-K期刊排名
+    """
+    try:
+        key = page_key("rank_journals", metric, year, top_k, group_by, category, exclude_warned)
+        start = page_start(cursor, key)
+
+        def rank(deadline: QueryDeadline) -> Optional[Dict]:
+            store = db.ranking_store(year)
+            if not store.size:
+                return None
+            deadline.ensure()
+            return store.top_k(metric, max(top_k, 1), group_by=group_by,
+                               category=category, exclude_warned=exclude_warned)
+
+        ranking = await run_indexed("rank_journals", rank)
+        if ranking is None:
+            return f"未找到{year}年的期刊指标数据，请先同步数据库或运行 python jcr_index.py 构建派生表"
+        if not ranking:
+            return "未找到符合条件的学科"
+
+        if output_format.lower() == "json":
+            return json.dumps({str(k): v for k, v in ranking.items()}, ensure_ascii=False, indent=2)
+
+        # 按名次逐行分页，字符预算可在学科内截断
+        rows = [(group, i, entry) for group, entries in ranking.items() for i, entry in enumerate(entries, 1)]
+        budget = ResponseBudget.of(max_items, max_chars)
+
+        if output_format.lower() == "compact":
+            columns = ["group", "rank", "journal", "value", "percentile", "warned"]
+
+            def render_row(row):
+                group, i, entry = row
+                return compact_row([group, i, entry['journal'], entry['value'], entry['percentile'], entry['warned']])
+
+            page = paginate(rows[start:], render_row, budget, start, len(rows), key,
+                            reserve=compact_size(columns), group=lambda row: row[0])
+            return compact_table(f"rank_journals {year} {metric} top{top_k}", columns, page)
+
+        current = [None]
+
+        def render(row):
+            group, i, entry = row
+            lines = []
+            # 每个学科的第一行（或在上一页中途截断的学科在本页的第一行）带学科标题
+            if current[0] != group:
+                current[0] = group
+                lines.append(f"\n📖 {group}（共{entry['category_size']}个期刊）" + ("" if i == 1 else "（续）"))
+            value = f"{entry['value']:.2%}" if metric == "rank" else entry['value']
+            line = f"  {i}. {entry['journal']}: {value}（超过学科内{entry['percentile']}%）"
+            if entry['warned']:
+                line += " ⚠️预警"
+            lines.append(line)
+            return "\n".join(lines)
+
+        output = [f"🏆 {year}年 各学科{RANK_METRICS[metric][0]}排名（Top {top_k}）"]
         output.append("=" * 50)
 
-        for i, row in enumerate(results[:limit], 1):
-            journal = row.get('Journal', '未知')
-            partition_val = row.get('大类分区', row.get([k for k in row.keys() if 'Quartile' in k][0] if any('Quartile' in k for k in row.keys()) else '', ''))
-            category_val = row.get('大类', row.get('Category', ''))
-            top_val = row.get('Top', '')
-
-            # 查找IF
-            if_val = ''
-            for key, value in row.items():
-                if 'IF' in key and value:
-                    if_val = str(value)
-                    break
+        page = paginate(rows[start:], render, budget, start, len(rows), key, reserve=300, group=lambda row: row[0])
+        output.extend(page.chunks)
+        output.extend(text_footer(page, "条排名"))
+
+        return "\n".join(output)
+
+    except QueryError as e:
+        return f"排名参数错误: {str(e)}"
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
+    except Exception as e:
+        return f"排名查询出错: {str(e)}"
+
+
+@app.tool()
+@scheduled("interactive")
+async def similar_journals(
+    journal_name: str,
+    k: int = 10,
+    same_category: bool = False,
+    include_warned: bool = False,
+    output_format: str = "text",
+    max_chars: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> str:
+    """
+    查找与指定期刊指标相近的期刊，可用于为预警期刊寻找替代投稿选择
+
+    Args:
+        journal_name: 期刊名称（支持缩写和其他写法）
+        k: 返回数量，默认10，最多100
+        same_category: 是否只在同一中科院大类中查找
+        include_warned: 是否包含预警期刊，默认排除
+        output_format: 输出格式，"text"、"compact"（紧凑表格）或"json"（完整结果，不受预算限制）
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限
+        cursor: 上一页返回的续页游标
+
+    Returns:
+        按相似度排序的期刊列表
+    """
+    try:
+        key = page_key("similar_journals", normalize_title(journal_name), k, same_category, include_warned)
+        start = page_start(cursor, key)
+        found = await run_indexed("similar_journals", lambda deadline: db.similar_journals(
+            journal_name, min(max(k, 1), 100), same_category, include_warned))
+        if found is None:
+            return f"未找到期刊 '{journal_name}' 的指标数据"
+        query, results = found
+
+        if output_format.lower() == "json":
+            return json.dumps({"query": query, "similar": results}, ensure_ascii=False, indent=2)
+
+        budget = ResponseBudget.of(None, max_chars)
+        if output_format.lower() == "compact":
+            columns = ["journal", "similarity", "category", "if", "quartile", "partition", "top", "warned"]
+
+            def render_row(item):
+                return compact_row([item['journal'], item.get('similarity'), item['category'], item['impact_factor'],
+                                    item['jcr_quartile'], item['cas_partition'], item['cas_top'], item['warned']])
+
+            page = paginate(results[start:], render_row, budget, start, len(results), key,
+                            reserve=compact_size(columns) + 200)
+            return compact_table(f"similar_journals {query['journal']}", columns, page,
+                                 [f"query={render_row(query)}"])
+
+        def describe(item):
+            parts = [f"IF {item['impact_factor']}" if item['impact_factor'] is not None else "IF -"]
+            parts.extend(value for value in (item['jcr_quartile'], item['cas_partition']) if value)
+            if item['cas_top']:
+                parts.append("Top")
+            return " | ".join(parts)
 
-            output.append(f"\n{i}. {journal}")
-            if partition_val:
-                output.append(f"   分区: {partition_val}")
-            if if_val:
-                output.append(f"   IF: {if_val}")
-            if category_val:
-                output.append(f"   学科: {category_val}")
-            if top_val == '是':
-                output.append(f"   ⭐ Top期刊")
+        output = [f"🔍 与 {query['journal']} 相似的期刊"]
+        output.append("=" * 50)
+        output.append(f"📖 {query['category'] or '未分类'} | {describe(query)}" + (" ⚠️预警" if query['warned'] else ""))
+        if not results:
+            return "\n".join(output + ["\n未找到相似期刊"])
+
+        def render(numbered):
+            i, item = numbered
+            line = f"  {i}. {item['journal']}（相似度 {item['similarity']}）: {item['category'] or '未分类'} | {describe(item)}"
+            if item['warned']:
+                line += " ⚠️预警"
+            return line
+
+        output.append("")
+        page = paginate(list(enumerate(results, 1))[start:], render, budget, start, len(results), key, reserve=300)
+        output.extend(page.chunks)
+        output.extend(text_footer(page, "个期刊"))
 
         return "\n".join(output)
 
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
     except Exception as e:
-        return f"筛选出错: {str(e)}"
+        return f"相似期刊查询出错: {str(e)}"
 
 
 @app.tool()
-async def batch_query_journals(journal_names: str, output_format: str = "text") -> str:
+@scheduled("standard")
+async def journal_movers(
+    from_year: str = "2023",
+    to_year: str = "2025",
+    source: str = "cas",
+    metric: str = "partition",
+    direction: str = "down",
+    category: Optional[str] = None,
+    from_partition: Optional[int] = None,
+    min_change: Optional[float] = None,
+    limit: int = 50,
+    output_format: str = "text",
+    max_chars: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> str:
+    """
+    整表比较两个年份，列出分区或影响因子升降最大的期刊，并按学科汇总
+
+    Args:
+        from_year: 比较的起始年份，默认2023
+        to_year: 比较的目标年份，默认2025
+        source: 数据源: "cas"（中科院分区表）或 "jcr"（JCR年度表）
+        metric: 比较指标: "partition"（分区）、"if"（影响因子）、"if_pct"（影响因子变化率）、"rank"（JCR学科排名比例）
+        direction: 变化方向: "down"（下降）、"up"（上升）或 "both"
+        category: 仅统计学科包含该关键词的期刊（可选）
+        from_partition: 仅统计起始年份处于该分区的期刊，如 1 表示原1区/Q1（可选）
+        min_change: 最小变化幅度，默认只要有变化即计入（可选）
+        limit: 返回的期刊数量，默认50
+        output_format: 输出格式，"text"、"compact"（紧凑表格）或"json"（完整结果，不受预算限制）
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限
+        cursor: 上一页返回的续页游标
+
+    Returns:
+        按变化幅度排序的期刊列表与各学科升降统计
+    """
+    try:
+        key = page_key("journal_movers", from_year, to_year, source, metric, direction, category, from_partition,
+                       min_change, limit)
+        start = page_start(cursor, key)
+
+        def compare(deadline: QueryDeadline) -> Tuple[List[str], Optional[Dict]]:
+            old = db.metric_snapshot(source, from_year)
+            new = db.metric_snapshot(source, to_year)
+            missing = [year for year, snapshot in ((from_year, old), (to_year, new)) if not snapshot.size]
+            if missing:
+                return missing, None
+            deadline.ensure()
+            return [], compare_snapshots(old, new, metric=metric, direction=direction, category=category,
+                                         from_partition=from_partition, min_change=min_change, limit=max(limit, 0))
+
+        missing, report = await run_indexed("journal_movers", compare)
+        if missing:
+            return f"未找到{'、'.join(missing)}年的{MOVER_SOURCES[source][0]}数据，请先同步数据库或运行 python jcr_index.py 构建派生表"
+
+        if output_format.lower() == "json":
+            return json.dumps(report, ensure_ascii=False, indent=2)
+
+        movers = report["movers"]
+        budget = ResponseBudget.of(None, max_chars)
+        if output_format.lower() == "compact":
+            columns = ["journal", "change", "partition_from", "partition_to", "if_from", "if_to", "warned"]
+
+            def render_row(item):
+                return compact_row([item['journal'], item['change'], item['partition_from'], item['partition_to'],
+                                    item['if_from'], item['if_to'], item['warned']])
+
+            page = paginate(movers[start:], render_row, budget, start, len(movers), key,
+                            reserve=compact_size(columns) + 100)
+            notes = [f"compared={report['compared']} added={report['added']} removed={report['removed']} "
+                     f"matched={report['matched']}"]
+            return compact_table(f"journal_movers {source} {metric} {from_year}->{to_year} {direction}",
+                                 columns, page, notes)
+
+        label = MOVER_SOURCES[source][0]
+        arrow = {"up": "上升", "down": "下降", "both": "变化"}[direction]
+        unit = "区" if source == "cas" else ""
+        output = [f"📉 {from_year} → {to_year} {label} {MOVER_METRICS[metric]}（{arrow}）"]
+        output.append("=" * 50)
+        output.append(f"共比较 {report['compared']} 种期刊（新增 {report['added']}，移除 {report['removed']}），"
+                      f"符合条件 {report['matched']} 种")
+        if not report["movers"]:
+            return "\n".join(output + ["\n未找到符合条件的期刊"])
+
+        def partition_text(value):
+            if value is None:
+                return "-"
+            return f"{value}{unit}" if source == "cas" else f"Q{value}"
+
+        def render(numbered):
+            i, item = numbered
+            if metric == "if_pct":
+                change = f"{item['change']:+.1%}"
+            elif metric == "rank":
+                change = f"{item['change']:+.2%}"
+            else:
+                change = f"{item['change']:+g}"
+            line = (f"  {i}. {item['journal']}: {change}"
+                    f"（分区 {partition_text(item['partition_from'])} → {partition_text(item['partition_to'])}，"
+                    f"IF {item['if_from'] if item['if_from'] is not None else '-'} → "
+                    f"{item['if_to'] if item['if_to'] is not None else '-'}）")
+            if item["warned"]:
+                line += " ⚠️预警"
+            return line
+
+        categories = ["\n📖 学科分布（上升/下降）:"]
+        for entry in report["categories"][:20]:
+            categories.append(f"  • {entry['category'] or '未分类'}: ↑{entry['up']} ↓{entry['down']}")
+
+        output.append(f"\n📋 变化最大的 {len(movers)} 种期刊:")
+        page = paginate(list(enumerate(movers, 1))[start:], render, budget, start, len(movers), key,
+                        reserve=sum(len(line) + 1 for line in categories) + 300)
+        output.extend(page.chunks)
+        output.extend(text_footer(page, "种期刊"))
+        output.extend(categories)
+
+        return "\n".join(output)
+
+    except QueryError as e:
+        return f"比较参数错误: {str(e)}"
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
+    except Exception as e:
+        return f"比较出错: {str(e)}"
+
+
+@app.tool()
+@scheduled("bulk")
+async def batch_query_journals(journal_names: str, output_format: str = "text", max_items: Optional[int] = None,
+                               max_chars: Optional[int] = None, cursor: Optional[str] = None) -> str:
     """
     批量查询多个期刊信息，支持导出为JSON格式
 
     Args:
         journal_names: 期刊名称列表，用逗号或换行分隔
-        output_format: 输出格式，"text"为文本格式，"json"为JSON格式（方便导出）
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格，"json"为JSON格式（方便导出，不分页）
+        max_items: 本页最多查询的期刊数（可选），其余期刊留到下一页再查询
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限
+        cursor: 上一页返回的续页游标
 
     Returns:
         批量查询结果
@@ -571,10 +1779,33 @@ async def batch_query_journals(journal_names: str, output_format: str = "text")
         if not names:
             return "请提供至少一个期刊名称"
 
+        output_format = output_format.lower()
+        key = page_key("batch_query_journals", names)
+        start = 0
+        # JSON 为完整导出；其余格式只查询本页范围内的期刊
+        queued = names
+        if output_format != "json":
+            start = page_start(cursor, key)
+            queued = names[start:start + max_items] if max_items and max_items > 0 else names[start:]
+
         results_data = []
+        # 整批共用一个执行期限，并限制并行查询数；到期后尚未开始的查询直接标记为截断
+        ends_at = time.monotonic() + tool_deadline("batch_query_journals")
+        parallelism = asyncio.Semaphore(BATCH_PARALLELISM)
 
-        for name in names:
-            journal_results = db.search_journal(name)
+        async def search(name: str) -> Tuple[List[JournalInfo], bool]:
+            async with parallelism:
+                remaining = ends_at - time.monotonic()
+                if remaining <= 0:
+                    return [], True
+                return await db.search_journal_async(name, seconds=remaining)
+
+        searched = await asyncio.gather(*(search(name) for name in queued))
+        truncated = [name for name, (_, partial) in zip(queued, searched) if partial]
+        # 预警名单索引首次访问时在工作线程中构建
+        warning_index = await run_indexed("batch_query_journals", lambda deadline: db.warning_index)
+
+        for name, (journal_results, _) in zip(queued, searched):
 
             if journal_results:
                 # 获取最新数据
@@ -605,100 +1836,389 @@ async def batch_query_journals(journal_names: str, output_format: str = "text")
                             latest_info["category"] = r.category
                     if r.warning_status:
                         year_data["warning"] = r.warning_status
-                        latest_info["warning"] = True
 
                     latest_info["years_data"].append(year_data)
 
+                warnings = warning_index.probe_many({r.journal_name for r in journal_results})
+                if warnings:
+                    latest_info["warning"] = True
+                    latest_info["warning_years"] = {
+                        y: level for levels in warnings.values() for y, level in levels.items()
+                    }
+
                 results_data.append(latest_info)
             else:
                 results_data.append({
                     "query": name,
                     "found": False
                 })
+            if name in truncated:
+                results_data[-1]["truncated"] = True
 
         # 输出格式
-        if output_format.lower() == "json":
+        if output_format == "json":
             return json.dumps(results_data, ensure_ascii=False, indent=2)
 
-        # 文本格式输出
-        output = [f"📋 批量查询结果（共{len(names)}个期刊）"]
-        output.append("=" * 50)
+        budget = ResponseBudget.of(max_items, max_chars)
+        if output_format == "compact":
+            columns = ["query", "found", "journal", "if", "partition", "category", "warning"]
+
+            def render_row(data):
+                return compact_row([data["query"], "timeout" if data.get("truncated") else data["found"],
+                                    data.get("journal_name"), data.get("impact_factor"), data.get("partition"),
+                                    data.get("category"), data.get("warning_years", data.get("warning"))])
 
-        for data in results_data:
+            page = paginate(results_data, render_row, budget, start, len(names), key, reserve=compact_size(columns))
+            notes = [f"{TRUNCATED_NOTE}（{len(truncated)}个期刊）"] if truncated else []
+            return compact_table("batch_query_journals", columns, page, notes)
+
+        def render(data):
             if data["found"]:
-                output.append(f"\n✅ {data['journal_name']}")
+                lines = [f"\n✅ {data['journal_name']}"]
                 if data["impact_factor"]:
-                    output.append(f"   IF: {data['impact_factor']}")
+                    lines.append(f"   IF: {data['impact_factor']}")
                 if data["partition"]:
-                    output.append(f"   分区: {data['partition']}")
+                    lines.append(f"   分区: {data['partition']}")
                 if data["category"]:
-                    output.append(f"   学科: {data['category']}")
+                    lines.append(f"   学科: {data['category']}")
                 if data["warning"]:
-                    output.append(f"   ⚠️ 存在预警记录")
-            else:
-                output.append(f"\n❌ {data['query']} - 未找到")
+                    lines.append(f"   ⚠️ 存在预警记录")
+                return "\n".join(lines)
+            elif data.get("truncated"):
+                return f"\n⏱️ {data['query']} - 超出执行期限，未完成查询"
+            return f"\n❌ {data['query']} - 未找到"
+
+        # 文本格式输出
+        output = [f"📋 批量查询结果（共{len(names)}个期刊）"]
+        output.append("=" * 50)
+
+        page = paginate(results_data, render, budget, start, len(names), key, reserve=400)
+        output.extend(page.chunks)
+        output.extend(text_footer(page, "个期刊"))
 
+        if truncated:
+            output.append(f"\n{TRUNCATED_NOTE}（{len(truncated)}个期刊）")
         output.append("\n" + "=" * 50)
         output.append("💡 提示: 使用 output_format='json' 可获取JSON格式，方便导出到Excel")
 
         return "\n".join(output)
 
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
     except Exception as e:
         return f"批量查询出错: {str(e)}"
 
 
 @app.tool()
-async def check_data_update() -> str:
+@scheduled("interactive")
+async def lookup_by_issn(issns: str, output_format: str = "text", max_items: Optional[int] = None,
+                         max_chars: Optional[int] = None, cursor: Optional[str] = None) -> str:
+    """
+    按ISSN/eISSN批量反查期刊信息
+
+    Args:
+        issns: ISSN列表，用逗号、空格或换行分隔，支持带或不带连字符（如"0028-0836, 14764687"）
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格，"json"为JSON格式（不分页）
+        max_items: 本页最多返回的条目数（可选）
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限
+        cursor: 上一页返回的续页游标
+
+    Returns:
+        每个ISSN对应的期刊及最新影响因子、分区、预警信息
+    """
+    try:
+        queries = [item for item in re.split(r'[\s,;]+', issns) if item]
+        if not queries:
+            return "请提供至少一个ISSN"
+
+        results = await run_indexed("lookup_by_issn", lambda deadline: db.lookup_issns(queries))
+
+        if output_format.lower() == "json":
+            return json.dumps(results, ensure_ascii=False, indent=2)
+
+        key = page_key("lookup_by_issn", queries)
+        start = page_start(cursor, key)
+        budget = ResponseBudget.of(max_items, max_chars)
+        if output_format.lower() == "compact":
+            columns = ["query", "issn", "journal", "year", "if", "quartile", "partition", "category", "warning"]
+
+            def render_row(data):
+                return compact_row([data["query"], data["issn"], data.get("journal_name"), data.get("year"),
+                                    data.get("impact_factor"), data.get("jcr_quartile"), data.get("cas_partition"),
+                                    data.get("category"), data.get("warning")])
+
+            page = paginate(results[start:], render_row, budget, start, len(results), key,
+                            reserve=compact_size(columns))
+            return compact_table("lookup_by_issn", columns, page)
+
+        def render(data):
+            if not data["found"]:
+                reason = "格式无效" if data["issn"] is None else "未找到"
+                return f"\n❌ {data['query']} - {reason}"
+            lines = [f"\n✅ {data['query']} → {data['journal_name']}"]
+            if data["impact_factor"] is not None:
+                lines.append(f"   IF: {data['impact_factor']}")
+            partitions = [p for p in (data["jcr_quartile"], data["cas_partition"]) if p]
+            if partitions:
+                lines.append(f"   分区: {' / '.join(partitions)}（{data['year']}年）")
+            if data["category"]:
+                lines.append(f"   学科: {data['category']}")
+            if data["warning"]:
+                lines.append(f"   ⚠️ 存在预警记录")
+            return "\n".join(lines)
+
+        found = sum(1 for r in results if r["found"])
+        output = [f"🔎 ISSN反查结果（共{len(set(queries))}个ISSN，命中{found}条）"]
+        output.append("=" * 50)
+
+        page = paginate(results[start:], render, budget, start, len(results), key, reserve=300)
+        output.extend(page.chunks)
+        output.extend(text_footer(page))
+
+        return "\n".join(output)
+
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
+    except Exception as e:
+        return f"ISSN反查出错: {str(e)}"
+
+
+def _annotate_bibliography(source: str, bib_format: str, limit: int, start: int = 0) -> Tuple[Dict, List[Dict]]:
+    """流式标注参考文献，返回(汇总, 从第start条起的limit条标注)"""
+    summary = AnnotationSummary()
+    shown = []
+    for i, (entry, annotation) in enumerate(annotate_entries(iter_entries(source, bib_format), db.resolve_venues)):
+        summary.add(entry, annotation)
+        if i >= start and len(shown) < limit:
+            shown.append(annotation_record(entry, annotation))
+    return summary.to_dict(), shown
+
+
+@app.tool()
+@scheduled("bulk")
+async def annotate_bibliography(source: str, bib_format: str = "auto", output_format: str = "text",
+                                limit: int = 200, max_chars: Optional[int] = None,
+                                cursor: Optional[str] = None) -> str:
+    """
+    标注参考文献列表中每条文献的期刊信息（影响因子、分区、预警）
+
+    Args:
+        source: BibTeX / RIS / CSL-JSON 文本（不接受文件路径）
+        bib_format: 格式，"auto"（默认，自动识别）、"bibtex"、"ris"、"csl-json"
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格，"json"为JSON格式（不受字符预算限制）
+        limit: 响应中逐条列出的条目数上限，默认200
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限（json格式除外）
+        cursor: 上一页返回的续页游标，从游标处继续列出逐条标注
+
+    Returns:
+        汇总（分区分布、预警条目、未找到的期刊）与逐条标注
+    """
+    try:
+        key = page_key("annotate_bibliography", source, bib_format)
+        start = page_start(cursor, key)
+        summary, shown = await asyncio.to_thread(_annotate_bibliography, source, bib_format, max(limit, 0), start)
+
+        if output_format.lower() == "json":
+            return json.dumps({"summary": summary, "entries": shown}, ensure_ascii=False, indent=2)
+
+        budget = ResponseBudget.of(limit, max_chars)
+        total = summary["total_entries"]
+        if output_format.lower() == "compact":
+            columns = ["key", "found", "journal", "if", "quartile", "partition", "warning"]
+
+            def render_row(record):
+                return compact_row([record["key"], record["found"],
+                                    record["journal_name"] if record["found"] else record["journal"] or record["issns"],
+                                    record.get("impact_factor"), record.get("jcr_quartile"),
+                                    record.get("cas_partition"), record.get("warning")])
+
+            notes = [f"entries={total} resolved={summary['resolved']} unresolved={summary['unresolved']} "
+                     f"no_venue={summary['entries_without_venue']} journals={summary['distinct_journals']}",
+                     f"cas={compact_cell(summary['cas_partitions'])} jcr={compact_cell(summary['jcr_quartiles'])}"]
+            page = paginate(shown, render_row, budget, start, total, key,
+                            reserve=compact_size(columns) + sum(len(note) + 3 for note in notes))
+            return compact_table("annotate_bibliography", columns, page, notes)
+
+        output = [f"📚 参考文献期刊标注（共{summary['total_entries']}条，"
+                  f"命中{summary['resolved']}条，未找到{summary['unresolved']}条，"
+                  f"无期刊信息{summary['entries_without_venue']}条，涉及{summary['distinct_journals']}种期刊）"]
+        output.append("=" * 50)
+        if summary["cas_partitions"]:
+            output.append("🏆 中科院分区: " + " | ".join(f"{k} {v}条" for k, v in summary["cas_partitions"].items()))
+        if summary["jcr_quartiles"]:
+            output.append("📊 JCR分区: " + " | ".join(f"{k} {v}条" for k, v in summary["jcr_quartiles"].items()))
+        if summary["warned_entries"]:
+            output.append(f"\n⚠️ 预警期刊条目: {summary['warned_entries']}条（{len(summary['warned'])}种期刊）")
+            for name, item in summary["warned"].items():
+                levels = ", ".join(f"{year}: {level}" for year, level in item["warning"].items())
+                keys = ", ".join(item["keys"]) + (" 等" if item["entries"] > len(item["keys"]) else "")
+                output.append(f"  • {name}（{levels}）×{item['entries']}: {keys}")
+        if summary["unresolved_venues"]:
+            output.append(f"\n❓ 未找到的期刊:")
+            for name, count in summary["unresolved_venues"].items():
+                output.append(f"  • {name} ×{count}")
+
+        def render(record):
+            if not record["found"]:
+                venue = record["journal"] or ", ".join(record["issns"])
+                return f"  {'❓' if venue else '➖'} [{record['key']}] {venue or '无期刊信息'}"
+            details = [f"IF {record['impact_factor']}" if record["impact_factor"] is not None else None,
+                       record["jcr_quartile"], record["cas_partition"]]
+            icon = "⚠️" if record["warning"] else "✅"
+            return (f"  {icon} [{record['key']}] {record['journal_name']} — "
+                    + (" | ".join(d for d in details if d) or "无指标"))
+
+        # 汇总部分总是完整返回，逐条标注在剩余预算内列出
+        page = paginate(shown, render, budget, start, total, key,
+                        reserve=sum(len(line) + 1 for line in output) + 300)
+        if page.items:
+            output.append(f"\n📋 逐条标注（第{page.start + 1}-{page.end}条）:")
+        output.extend(page.chunks)
+        output.extend(text_footer(page))
+        return "\n".join(output)
+
+    except Exception as e:
+        return f"参考文献标注出错: {str(e)}"
+
+
+@app.tool()
+@scheduled("interactive")
+async def suggest_journals(prefix: str, limit: int = 10, output_format: str = "text",
+                           max_chars: Optional[int] = None) -> str:
+    """
+    刊名自动补全：返回与前缀匹配的期刊，按影响因子排序
+
+    Args:
+        prefix: 刊名前缀或缩写，每个词可只写开头（如"IEEE Trans Pat"、"Nat Comm"）
+        limit: 返回数量，默认10
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格，"json"为JSON格式
+        max_chars: 最多返回的字符数，默认20000，0表示不限（json格式除外）
+
+    Returns:
+        补全的期刊名称及最新影响因子、分区、预警标记
+    """
+    try:
+
+        def suggest(deadline: QueryDeadline) -> List[Dict]:
+            suggestions = db.suggester.suggest(prefix, min(max(limit, 1), 100))
+            if not suggestions:
+                return []
+            profiles = db.latest_profiles
+            warnings = db.warning_index
+            results = []
+            for journal_id, title, impact_factor in suggestions:
+                profile = profiles.get(normalize_title(title), {})
+                results.append({
+                    "journal_id": journal_id,
+                    "journal_name": title,
+                    "impact_factor": impact_factor,
+                    "jcr_quartile": f"Q{profile['jcr_quartile']}" if profile.get("jcr_quartile") else None,
+                    "cas_partition": f"{profile['cas_partition']}区" if profile.get("cas_partition") else None,
+                    "warned": warnings.is_warned(title),
+                })
+            return results
+
+        results = await run_indexed("suggest_journals", suggest)
+        if not results:
+            return f"未找到以 '{prefix}' 开头的期刊"
+
+        if output_format.lower() == "json":
+            return json.dumps(results, ensure_ascii=False, indent=2)
+
+        budget = ResponseBudget.of(None, max_chars)
+        if output_format.lower() == "compact":
+            columns = ["journal", "if", "quartile", "partition", "warned"]
+            page = paginate(results, lambda data: compact_row([data["journal_name"], data["impact_factor"],
+                                                               data["jcr_quartile"], data["cas_partition"],
+                                                               data["warned"]]),
+                            budget, reserve=compact_size(columns))
+            return compact_table(f"suggest_journals {prefix}", columns, page)
+
+        def render(numbered):
+            i, data = numbered
+            details = [f"IF {data['impact_factor']}" if data["impact_factor"] is not None else None,
+                       data["jcr_quartile"], data["cas_partition"]]
+            details = " | ".join(d for d in details if d)
+            warned = " ⚠️" if data["warned"] else ""
+            return f"{i}. {data['journal_name']}{warned}" + (f" — {details}" if details else "")
+
+        page = paginate(list(enumerate(results, 1)), render, budget, reserve=200)
+        output = [f"🔎 '{prefix}' 的补全建议（{len(page.items)}个）"]
+        output.append("=" * 50)
+        output.extend(page.chunks)
+
+        return "\n".join(output)
+
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
+    except Exception as e:
+        return f"补全出错: {str(e)}"
+
+
+@app.tool()
+@scheduled("interactive")
+async def check_data_update(refresh: bool = False) -> str:
     """
     检查ShowJCR数据源是否有更新
 
+    远程状态有缓存（默认1小时，可开启后台轮询），与上次同步记录的ETag/Last-Modified比较。
+
+    Args:
+        refresh: 是否忽略缓存立即检查远程数据源
+
     Returns:
         数据源更新状态信息
     """
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # 检查远程数据库文件
-            db_url = "https://raw.githubusercontent.com/hitfyd/ShowJCR/master/中科院分区表及JCR原始数据文件/jcr.db"
-
-            response = await client.head(db_url, follow_redirects=True)
-
-            if response.status_code == 200:
-                remote_size = int(response.headers.get('content-length', 0))
-                remote_modified = response.headers.get('last-modified', '未知')
-
-                # 获取本地文件信息
-                local_size = 0
-                local_modified = "未知"
-                if os.path.exists(DATABASE_PATH):
-                    local_size = os.path.getsize(DATABASE_PATH)
-                    local_modified = os.path.getmtime(DATABASE_PATH)
-                    from datetime import datetime
-                    local_modified = datetime.fromtimestamp(local_modified).strftime('%Y-%m-%d %H:%M:%S')
-
-                output = ["🔄 数据更新检查"]
-                output.append("=" * 40)
-                output.append(f"\n📡 远程数据源:")
-                output.append(f"   大小: {remote_size / 1024 / 1024:.2f} MB")
-                output.append(f"   更新时间: {remote_modified}")
-                output.append(f"\n💾 本地数据库:")
-                output.append(f"   大小: {local_size / 1024 / 1024:.2f} MB")
-                output.append(f"   更新时间: {local_modified}")
-
-                if remote_size != local_size:
-                    output.append(f"\n⚠️ 检测到数据可能有更新！")
-                    output.append(f"💡 使用 sync_database 工具下载最新数据")
-                else:
-                    output.append(f"\n✅ 本地数据已是最新")
+        remote = await remote_status.get(refresh=refresh)
+        local = db.sync_record
 
-                return "\n".join(output)
-            else:
-                return f"无法连接数据源，状态码: {response.status_code}"
+        output = ["🔄 数据更新检查"]
+        output.append("=" * 40)
+        age = remote_status.age() or 0
+        output.append(f"\n📡 远程数据源（{remote['checked_at']} 检查，{age:.0f} 秒前）:")
+        output.append(f"   大小: {remote['size'] / 1024 / 1024:.2f} MB")
+        output.append(f"   更新时间: {remote['last_modified'] or '未知'}")
+        if remote["etag"]:
+            output.append(f"   ETag: {remote['etag']}")
+
+        output.append(f"\n💾 本地数据库:")
+        if not local:
+            output.append("   没有同步记录")
+            output.append(f"\n⚠️ 无法判断本地数据是否最新")
+            output.append(f"💡 使用 sync_database 工具同步后即可跟踪更新")
+            return "\n".join(output)
+
+        output.append(f"   上次同步: {local['last_updated']}")
+        output.append(f"   远程更新时间: {local['last_modified'] or '未知'}")
+        if local.get("etag"):
+            output.append(f"   ETag: {local['etag']}")
+        if local.get("file_hash"):
+            output.append(f"   SHA256: {local['file_hash'][:16]}…")
+
+        if remote["etag"] and local.get("etag"):
+            changed = remote["etag"] != local["etag"]
+        elif remote["last_modified"] and local.get("last_modified"):
+            changed = remote["last_modified"] != local["last_modified"]
+        else:
+            changed = None
+
+        if changed is None:
+            output.append(f"\n⚠️ 远程数据源未提供ETag/Last-Modified，无法判断是否有更新")
+        elif changed:
+            output.append(f"\n⚠️ 检测到数据有更新！")
+            output.append(f"💡 使用 sync_database 工具下载最新数据")
+        else:
+            output.append(f"\n✅ 本地数据已是最新")
+
+        return "\n".join(output)
 
     except Exception as e:
         return f"检查更新出错: {str(e)}"
 
 
 @app.tool()
+@scheduled("bulk")
 async def sync_database() -> str:
     """
     从ShowJCR下载最新数据库文件
@@ -707,79 +2227,183 @@ async def sync_database() -> str:
         同步结果
     """
     try:
-        db_url = "https://raw.githubusercontent.com/hitfyd/ShowJCR/master/中科院分区表及JCR原始数据文件/jcr.db"
+        db_url = DATABASE_URL
 
         output = ["🔄 开始同步数据库..."]
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.get(db_url, follow_redirects=True)
-
-            if response.status_code == 200:
-                # 备份旧数据库
-                backup_path = DATABASE_PATH + ".backup"
-                if os.path.exists(DATABASE_PATH):
-                    import shutil
-                    shutil.copy2(DATABASE_PATH, backup_path)
-                    output.append("📦 已备份旧数据库")
-
-                # 写入新数据库
-                with open(DATABASE_PATH, 'wb') as f:
-                    f.write(response.content)
-
-                new_size = len(response.content) / 1024 / 1024
-                output.append(f"✅ 下载完成，大小: {new_size:.2f} MB")
-
-                # 验证数据库
-                conn = sqlite3.connect(DATABASE_PATH)
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                tables = cursor.fetchall()
-                conn.close()
+        # 按上次同步的校验信息发送条件请求，远程未变化时不下载
+        headers = {}
+        local = db.sync_record if db.exists() else None
+        if local and local.get("etag"):
+            headers["If-None-Match"] = local["etag"]
+        if local and local.get("last_modified"):
+            headers["If-Modified-Since"] = local["last_modified"]
+
+        # 先写入临时文件，构建派生表后再原子替换，读取中的请求不受影响
+        temp_path = db.db_path + ".download"
+        # 增量下载的基准：上次下载的原始文件（本地数据库经过派生表构建与整理，页布局已与远程不同）
+        base_path = db.db_path + ".base"
+        basis = base_path if os.path.exists(base_path) else db.db_path
+        delta = None
+        if DELTA_SYNC and os.path.exists(basis) and os.path.getsize(basis) > 0:
+            # 以本地文件为基准，按块校验清单只下载变化的字节区间
+            from delta_sync import DeltaUnavailable, delta_download
+            try:
+                delta = await delta_download(http_client, db_url, basis, temp_path, DATABASE_MANIFEST_URL,
+                                             known_sha256=local.get("file_hash") if local else None)
+            except (DeltaUnavailable, httpx.HTTPError) as e:
+                output.append(f"ℹ️ 增量下载不可用（{e}），改为完整下载")
+            if delta is not None and delta.unchanged:
+                return "\n".join(output + ["✅ 远程数据库未变化，本地数据已是最新"])
+
+        if delta is not None:
+            response_headers = {"etag": delta.etag, "last-modified": delta.last_modified}
+            output.append(f"⚡ 增量下载完成: 复用 {delta.reused_bytes / 1024 / 1024:.2f} MB，"
+                          f"下载 {delta.fetched_bytes / 1024 / 1024:.2f} MB（{delta.requests} 个区间，"
+                          f"节省 {delta.saved_ratio:.1%}）")
+        else:
+            try:
+                response = await http_client.download(db_url, temp_path, headers=headers)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 304:
+                    return "\n".join(output + ["✅ 远程数据库未变化，本地数据已是最新"])
+                return f"下载失败，状态码: {e.response.status_code}"
+            response_headers = response.headers
+
+        new_size = os.path.getsize(temp_path) / 1024 / 1024
+        output.append(f"✅ 下载完成，大小: {new_size:.2f} MB")
+
+        # 验证数据库：校验未通过时保留现有数据库，不做替换（增量下载已在重组时校验过SHA256）
+        from data_sync import DataSyncer, file_sha256
+        file_hash = delta.sha256 if delta is not None else await asyncio.to_thread(file_sha256, temp_path)
+        validation = await asyncio.to_thread(DataSyncer(temp_path).validate_data_integrity)
+        output.append(f"📊 数据表数量: {validation['total_tables']}，"
+                      f"校验用时 {validation.get('elapsed_s', 0):.2f}s")
+        if validation["issues"]:
+            os.remove(temp_path)
+            output.append("❌ 数据校验未通过，已保留现有数据库:")
+            output.extend(f"  • {issue['table']}: {issue['issue']}" for issue in validation["issues"][:10])
+            return "\n".join(output)
+
+        # 保留原始文件作为下次增量下载的基准
+        import shutil
+        if DELTA_SYNC:
+            await asyncio.to_thread(shutil.copyfile, temp_path, base_path + ".tmp")
+
+        # 构建派生表（分面统计等）
+        derived = await asyncio.to_thread(build_derived_tables, temp_path)
+        built = sum(1 for count in derived.values() if count >= 0)
+        output.append(f"🧮 派生表构建: {built}/{len(derived)}")
+
+        # 建立数据源表索引、ANALYZE，并按优化的页大小整理为新文件
+        from jcr_optimize import optimize_database
+        optimized = await asyncio.to_thread(optimize_database, temp_path)
+        output.append(f"⚙️ 数据库优化: {optimized['indexes']} 个索引，页大小 {optimized['page_size']}，"
+                      f"标准查询耗时 {optimized['before_ms']:.1f}ms → {optimized['after_ms']:.1f}ms")
+
+        # 记录远程校验信息，供后续更新检查与条件请求使用
+        remote = {
+            "etag": response_headers.get("etag"),
+            "last_modified": response_headers.get("last-modified"),
+            "size": int(response_headers.get("content-length") or 0) or int(new_size * 1024 * 1024),
+            "checked_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        conn = sqlite3.connect(temp_path)
+        try:
+            write_sync_metadata(conn, DATABASE_SOURCE, validation["total_tables"], file_hash,
+                                remote["etag"], remote["last_modified"], db_url)
+            conn.commit()
+        finally:
+            conn.close()
 
-                output.append(f"📊 数据表数量: {len(tables)}")
-                output.append("\n✅ 数据库同步成功！")
+        if db.store is not None:
+            # 分库模式：只替换内容有变化的分库文件，未变化的分库保持原样
+            changes = await asyncio.to_thread(db.store.import_database, temp_path)
+            os.remove(temp_path)
+            changed = sorted(table for table, change in changes.items() if change != "unchanged")
+            output.append(f"🗂️ 分库更新: {len(changed)}/{len(changes)}"
+                          + (f"（{', '.join(f'{t}:{changes[t]}' for t in changed)}）" if changed else ""))
+        else:
+            # 备份旧数据库
+            backup_path = db.db_path + ".backup"
+            if os.path.exists(db.db_path):
+                await asyncio.to_thread(shutil.copy2, db.db_path, backup_path)
+                output.append("📦 已备份旧数据库")
+
+            # 原子替换：各worker在下次查询时检测到新版本并重建内存索引
+            os.replace(temp_path, db.db_path)
+        if DELTA_SYNC:
+            os.replace(base_path + ".tmp", base_path)
+        remote_status.set(remote)
+        output.append("\n✅ 数据库同步成功！")
 
-                return "\n".join(output)
-            else:
-                return f"下载失败，状态码: {response.status_code}"
+        return "\n".join(output)
 
     except Exception as e:
         return f"同步出错: {str(e)}"
 
 
 @app.tool()
-async def get_available_categories(year: str = "2025") -> str:
+@scheduled("interactive")
+async def get_available_categories(year: str = "2025", output_format: str = "text",
+                                   max_items: Optional[int] = None, max_chars: Optional[int] = None,
+                                   cursor: Optional[str] = None) -> str:
     """
     获取可用的学科分类列表
 
     Args:
         year: 数据年份，默认2025
+        output_format: 输出格式，"text"为文本格式，"compact"为紧凑表格
+        max_items: 本页最多返回的学科数（可选）
+        max_chars: 本页最多返回的字符数，默认20000，0表示不限
+        cursor: 上一页返回的续页游标
 
     Returns:
         可用的学科大类列表
     """
     try:
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-
-        table_name = f"FQBJCR{year}"
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+        key = page_key("get_available_categories", year)
+        start = page_start(cursor, key)
+
+        def load(deadline: QueryDeadline) -> Optional[List[Tuple[str, int]]]:
+            # 优先使用同步时预计算的分面表
+            categories = db.facets.categories('FQBJCR', year)
+            if categories:
+                return categories
+
+            table_name = f"FQBJCR{year}"
+            conn = db.connect(deadline, tables=[table_name])
+            try:
+                if not table_exists(conn, table_name):
+                    return None
+                return conn.execute(f"SELECT 大类, COUNT(*) FROM {table_name} WHERE 大类 IS NOT NULL "
+                                    f"GROUP BY 大类 ORDER BY 大类").fetchall()
+            finally:
+                conn.close()
 
-        if not cursor.fetchone():
-            conn.close()
+        categories = await run_indexed("get_available_categories", load)
+        if categories is None:
             return f"未找到{year}年的数据"
 
-        cursor.execute(f"SELECT DISTINCT 大类 FROM {table_name} WHERE 大类 IS NOT NULL ORDER BY 大类")
-        categories = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        budget = ResponseBudget.of(max_items, max_chars)
+        if output_format.lower() == "compact":
+            columns = ["category", "journals"]
+            page = paginate(categories[start:], compact_row, budget, start, len(categories), key,
+                            reserve=compact_size(columns))
+            return compact_table(f"get_available_categories {year}", columns, page)
 
         output = [f"📚 可用学科分类（{year}年）"]
         output.append("=" * 30)
-        for i, cat in enumerate(categories, 1):
-            output.append(f"{i}. {cat}")
+        numbered = list(enumerate(categories, 1))
+        page = paginate(numbered[start:], lambda item: f"{item[0]}. {item[1][0]}（{item[1][1]}个期刊）", budget,
+                        start, len(categories), key, reserve=200)
+        output.extend(page.chunks)
+        output.extend(text_footer(page, "个学科"))
 
         return "\n".join(output)
 
+    except DeadlineExceeded:
+        return TRUNCATED_NOTE
     except Exception as e:
         return f"获取分类出错: {str(e)}"
 
@@ -788,29 +2412,93 @@ async def get_available_categories(year: str = "2025") -> str:
 async def get_database_info() -> str:
     """获取数据库基本信息"""
     try:
-        conn = sqlite3.connect(db.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [table[0] for table in cursor.fetchall()]
+        if db.store is not None:
+            # 分库模式：记录数取自目录，无需逐个打开分库
+            counts = {name: record["record_count"] for name, record in db.store.shards().items()}
+            location = f"{db.store.data_dir}（分库存储，{len(counts)} 个分库）"
+        else:
+            conn = db.connect()
+            cursor = conn.cursor()
+            counts = {}
+            for table in list_tables(conn):
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                counts[table] = cursor.fetchone()[0]
+            conn.close()
+            location = db.db_path
         
         info = ["📊 JCR分区表数据库信息"]
         info.append("=" * 30)
-        info.append(f"数据库路径: {db.db_path}")
-        info.append(f"数据表数量: {len(tables)}")
+        info.append(f"数据库路径: {location}")
+        info.append(f"数据表数量: {len(counts)}")
         info.append("\n📋 可用数据表:")
         
-        for table in sorted(tables):
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
-            info.append(f"  • {table}: {count} 条记录")
+        for table in sorted(counts):
+            info.append(f"  • {table}: {counts[table]} 条记录")
         
-        conn.close()
         return "\n".join(info)
     
     except Exception as e:
         return f"获取数据库信息出错: {str(e)}"
 
+@app.resource("jcr://metrics")
+async def get_runtime_metrics() -> str:
+    """获取服务器运行时指标（请求合并计数等）"""
+    metrics = {
+        "database_generation": db.generation(),
+        "single_flight": db.single_flight.stats(),
+        "http_client": http_client.stats(),
+        "remote_status": remote_status.stats(),
+        "query_deadlines": QueryDeadline.stats(),
+        "scheduler": scheduler.stats(),
+    }
+    return json.dumps(metrics, ensure_ascii=False, indent=2)
+
+async def _read_resource_payload(kind: str, *parts: str) -> str:
+    """读取资源载荷正文，资源不存在时抛出异常（由MCP返回资源错误）"""
+    payload = await asyncio.to_thread(db.resource_payload, kind, [unquote(part) for part in parts])
+    if payload is None:
+        raise ValueError(f"未找到资源: {resource_uri(kind, *parts)}")
+    return payload.body
+
+@app.resource("jcr://version", mime_type="application/json")
+async def get_resource_version() -> str:
+    """数据库版本：与已缓存资源的 version 相同时，缓存的资源仍然有效"""
+    return json.dumps({"version": db.generation()})
+
+@app.resource("jcr://journal/{journal_id}", mime_type="application/json")
+async def get_journal_resource(journal_id: str) -> str:
+    """期刊资源：规范刊名、全部写法、各年份指标与预警记录；journal_id 可为期刊ID、刊名或ISSN"""
+    return await _read_resource_payload("journal", journal_id)
+
+@app.resource("jcr://category/{year}/{name}", mime_type="application/json")
+async def get_category_resource(year: str, name: str) -> str:
+    """学科资源：中科院大类在指定年份的全部期刊（按分区、影响因子排序）与分区统计"""
+    return await _read_resource_payload("category", year, name)
+
+@app.resource("jcr://warnings/{year}", mime_type="application/json")
+async def get_warnings_resource(year: str) -> str:
+    """预警名单资源：指定年份的全部预警期刊及其各年份预警等级"""
+    return await _read_resource_payload("warnings", year)
+
+@app.custom_route("/resources/{kind}/{path:path}", methods=["GET", "HEAD"])
+async def http_resource(request: Request) -> Response:
+    """以HTTP提供 jcr:// 资源（如 /resources/journal/123），带ETag与Cache-Control，If-None-Match 命中时返回304"""
+    kind = request.path_params["kind"]
+    # 路径参数已由HTTP服务器解码
+    parts = request.path_params["path"].split("/")
+    payload = await asyncio.to_thread(db.resource_payload, kind, parts)
+    if payload is None:
+        return JSONResponse({"error": f"未找到资源: {resource_uri(kind, *parts)}"}, status_code=404)
+
+    headers = {
+        "ETag": payload.etag,
+        "Cache-Control": f"public, max-age={RESOURCE_MAX_AGE}",
+        "X-JCR-Version": db.generation(),
+    }
+    if etag_matches(payload.etag, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(payload.body, media_type="application/json", headers=headers)
+
 @app.prompt()
 async def journal_analysis_prompt(journal_name: str) -> str:
     """期刊分析专用提示词模板"""
@@ -826,22 +2514,78 @@ async def journal_analysis_prompt(journal_name: str) -> str:
 请用专业、客观的语言进行分析，并给出具体的投稿建议。
 """
 
+def _hold_server_resources(http_app):
+    """应用运行期间持有共享HTTP客户端与更新轮询，进程退出时关闭（无状态模式下会话随请求结束）"""
+    session_lifespan = http_app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(scope_app):
+        async with server_resources():
+            async with session_lifespan(scope_app) as state:
+                yield state
+
+    http_app.router.lifespan_context = lifespan
+    return http_app
+
+
+def create_http_app():
+    """HTTP部署的应用工厂，供uvicorn多worker进程各自调用"""
+    transport = os.environ.get("JCR_MCP_TRANSPORT", "streamable-http")
+    if transport == "sse":
+        return _hold_server_resources(app.sse_app())
+    # 多worker之间不共享会话状态，使用无状态模式
+    app.settings.stateless_http = True
+    return _hold_server_resources(app.streamable_http_app())
+
+
+def main():
+    """命令行入口"""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="JCR分区表MCP服务器")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio",
+                        help="传输方式，默认stdio")
+    parser.add_argument("--host", default=app.settings.host, help="HTTP监听地址")
+    parser.add_argument("--port", type=int, default=app.settings.port, help="HTTP监听端口")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="HTTP worker进程数（仅streamable-http支持多worker）")
+    args = parser.parse_args()
+
+    # 运行MCP服务器（stdio模式下标准输出用于协议通信，提示信息输出到stderr）
+    print("🚀 启动JCR分区表MCP服务器...", file=sys.stderr)
+    print(f"📊 数据库路径: {DATABASE_PATH}", file=sys.stderr)
+    print("🔧 可用工具:", file=sys.stderr)
+    # 取自已注册的工具（说明为docstring首行），新增工具后无需同步修改
+    for tool in asyncio.run(app.list_tools()):
+        summary = (tool.description or "").strip().splitlines()
+        print(f"  • {tool.name}" + (f" - {summary[0]}" if summary else ""), file=sys.stderr)
+    print("💡 提示词模板: journal_analysis_prompt", file=sys.stderr)
+    print("📋 资源: jcr://database-info, jcr://metrics, jcr://version, jcr://journal/{id}, "
+          "jcr://category/{year}/{name}, jcr://warnings/{year}", file=sys.stderr)
+    print("\n⚡ 服务器启动中...", file=sys.stderr)
+
+    if args.transport == "stdio":
+        app.run(transport="stdio")
+        return
+
+    if args.workers > 1 and args.transport == "sse":
+        parser.error("SSE会话绑定在单个进程内，多worker部署请使用 --transport streamable-http")
+
+    print(f"🌐 {args.transport} 监听 http://{args.host}:{args.port}，worker数: {args.workers}", file=sys.stderr)
+    if args.workers == 1:
+        app.settings.host = args.host
+        app.settings.port = args.port
+        app.run(transport=args.transport)
+        return
+
+    import uvicorn
+
+    # worker进程通过导入字符串各自加载应用，数据库通过mmap共享页缓存
+    os.environ["JCR_MCP_TRANSPORT"] = args.transport
+    uvicorn.run("jcr_mcp_server:create_http_app", factory=True, host=args.host, port=args.port,
+                workers=args.workers, app_dir=str(SCRIPT_DIR))
+
+
 if __name__ == "__main__":
-    # 运行MCP服务器
-    print("🚀 启动JCR分区表MCP服务器...")
-    print(f"📊 数据库路径: {DATABASE_PATH}")
-    print("🔧 可用工具:")
-    print("  • search_journal - 搜索期刊信息")
-    print("  • get_partition_trends - 获取分区趋势")
-    print("  • check_warning_journals - 查询预警期刊")
-    print("  • compare_journals - 对比期刊")
-    print("  • filter_journals - 按条件筛选期刊 [新增]")
-    print("  • batch_query_journals - 批量查询导出 [新增]")
-    print("  • check_data_update - 检查数据更新 [新增]")
-    print("  • sync_database - 同步最新数据 [新增]")
-    print("  • get_available_categories - 获取学科分类 [新增]")
-    print("💡 提示词模板: journal_analysis_prompt")
-    print("📋 资源: jcr://database-info")
-    print("\n⚡ 服务器启动中...")
-
-    app.run(transport="stdio") 
\ No newline at end of file
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+JCR分区表数据库优化
+数据同步后为各数据源表建立索引、收集统计信息，再以指定页大小 VACUUM INTO 新文件并原子替换；
+同时记录各工具标准查询在优化前后的查询计划与耗时。
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import statistics
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from jcr_index import TITLE_TABLE_PREFIXES, list_tables, table_columns
+
+logger = logging.getLogger(__name__)
+
+# 优化后数据库的页大小：只读查询为主，较大的页使B树更浅、顺序扫描的页数更少
+DEFAULT_PAGE_SIZE = 16384
+# 每条标准查询的计时次数（取中位数）
+TIMING_REPEAT = 5
+# 优化记录表
+REPORT_TABLE = "optimize_report"
+
+
+def _source_tables(conn: sqlite3.Connection) -> List[str]:
+    """原始数据源表（FQBJCR/JCR/GJQKYJMD/CCF 等，表名为 前缀 + 年份）"""
+    tables = []
+    for table in list_tables(conn):
+        prefix = next((p for p in TITLE_TABLE_PREFIXES if table.startswith(p)), None)
+        if prefix and table[len(prefix):].isdigit():
+            tables.append(table)
+    return sorted(tables)
+
+
+def _partition_column(columns: List[str]) -> Optional[str]:
+    """分区列，与 filter_journals 的选择规则一致"""
+    if '大类分区' in columns:
+        return '大类分区'
+    return next((col for col in columns if 'Quartile' in col), None)
+
+
+def _category_column(columns: List[str]) -> Optional[str]:
+    """学科列，与 filter_journals 的选择规则一致"""
+    if '大类' in columns:
+        return '大类'
+    return 'Category' if 'Category' in columns else None
+
+
+def _if_column(columns: List[str]) -> Optional[str]:
+    """影响因子列，与分面聚合中的影响因子条件一致"""
+    return next((col for col in columns if 'IF' in col), None)
+
+
+def index_plan(columns: List[str]) -> List[Tuple[str, str]]:
+    """数据源表应建立的索引，返回[(索引名后缀, 索引表达式)]
+
+    刊名按 NOCASE 排序，与 search_journal 的 `Journal COLLATE NOCASE IN (...)` 一致；
+    影响因子为文本列，按查询中使用的 CAST(... AS REAL) 表达式建立索引。
+    分区与学科列不建索引：filter_journals 以 `LIKE '%x%'` 包含匹配筛选，用不上索引，
+    且只取前 limit 条，扫描命中足够的行后即停止。
+    """
+    plan = []
+    if 'Journal' in columns:
+        plan.append(("journal", "Journal COLLATE NOCASE"))
+    for column in columns:
+        if column.upper() in ("ISSN", "EISSN", "ISSN/EISSN"):
+            plan.append((re.sub(r"\W+", "_", column.lower()), f'"{column}"'))
+    impact = _if_column(columns)
+    if impact:
+        plan.append(("if", f'CAST("{impact}" AS REAL)'))
+    return plan
+
+
+def create_source_indexes(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """为各数据源表建立索引并删除不在计划中的旧索引，返回 {表名: [索引名]}"""
+    created = {}
+    for table in _source_tables(conn):
+        names = []
+        for suffix, expression in index_plan(table_columns(conn, f'"{table}"')):
+            name = f"idx_{table}_{suffix}"
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({expression})')
+            names.append(name)
+        # 早期版本建立的分区/学科索引等不再使用，删除以免占用空间、拖慢写入
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=?",
+                                    (table,)).fetchall():
+            if name.startswith(f"idx_{table}_") and name not in names:
+                conn.execute(f'DROP INDEX "{name}"')
+        created[table] = names
+    return created
+
+
+def standard_queries(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str, tuple]]:
+    """各工具在数据源表上执行的标准查询，返回[(名称, SQL, 参数)]，参数取自表中部的一行"""
+    columns = table_columns(conn, f'"{table}"')
+    if 'Journal' not in columns:
+        return []
+    count = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+    cursor = conn.execute(f'SELECT * FROM "{table}" WHERE Journal IS NOT NULL LIMIT 1 OFFSET ?', (count // 2,))
+    row = cursor.fetchone()
+    if row is None:
+        return []
+    sample = dict(zip([d[0] for d in cursor.description], row))
+    title = str(sample["Journal"])
+
+    # search_journal：别名命中时精确查询，否则模糊匹配
+    queries = [
+        ("search_exact", f'SELECT * FROM "{table}" WHERE Journal COLLATE NOCASE IN (?)', (title,)),
+        ("search_fuzzy", f'SELECT * FROM "{table}" WHERE Journal LIKE ? COLLATE NOCASE', (f"%{title[:8]}%",)),
+    ]
+    issn = next((col for col in columns if col.upper() in ("ISSN", "ISSN/EISSN")), None)
+    if issn and sample.get(issn):
+        queries.append(("issn", f'SELECT * FROM "{table}" WHERE "{issn}" = ?', (sample[issn],)))
+    # filter_journals：分区与学科条件
+    partition, category = _partition_column(columns), _category_column(columns)
+    if partition and category and sample.get(partition) and sample.get(category):
+        queries.append(("filter", f'SELECT * FROM "{table}" WHERE "{partition}" LIKE ? AND "{category}" LIKE ? '
+                                  f'LIMIT 50', (f"%{sample[partition]}%", f"%{sample[category]}%")))
+    # filter_journals 分面统计中的影响因子范围条件
+    impact = _if_column(columns)
+    if impact and sample.get(impact) is not None:
+        queries.append(("if_range", f'SELECT COUNT(*) FROM "{table}" WHERE CAST("{impact}" AS REAL) >= ?',
+                        (sample[impact],)))
+    return queries
+
+
+def measure_queries(conn: sqlite3.Connection, queries: Dict[str, List[Tuple[str, str, tuple]]],
+                    repeat: int = TIMING_REPEAT) -> Dict[Tuple[str, str], Dict]:
+    """记录各查询的查询计划与耗时中位数（毫秒）"""
+    results = {}
+    for table, table_queries in queries.items():
+        for name, sql, params in table_queries:
+            plan = " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sql, params).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[(table, name)] = {"plan": plan, "ms": round(statistics.median(timings), 3)}
+    return results
+
+
+def write_report(conn: sqlite3.Connection, rows: List[Dict]):
+    """把本次优化的查询计划与耗时写入 optimize_report（每次优化覆盖）"""
+    conn.execute(f"DROP TABLE IF EXISTS {REPORT_TABLE}")
+    conn.execute(f"""
+    CREATE TABLE {REPORT_TABLE} (
+        table_name TEXT,
+        query TEXT,
+        plan_before TEXT,
+        plan_after TEXT,
+        before_ms REAL,
+        after_ms REAL,
+        recorded TEXT,
+        PRIMARY KEY (table_name, query)
+    )
+    """)
+    recorded = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany(f"INSERT INTO {REPORT_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        (row["table"], row["query"], row["plan_before"], row["plan_after"], row["before_ms"], row["after_ms"],
+         recorded) for row in rows
+    ])
+
+
+def optimize_database(db_path: str, page_size: int = DEFAULT_PAGE_SIZE, measure: bool = True) -> Dict:
+    """优化数据库：建立数据源表索引、ANALYZE、按 page_size VACUUM INTO 新文件后原子替换
+
+    measure 为真时在优化前后各执行一遍标准查询，结果写入 optimize_report 表并随返回值给出。
+    """
+    start = time.perf_counter()
+    size_before = os.path.getsize(db_path)
+    temp_path = db_path + ".optimize"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        queries = {table: standard_queries(conn, table) for table in _source_tables(conn)} if measure else {}
+        before = measure_queries(conn, queries)
+
+        indexes = create_source_indexes(conn)
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.commit()
+
+        # VACUUM INTO 按新的页大小整理出紧凑的新文件，原文件在替换前保持可读
+        conn.execute(f"PRAGMA page_size={int(page_size)}")
+        conn.execute("VACUUM INTO ?", (temp_path,))
+    finally:
+        conn.close()
+
+    try:
+        conn = sqlite3.connect(temp_path)
+        try:
+            after = measure_queries(conn, queries)
+            rows = [{
+                "table": table, "query": name,
+                "plan_before": before[(table, name)]["plan"], "plan_after": after[(table, name)]["plan"],
+                "before_ms": before[(table, name)]["ms"], "after_ms": after[(table, name)]["ms"],
+            } for (table, name) in before]
+            if measure:
+                write_report(conn, rows)
+                conn.commit()
+        finally:
+            conn.close()
+        os.replace(temp_path, db_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    report = {
+        "indexes": sum(len(names) for names in indexes.values()),
+        "tables": len(indexes),
+        "page_size": int(page_size),
+        "size_before": size_before,
+        "size_after": os.path.getsize(db_path),
+        "before_ms": round(sum(row["before_ms"] for row in rows), 3),
+        "after_ms": round(sum(row["after_ms"] for row in rows), 3),
+        "queries": rows,
+        "elapsed_s": round(time.perf_counter() - start, 3),
+    }
+    logger.info(f"数据库优化完成: {report['indexes']} 个索引，页大小 {page_size}，"
+                f"标准查询 {report['before_ms']:.1f}ms → {report['after_ms']:.1f}ms")
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    target = sys.argv[1] if len(sys.argv) > 1 else "jcr.db"
+    result = optimize_database(target)
+    for row in result["queries"]:
+        print(f"{row['table']:<14} {row['query']:<13} {row['before_ms']:>9.2f}ms → {row['after_ms']:>9.2f}ms  "
+              f"{row['plan_after']}")
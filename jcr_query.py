@@ -0,0 +1,684 @@
+"""
+JCR期刊多条件查询引擎
+在 journal_metrics 宽表上组合JCR、中科院分区与预警条件，按索引选择性安排执行顺序；
+跨年份的整表比较（升降榜）在NumPy列式快照上向量化完成
+"""
+
+import base64
+import heapq
+import json
+import re
+import sqlite3
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from jcr_index import normalize_title, parse_partition, table_exists
+from jcr_runtime import QueryDeadline
+
+# 查询字段: 名称 -> (列名, 类型, 是否有索引)
+FIELDS: Dict[str, Tuple[str, str, bool]] = {
+    "if": ("jcr_if", "real", True),
+    "if_change": ("jcr_if_change", "real", True),
+    "quartile": ("jcr_quartile", "partition", True),
+    "rank": ("jcr_rank", "int", True),
+    "jcr_category": ("jcr_category", "text", True),
+    "partition": ("cas_partition", "partition", True),
+    "category": ("cas_category", "text", True),
+    "top": ("cas_top", "bool", True),
+    "oa": ("cas_oa", "bool", True),
+    "warned": ("warned", "bool", True),
+    "journal": ("title_key", "title", True),
+}
+
+# 可用于排序的字段
+ORDER_FIELDS = ["if", "if_change", "quartile", "rank", "partition", "journal"]
+
+OPERATORS = [">=", "<=", "!=", "=", ">", "<", "~"]
+RANGE_OPERATORS = {"=", ">", ">=", "<", "<="}
+
+# 条件开头（字段 + 运算符）、带引号的值与条件分隔符
+_CLAUSE_HEAD = re.compile(r"\s*(\w+)\s*(>=|<=|!=|=|>|<|~)\s*")
+_QUOTED_VALUE = re.compile(r"(\"[^\"]*\"|'[^']*')\s*")
+_SEPARATOR = re.compile(r"\s+and\s+|\s*&\s*", re.IGNORECASE)
+_TRUE_VALUES = {"1", "true", "yes", "y", "是", "t"}
+
+# 最优谓词命中比例低于该值时强制使用其索引，否则优先使用排序列索引
+DRIVING_SELECTIVITY = 0.3
+
+
+class QueryError(ValueError):
+    """查询条件无法解析"""
+
+
+@dataclass
+class Predicate:
+    """单个查询条件"""
+    name: str
+    op: str
+    value: Any
+
+    @property
+    def column(self) -> str:
+        return FIELDS[self.name][0]
+
+    @property
+    def indexable(self) -> bool:
+        return FIELDS[self.name][2] and self.op in RANGE_OPERATORS
+
+    def sql(self) -> Tuple[str, List[Any]]:
+        """生成SQL条件与参数"""
+        if self.op == "~":
+            return f"{self.column} LIKE ?", [f"%{self.value}%"]
+        if self.op == "!=":
+            return f"({self.column} IS NULL OR {self.column} != ?)", [self.value]
+        return f"{self.column} {self.op} ?", [self.value]
+
+    def __str__(self) -> str:
+        return f"{self.name} {self.op} {self.value}"
+
+
+def _coerce(name: str, op: str, raw: str) -> Any:
+    """按字段类型转换条件值"""
+    kind = FIELDS[name][1]
+    raw = raw.strip().strip("'\"")
+    if op == "~":
+        return raw.casefold() if kind == "title" else raw
+    if kind == "real":
+        try:
+            return float(raw)
+        except ValueError:
+            raise QueryError(f"字段 {name} 需要数值: {raw}")
+    if kind == "int":
+        try:
+            return int(raw)
+        except ValueError:
+            raise QueryError(f"字段 {name} 需要整数: {raw}")
+    if kind == "partition":
+        value = parse_partition(raw)
+        if value is None:
+            raise QueryError(f"字段 {name} 需要分区值（如 1区、Q1）: {raw}")
+        return value
+    if kind == "bool":
+        return int(raw.lower() in _TRUE_VALUES)
+    if kind == "title":
+        return normalize_title(raw)
+    return raw
+
+
+def _clause_end(where: str, pos: int) -> Tuple[int, int]:
+    """未加引号的值从 pos 开始，返回值的结束位置与下一条件的开始位置
+
+    只有分隔符之后紧跟"已知字段 + 运算符"时才切分，值中的 and / & 会保留（如 Science and Technology、R&D）。
+    """
+    for separator in _SEPARATOR.finditer(where, pos):
+        head = _CLAUSE_HEAD.match(where, separator.end())
+        if head and head.group(1).lower() in FIELDS:
+            return separator.start(), separator.end()
+    return len(where), len(where)
+
+
+def parse_predicates(where: Optional[str]) -> List[Predicate]:
+    """解析条件表达式，如 "partition<=1 AND quartile=Q1 AND if>10 AND warned=0"
+
+    条件之间用 AND（或 &）连接；运算符支持 = != > >= < <= 以及 ~（包含）。
+    值可以加引号（如 category~"Science & Technology"），未加引号时仅在下一条件开头处切分。
+    """
+    if not where or not where.strip():
+        return []
+
+    where = where.strip()
+    predicates = []
+    pos = 0
+    while pos < len(where):
+        head = _CLAUSE_HEAD.match(where, pos)
+        if not head:
+            raise QueryError(f"无法解析条件: {where[pos:_clause_end(where, pos)[0]].strip()}")
+        name, op = head.group(1).lower(), head.group(2)
+        if name not in FIELDS:
+            raise QueryError(f"未知字段: {name}（可用字段: {', '.join(FIELDS)}）")
+
+        quoted = _QUOTED_VALUE.match(where, head.end())
+        separator = _SEPARATOR.match(where, quoted.end()) if quoted else None
+        if quoted and (quoted.end() == len(where) or separator):
+            raw = quoted.group(1)
+            pos = separator.end() if separator else len(where)
+        else:
+            end, pos = _clause_end(where, head.end())
+            raw = where[head.end():end].strip()
+        if not raw:
+            raise QueryError(f"条件缺少值: {where[head.start():head.end()].strip()}")
+        predicates.append(Predicate(name, op, _coerce(name, op, raw)))
+    return predicates
+
+
+def encode_cursor(value: Any, rowid: int, position: int = 0) -> str:
+    """编码分页游标（排序值、rowid 与下一条结果的序号位置）"""
+    payload = json.dumps([value, rowid, position], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int, int]:
+    """解码分页游标，返回排序值、rowid 与下一条结果的序号位置"""
+    try:
+        value, rowid, *rest = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return value, int(rowid), max(int(rest[0]), 0) if rest else 0
+    except (ValueError, TypeError):
+        raise QueryError("无效的分页游标")
+
+
+@dataclass
+class QueryPlan:
+    """查询计划"""
+    year: str
+    predicates: List[Predicate]
+    order_by: str
+    descending: bool
+    limit: int
+    offset: int = 0
+    cursor: Optional[str] = None
+    # 本页第一条结果在全部结果中的位置（从0开始，游标分页时取自游标）
+    start: int = 0
+    year_total: int = 0
+    estimates: Dict[str, int] = field(default_factory=dict)
+    driving_index: Optional[str] = None
+    sql: str = ""
+    params: List[Any] = field(default_factory=list)
+
+
+class JournalQueryEngine:
+    """journal_metrics 上的多条件查询引擎"""
+
+    TABLE = "journal_metrics"
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def available(self) -> bool:
+        """指标宽表是否已构建"""
+        return table_exists(self.conn, self.TABLE)
+
+    def _count(self, year: str, predicate: Optional[Predicate] = None) -> int:
+        query = f"SELECT COUNT(*) FROM {self.TABLE} WHERE year = ?"
+        params: List[Any] = [year]
+        if predicate is not None:
+            condition, extra = predicate.sql()
+            query += f" AND {condition}"
+            params.extend(extra)
+        return self.conn.execute(query, params).fetchone()[0]
+
+    def plan(self, year: str, predicates: List[Predicate], order_by: str = "if", descending: bool = True,
+             limit: int = 20, offset: int = 0, cursor: Optional[str] = None) -> QueryPlan:
+        """生成查询计划：估算各条件命中数，选择性最高的条件优先并驱动索引"""
+        if order_by not in ORDER_FIELDS:
+            raise QueryError(f"不支持的排序字段: {order_by}（可用: {', '.join(ORDER_FIELDS)}）")
+
+        plan = QueryPlan(year=year, predicates=[], order_by=order_by, descending=descending,
+                         limit=max(limit, 1), offset=max(offset, 0), cursor=cursor)
+        plan.start = plan.offset
+        plan.year_total = self._count(year)
+
+        # 可走索引的条件按估算命中数升序，其余条件放在最后
+        indexed = [p for p in predicates if p.indexable]
+        for predicate in indexed:
+            plan.estimates[str(predicate)] = self._count(year, predicate)
+        indexed.sort(key=lambda p: plan.estimates[str(p)])
+        plan.predicates = indexed + [p for p in predicates if not p.indexable]
+
+        order_column = FIELDS[order_by][0]
+        if indexed and plan.estimates[str(indexed[0])] <= plan.year_total * DRIVING_SELECTIVITY:
+            plan.driving_index = f"idx_{self.TABLE}_{indexed[0].column}"
+        elif FIELDS[order_by][2]:
+            plan.driving_index = f"idx_{self.TABLE}_{order_column}"
+
+        conditions = ["year = ?"]
+        params: List[Any] = [year]
+        for predicate in plan.predicates:
+            condition, extra = predicate.sql()
+            conditions.append(condition)
+            params.extend(extra)
+        conditions.append(f"{order_column} IS NOT NULL")
+
+        direction = "DESC" if descending else "ASC"
+        if cursor:
+            last_value, last_rowid, plan.start = decode_cursor(cursor)
+            comparison = "<" if descending else ">"
+            conditions.append(f"({order_column} {comparison} ? OR ({order_column} = ? AND rowid > ?))")
+            params.extend([last_value, last_value, last_rowid])
+
+        indexed_by = f" INDEXED BY {plan.driving_index}" if plan.driving_index else ""
+        plan.sql = (f"SELECT rowid, * FROM {self.TABLE}{indexed_by} WHERE {' AND '.join(conditions)} "
+                    f"ORDER BY {order_column} {direction}, rowid ASC LIMIT ?")
+        params.append(plan.limit)
+        if not cursor and plan.offset:
+            plan.sql += " OFFSET ?"
+            params.append(plan.offset)
+        plan.params = params
+        return plan
+
+    def execute(self, plan: QueryPlan, deadline: Optional[QueryDeadline] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """执行查询计划，返回结果与下一页游标
+
+        超出 deadline 被中断时返回已取得的行，游标指向最后一行之后，客户端可从中断处继续。
+        """
+        rows = []
+        try:
+            cursor = self.conn.execute(plan.sql, plan.params)
+            columns = [description[0] for description in cursor.description]
+            for row in cursor:
+                rows.append(dict(zip(columns, row)))
+        except sqlite3.OperationalError as e:
+            if deadline is None or not deadline.interrupted(e):
+                raise
+
+        next_cursor = None
+        if rows and (len(rows) == plan.limit or (deadline is not None and deadline.truncated)):
+            next_cursor = self.cursor_after(plan, rows[-1], plan.start + len(rows))
+        return rows, next_cursor
+
+    @staticmethod
+    def cursor_after(plan: QueryPlan, row: Dict[str, Any], position: int) -> str:
+        """从指定行之后继续查询的游标，position 为下一条结果的序号位置（响应预算在页中截断时也使用）"""
+        return encode_cursor(row[FIELDS[plan.order_by][0]], row["rowid"], position)
+
+    def explain(self, plan: QueryPlan) -> List[str]:
+        """返回查询计划说明，包括条件估算与SQLite执行计划"""
+        lines = [f"年份 {plan.year} 共 {plan.year_total} 条记录"]
+        lines.append("条件执行顺序（按估算命中数）:")
+        for i, predicate in enumerate(plan.predicates, 1):
+            estimate = plan.estimates.get(str(predicate))
+            detail = f"约 {estimate} 条" if estimate is not None else "无法使用索引，最后过滤"
+            lines.append(f"  {i}. {predicate}: {detail}")
+        lines.append(f"驱动索引: {plan.driving_index or '由SQLite自动选择'}")
+        lines.append(f"SQL: {plan.sql}")
+        lines.append("SQLite执行计划:")
+        for row in self.conn.execute(f"EXPLAIN QUERY PLAN {plan.sql}", plan.params).fetchall():
+            lines.append(f"  {row[-1]}")
+        return lines
+
+
+# 排名指标: 名称 -> (说明, 是否越大越好)
+RANK_METRICS: Dict[str, Tuple[str, bool]] = {
+    "if": ("影响因子", True),
+    "if_change": ("影响因子变化", True),
+    "rank": ("JCR学科内排名比例", False),
+}
+
+# 分组字段: 名称 -> journal_metrics 列名
+RANK_GROUPS = {"category": "cas_category", "jcr_category": "jcr_category"}
+
+
+class RankingStore:
+    """单一年份的列式指标存储，用于按学科分组的Top-K与百分位排名"""
+
+    def __init__(self, year: str, columns: Dict[str, List[Any]]):
+        self.year = year
+        self.columns = columns
+        self.size = len(columns.get("journal", []))
+        # (分组字段, 指标) -> {学科: (行号列表, 升序指标值)}
+        self._groups: Dict[Tuple[str, str], Dict[Any, Tuple[List[int], List[float]]]] = {}
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, year: str) -> "RankingStore":
+        """一次读取某年份的全部排名所需列"""
+        names = ["journal", "title_key", "cas_category", "jcr_category", "jcr_if", "jcr_if_change",
+                 "jcr_rank", "jcr_rank_total", "jcr_quartile", "cas_partition", "warned"]
+        columns: Dict[str, List[Any]] = {name: [] for name in names + ["rank"]}
+        if table_exists(conn, "journal_metrics"):
+            query = f"SELECT {', '.join(names)} FROM journal_metrics WHERE year = ?"
+            for row in conn.execute(query, (year,)):
+                for name, value in zip(names, row):
+                    columns[name].append(value)
+                rank, total = row[6], row[7]
+                columns["rank"].append(rank / total if rank and total else None)
+        columns["if"] = columns["jcr_if"]
+        columns["if_change"] = columns["jcr_if_change"]
+        return cls(year, columns)
+
+    def _group(self, group_by: str, metric: str) -> Dict[Any, Tuple[List[int], List[float]]]:
+        """按学科分组并缓存排序后的指标值（用于百分位计算）"""
+        cache_key = (group_by, metric)
+        if cache_key not in self._groups:
+            groups: Dict[Any, List[int]] = {}
+            values = self.columns[metric]
+            for i, category in enumerate(self.columns[RANK_GROUPS[group_by]]):
+                if category is not None and values[i] is not None:
+                    groups.setdefault(category, []).append(i)
+            self._groups[cache_key] = {
+                category: (rows, sorted(values[i] for i in rows)) for category, rows in groups.items()
+            }
+        return self._groups[cache_key]
+
+    def categories(self, group_by: str = "category") -> List[Any]:
+        """返回可用学科列表"""
+        return sorted(self._group(group_by, "if"))
+
+    def top_k(self, metric: str = "if", k: int = 20, group_by: str = "category",
+              category: Optional[str] = None, exclude_warned: bool = False) -> Dict[Any, List[Dict[str, Any]]]:
+        """每个学科按指标取Top-K（堆选择），并附带学科内百分位"""
+        if metric not in RANK_METRICS:
+            raise QueryError(f"不支持的排名指标: {metric}（可用: {', '.join(RANK_METRICS)}）")
+        if group_by not in RANK_GROUPS:
+            raise QueryError(f"不支持的分组字段: {group_by}（可用: {', '.join(RANK_GROUPS)}）")
+
+        higher_is_better = RANK_METRICS[metric][1]
+        values = self.columns[metric]
+        warned = self.columns["warned"]
+
+        ranking = {}
+        groups = self._group(group_by, metric)
+        for group in sorted(groups, key=str):
+            rows, sorted_values = groups[group]
+            if category and category.casefold() not in str(group).casefold():
+                continue
+            candidates = (i for i in rows if not (exclude_warned and warned[i]))
+            if higher_is_better:
+                top = heapq.nlargest(k, candidates, key=lambda i: values[i])
+            else:
+                top = heapq.nsmallest(k, candidates, key=lambda i: values[i])
+
+            count = len(sorted_values)
+            entries = []
+            for i in top:
+                # 百分位: 学科内表现不优于该期刊的比例（同PERCENT_RANK）
+                if higher_is_better:
+                    below = bisect_left(sorted_values, values[i])
+                else:
+                    below = count - bisect_right(sorted_values, values[i])
+                percentile = 100.0 if count == 1 else round(below / (count - 1) * 100, 1)
+                entries.append({
+                    "journal": self.columns["journal"][i],
+                    "value": values[i],
+                    "percentile": percentile,
+                    "jcr_if": self.columns["jcr_if"][i],
+                    "jcr_quartile": self.columns["jcr_quartile"][i],
+                    "cas_partition": self.columns["cas_partition"][i],
+                    "warned": bool(warned[i]),
+                    "category_size": count,
+                })
+            if entries:
+                ranking[group] = entries
+        return ranking
+
+
+# 升降榜数据源: 名称 -> (说明, 分区列, 学科列)
+MOVER_SOURCES = {
+    "cas": ("中科院分区表", "cas_partition", "cas_category"),
+    "jcr": ("JCR", "jcr_quartile", "jcr_category"),
+}
+
+# 升降榜指标: 名称 -> 说明（变化值统一为正数表示上升/改善）
+MOVER_METRICS = {
+    "partition": "分区变化",
+    "if": "影响因子变化",
+    "if_pct": "影响因子变化率",
+    "rank": "学科排名比例变化",
+}
+
+
+class MetricSnapshot:
+    """单一年份、单一数据源的NumPy列式指标快照，用于跨年份的整表比较
+
+    source="jcr" 只取该年份本身的JCR年度表（jcr_year = year），source="cas" 只取有中科院分区的行；
+    每个规范化刊名一行，各列按 title_key 排序（定长字符串数组，在NumPy中排序：
+    SQL里 ORDER BY title_key 会让SQLite改走刊名索引逐行回表），比较时用二分查找向量化连接。
+    """
+
+    def __init__(self, source: str, year: str, columns: Dict[str, np.ndarray]):
+        self.source = source
+        self.year = year
+        self.columns = columns
+        self.size = len(columns["title_key"])
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, source: str, year: str) -> "MetricSnapshot":
+        """一次读取某年份的比较所需列"""
+        if source not in MOVER_SOURCES:
+            raise QueryError(f"不支持的数据源: {source}（可用: {', '.join(MOVER_SOURCES)}）")
+        _, partition_column, category_column = MOVER_SOURCES[source]
+        condition = "jcr_year = year" if source == "jcr" else "cas_partition IS NOT NULL"
+
+        rows = []
+        if table_exists(conn, "journal_metrics"):
+            rows = conn.execute(f"""
+                SELECT title_key, journal, {category_column}, {partition_column}, jcr_if, jcr_rank, jcr_rank_total, warned
+                FROM journal_metrics WHERE year = ? AND {condition}
+            """, (year,)).fetchall()
+
+        keys, journals, categories, partitions, impacts, ranks, totals, warned = zip(*rows) if rows else ([],) * 8
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rank = np.array(ranks, dtype=float) / np.array(totals, dtype=float)
+        columns = {
+            "title_key": np.array(keys, dtype=str),
+            "journal": np.array(journals, dtype=object),
+            "category": np.array(categories, dtype=object),
+            "partition": np.array(partitions, dtype=float),
+            "if": np.array(impacts, dtype=float),
+            "rank": rank,
+            "warned": np.array(warned, dtype=bool),
+        }
+        order = np.argsort(columns["title_key"], kind="stable")
+        return cls(source, year, {name: column[order] for name, column in columns.items()})
+
+    def join(self, other: "MetricSnapshot") -> Tuple[np.ndarray, np.ndarray]:
+        """与另一快照按 title_key 连接，返回两侧匹配行的下标"""
+        if not self.size or not other.size:
+            empty = np.array([], dtype=int)
+            return empty, empty
+        keys, other_keys = self.columns["title_key"], other.columns["title_key"]
+        position = np.minimum(np.searchsorted(other_keys, keys), other.size - 1)
+        matched = np.flatnonzero(other_keys[position] == keys)
+        return matched, position[matched]
+
+
+def compare_snapshots(old: MetricSnapshot, new: MetricSnapshot, metric: str = "partition",
+                      direction: str = "down", category: Optional[str] = None,
+                      from_partition: Optional[int] = None, min_change: Optional[float] = None,
+                      limit: int = 50) -> Dict[str, Any]:
+    """比较两个年份的快照，返回按变化幅度排序的升降期刊及学科分布
+
+    两个快照按 title_key 一次连接，全部差值、筛选与排序都是数组运算。
+    变化值统一为正数表示改善：分区/排名比例取旧值减新值，影响因子取新值减旧值。
+    """
+    if metric not in MOVER_METRICS:
+        raise QueryError(f"不支持的比较指标: {metric}（可用: {', '.join(MOVER_METRICS)}）")
+    if direction not in ("up", "down", "both"):
+        raise QueryError(f"不支持的变化方向: {direction}（可用: up, down, both）")
+
+    old_idx, new_idx = old.join(new)
+    before = {name: column[old_idx] for name, column in old.columns.items()}
+    after = {name: column[new_idx] for name, column in new.columns.items()}
+
+    if metric == "partition":
+        change = before["partition"] - after["partition"]
+    elif metric == "rank":
+        change = before["rank"] - after["rank"]
+    elif metric == "if":
+        change = after["if"] - before["if"]
+    else:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.where(before["if"] > 0, (after["if"] - before["if"]) / before["if"], np.nan)
+
+    # 学科取新年份，缺失时回退到旧年份
+    categories = np.where(after["category"] == None, before["category"], after["category"])  # noqa: E711
+
+    mask = ~np.isnan(change)
+    threshold = min_change if min_change is not None else 0.0
+    if direction == "up":
+        mask &= change > threshold
+    elif direction == "down":
+        mask &= change < -threshold
+    else:
+        mask &= np.abs(change) > threshold
+    if from_partition is not None:
+        mask &= before["partition"] == from_partition
+    if category:
+        needle = category.casefold()
+        mask &= np.fromiter((c is not None and needle in str(c).casefold() for c in categories),
+                            dtype=bool, count=len(categories))
+
+    selected = np.flatnonzero(mask)
+    if direction == "up":
+        order = np.argsort(-change[selected], kind="stable")
+    elif direction == "down":
+        order = np.argsort(change[selected], kind="stable")
+    else:
+        order = np.argsort(-np.abs(change[selected]), kind="stable")
+    ranked = selected[order]
+
+    # 学科分布：各学科符合条件的期刊数（上升/下降）
+    breakdown = []
+    if len(selected):
+        names, inverse = np.unique(categories[selected].astype(str), return_inverse=True)
+        up = np.bincount(inverse, weights=change[selected] > 0, minlength=len(names)).astype(int)
+        down = np.bincount(inverse, weights=change[selected] < 0, minlength=len(names)).astype(int)
+        for i in np.argsort(-(up + down), kind="stable"):
+            breakdown.append({"category": None if names[i] == "None" else str(names[i]),
+                              "up": int(up[i]), "down": int(down[i])})
+
+    def value(array, i):
+        return None if np.isnan(array[i]) else round(float(array[i]), 4)
+
+    movers = []
+    for i in ranked[:max(limit, 0)]:
+        movers.append({
+            "journal": after["journal"][i],
+            "category": categories[i],
+            "change": round(float(change[i]), 4),
+            "partition_from": None if np.isnan(before["partition"][i]) else int(before["partition"][i]),
+            "partition_to": None if np.isnan(after["partition"][i]) else int(after["partition"][i]),
+            "if_from": value(before["if"], i),
+            "if_to": value(after["if"], i),
+            "rank_from": value(before["rank"], i),
+            "rank_to": value(after["rank"], i),
+            "warned": bool(after["warned"][i]),
+        })
+
+    return {
+        "source": new.source,
+        "from_year": old.year,
+        "to_year": new.year,
+        "metric": metric,
+        "direction": direction,
+        "compared": int(len(old_idx)),
+        "added": int(new.size - len(new_idx)),
+        "removed": int(old.size - len(old_idx)),
+        "matched": int(len(selected)),
+        "movers": movers,
+        "categories": breakdown,
+    }
+
+
+# 相似度数值特征: journal_features 列名 -> 权重（按标准差缩放后加权）
+SIMILARITY_FEATURES = {
+    "log_if": 2.0,
+    "cas_partition": 1.5,
+    "jcr_quartile": 1.0,
+    "if_trend": 0.5,
+    "cas_top": 0.5,
+    "cas_oa": 0.5,
+}
+# 学科不同时的距离惩罚，等价于学科one-hot向量的加权欧氏距离，但不必展开为宽矩阵
+CATEGORY_WEIGHTS = {"cas_category": 3.0, "jcr_category": 1.0}
+
+
+class SimilarityIndex:
+    """期刊指标向量的最近邻索引
+
+    数值特征按列标准化（缺失值取中位数）并乘以权重的平方根，构成 float32 矩阵；
+    学科以整数编码保存。查询时对全表做一次向量化距离扫描，再用 argpartition 取前K个。
+    """
+
+    def __init__(self, keys: List[str], columns: Dict[str, np.ndarray], matrix: np.ndarray,
+                 codes: Dict[str, np.ndarray]):
+        self.keys = keys
+        self.columns = columns
+        self.matrix = matrix
+        self.codes = codes
+        self._positions = {key: i for i, key in enumerate(keys)}
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> "SimilarityIndex":
+        """读取同步时构建的 journal_features 表"""
+        names = ["journal", "year", "cas_category", "jcr_category", "warned"] + list(SIMILARITY_FEATURES)
+        rows = []
+        if table_exists(conn, "journal_features"):
+            rows = conn.execute(f"SELECT title_key, {', '.join(names)} FROM journal_features").fetchall()
+
+        values = list(zip(*rows)) if rows else [[] for _ in range(len(names) + 1)]
+        columns = {name: np.array(column, dtype=object) for name, column in zip(names, values[1:])}
+
+        features = []
+        for name, weight in SIMILARITY_FEATURES.items():
+            column = np.array(columns[name], dtype=float)
+            present = ~np.isnan(column)
+            if present.any():
+                column[~present] = np.median(column[present])
+                scale = column.std() or 1.0
+                column = (column - column.mean()) / scale
+            else:
+                column[:] = 0.0
+            features.append(column * np.sqrt(weight))
+            columns[name] = np.array(columns[name], dtype=float)
+        matrix = np.column_stack(features).astype(np.float32) if rows else np.zeros((0, len(features)), np.float32)
+
+        # 学科编码，缺失为-1
+        codes = {}
+        for name in CATEGORY_WEIGHTS:
+            vocabulary: Dict[Any, int] = {}
+            codes[name] = np.array([-1 if c is None else vocabulary.setdefault(c, len(vocabulary))
+                                    for c in columns[name]], dtype=np.int32)
+        columns["warned"] = np.array(columns["warned"], dtype=bool)
+        return cls(list(values[0]), columns, matrix, codes)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def position(self, title_key: str) -> Optional[int]:
+        """规范化刊名对应的行号"""
+        return self._positions.get(title_key)
+
+    def distances(self, row: int) -> np.ndarray:
+        """查询行到全部期刊的加权距离"""
+        squared = np.square(self.matrix - self.matrix[row]).sum(axis=1)
+        for name, weight in CATEGORY_WEIGHTS.items():
+            codes = self.codes[name]
+            squared += weight * ((codes != codes[row]) | (codes < 0))
+        return np.sqrt(squared)
+
+    def neighbors(self, row: int, k: int = 10, exclude_warned: bool = True,
+                  same_category: bool = False) -> List[Tuple[int, float]]:
+        """距离最近的K个期刊（不含查询期刊本身），按距离升序"""
+        distance = self.distances(row)
+        candidate = np.ones(len(self.keys), dtype=bool)
+        candidate[row] = False
+        if exclude_warned:
+            candidate &= ~self.columns["warned"]
+        if same_category:
+            candidate &= self.codes["cas_category"] == self.codes["cas_category"][row]
+
+        rows = np.flatnonzero(candidate)
+        if len(rows) > k:
+            rows = rows[np.argpartition(distance[rows], k)[:k]]
+        rows = rows[np.argsort(distance[rows], kind="stable")]
+        return [(int(i), float(distance[i])) for i in rows]
+
+    def record(self, row: int, distance: Optional[float] = None) -> Dict[str, Any]:
+        """一行的原始指标"""
+        columns = self.columns
+        impact = columns["log_if"][row]
+        record = {
+            "journal": columns["journal"][row],
+            "year": columns["year"][row],
+            "impact_factor": None if np.isnan(impact) else round(float(np.expm1(impact)), 3),
+            "jcr_quartile": None if np.isnan(columns["jcr_quartile"][row]) else f"Q{int(columns['jcr_quartile'][row])}",
+            "cas_partition": None if np.isnan(columns["cas_partition"][row]) else f"{int(columns['cas_partition'][row])}区",
+            "cas_top": None if np.isnan(columns["cas_top"][row]) else bool(columns["cas_top"][row]),
+            "category": columns["cas_category"][row] or columns["jcr_category"][row],
+            "warned": bool(columns["warned"][row]),
+        }
+        if distance is not None:
+            record["similarity"] = round(1.0 / (1.0 + distance), 3)
+        return record
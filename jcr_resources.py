@@ -0,0 +1,196 @@
+"""
+JCR分区表可寻址资源
+期刊（jcr://journal/{id}）、学科（jcr://category/{year}/{name}）与预警名单（jcr://warnings/{year}）的资源载荷。
+实体数据按数据库版本一次加载，序列化后的载荷与内容ETag按需生成并缓存，
+客户端与HTTP缓存代理可凭ETag低成本地重新验证，无需重新调用工具。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote
+
+from jcr_index import AliasIndex, WarningIndex, table_exists
+
+RESOURCE_SCHEME = "jcr://"
+# 已序列化载荷的缓存条数。载荷按需生成而不在加载目录时全部预计算：5万种期刊的全部载荷
+# 序列化需要数十秒、占用上百MB内存，而客户端通常只读取少数热门期刊与学科
+PAYLOAD_CACHE_SIZE = 4096
+
+# 期刊资源中每个年份的指标字段
+JOURNAL_FIELDS = ("year", "jcr_year", "jcr_if", "jcr_if_change", "jcr_quartile", "jcr_category", "jcr_rank",
+                  "jcr_rank_total", "cas_category", "cas_partition", "cas_top", "cas_oa", "warned")
+# 学科资源中每个期刊的字段
+CATEGORY_FIELDS = ("journal_id", "journal", "cas_partition", "cas_top", "jcr_if", "jcr_quartile", "warned")
+
+
+def etag_for(content: Union[str, bytes]) -> str:
+    """内容ETag（强校验，带引号的HTTP格式）"""
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    return '"' + hashlib.blake2b(data, digest_size=8).hexdigest() + '"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """If-None-Match 是否命中：支持多个ETag、弱校验前缀 W/ 与 *"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def resource_uri(kind: str, *parts: Any) -> str:
+    """资源URI，路径各段按URL编码"""
+    return RESOURCE_SCHEME + "/".join([kind] + [quote(str(part), safe="") for part in parts])
+
+
+@dataclass(frozen=True)
+class Payload:
+    """资源载荷：JSON正文及其ETag"""
+    body: str
+    etag: str
+
+    @classmethod
+    def build(cls, data: Dict[str, Any]) -> "Payload":
+        # 资源供程序缓存与解析，使用紧凑的JSON分隔符
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        return cls(body, etag_for(body))
+
+
+class ResourceCatalog:
+    """一个数据库版本的资源目录
+
+    加载时一次扫描 journal_metrics，按期刊ID与(年份, 中科院大类)分组；预警名单直接取自预警索引。
+    载荷内容只取决于数据库内容，ETag为正文哈希，同步后内容未变的资源ETag保持不变。
+    载荷LRU缓存属于目录实例，目录按数据库版本缓存，同步后旧版本的载荷随旧目录一起释放。
+    """
+
+    def __init__(self, aliases: AliasIndex, warnings: WarningIndex):
+        self.aliases = aliases
+        self.warnings = warnings
+        # 期刊ID -> 各年份指标（新年份在前）
+        self._journals: Dict[int, List[tuple]] = {}
+        # (年份, 大类) -> 期刊列表
+        self._categories: Dict[Tuple[str, str], List[tuple]] = {}
+        self._payloads: "OrderedDict[str, Payload]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, aliases: AliasIndex, warnings: WarningIndex) -> "ResourceCatalog":
+        """从 journal_metrics 加载期刊与学科数据"""
+        catalog = cls(aliases, warnings)
+        if not table_exists(conn, "journal_metrics"):
+            return catalog
+
+        columns = ", ".join(("title_key", "journal") + JOURNAL_FIELDS)
+        year_at, category_at = JOURNAL_FIELDS.index("year"), JOURNAL_FIELDS.index("cas_category")
+        # 学科资源所需字段在指标行中的位置
+        picks = [JOURNAL_FIELDS.index(field) for field in CATEGORY_FIELDS[2:]]
+        for row in conn.execute(f"SELECT {columns} FROM journal_metrics ORDER BY year DESC, journal"):
+            title_key, journal, metrics = row[0], row[1], row[2:]
+            journal_id = aliases.resolve_key(title_key)
+            if journal_id is not None:
+                catalog._journals.setdefault(journal_id, []).append(metrics)
+            category = metrics[category_at]
+            if category:
+                catalog._categories.setdefault((metrics[year_at], category), []).append(
+                    (journal_id, journal) + tuple(metrics[i] for i in picks))
+        return catalog
+
+    def _payload(self, uri: str, build: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Payload]:
+        """取缓存的载荷，未缓存时构建并放入LRU缓存"""
+        with self._lock:
+            payload = self._payloads.get(uri)
+            if payload is not None:
+                self._payloads.move_to_end(uri)
+                return payload
+
+        data = build()
+        if data is None:
+            return None
+        payload = Payload.build(data)
+        with self._lock:
+            self._payloads[uri] = payload
+            while len(self._payloads) > PAYLOAD_CACHE_SIZE:
+                self._payloads.popitem(last=False)
+        return payload
+
+    def journal(self, journal_id: int) -> Optional[Payload]:
+        """期刊资源：规范刊名、全部写法、各年份指标与预警记录"""
+        uri = resource_uri("journal", journal_id)
+
+        def build():
+            name = self.aliases.canonical(journal_id)
+            rows = self._journals.get(journal_id, [])
+            if name is None and not rows:
+                return None
+            titles = self.aliases.titles(journal_id)
+            warnings: Dict[str, str] = {}
+            for title in titles or [name]:
+                warnings.update(self.warnings.lookup(title))
+            return {
+                "uri": uri,
+                "id": journal_id,
+                "journal": name,
+                "titles": titles,
+                "metrics": [dict(zip(JOURNAL_FIELDS, row)) for row in rows],
+                "warnings": {year: warnings[year] for year in sorted(warnings, reverse=True)},
+            }
+
+        return self._payload(uri, build)
+
+    def category(self, year: str, name: str) -> Optional[Payload]:
+        """学科资源：中科院大类在指定年份的全部期刊，按分区、影响因子排序"""
+        uri = resource_uri("category", year, name)
+
+        def build():
+            rows = self._categories.get((year, name))
+            if not rows:
+                return None
+            rows = sorted(rows, key=lambda row: (row[2] or 99, -(row[4] or 0), row[1]))
+            partitions: Dict[str, int] = {}
+            for row in rows:
+                label = f"{row[2]}区" if row[2] else "未知"
+                partitions[label] = partitions.get(label, 0) + 1
+            return {
+                "uri": uri,
+                "year": year,
+                "category": name,
+                "journal_count": len(rows),
+                "partitions": dict(sorted(partitions.items())),
+                "top_count": sum(1 for row in rows if row[3]),
+                "warned_count": sum(1 for row in rows if row[6]),
+                "journals": [dict(zip(CATEGORY_FIELDS, row)) for row in rows],
+            }
+
+        return self._payload(uri, build)
+
+    def warning_list(self, year: str) -> Optional[Payload]:
+        """预警名单资源：指定年份的全部预警期刊及其各年份预警等级"""
+        uri = resource_uri("warnings", year)
+
+        def build():
+            if year not in self.warnings.years:
+                return None
+            total, items = self.warnings.page(year=year, limit=len(self.warnings))
+            return {
+                "uri": uri,
+                "year": year,
+                "journal_count": total,
+                "journals": [{
+                    "journal": title,
+                    "journal_id": self.aliases.resolve(title),
+                    "level": levels[year],
+                    "years": {y: levels[y] for y in sorted(levels, reverse=True)},
+                } for title, levels in items],
+            }
+
+        return self._payload(uri, build)
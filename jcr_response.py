@@ -0,0 +1,167 @@
+"""
+JCR分区表MCP服务器响应预算
+列表类工具按条目数与字符数预算截断结果：逐条格式化时一旦超出预算即停止，被截掉的条目不做格式化；
+提供紧凑的表格编码（表头 + 竖线分隔的行）与续页游标，客户端可按游标继续取后续结果。
+"""
+
+import base64
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+# 未指定 max_chars 时的字符预算（0表示不限）
+DEFAULT_MAX_CHARS = int(os.environ.get("JCR_MAX_RESPONSE_CHARS", 20000))
+
+
+class CursorError(ValueError):
+    """续页游标无效或已失效"""
+
+
+def cursor_key(*parts: Any) -> str:
+    """续页游标的查询标识：工具名、查询参数与数据库版本的短哈希，任一变化后旧游标失效"""
+    payload = json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=6).hexdigest()
+
+
+def encode_page_cursor(key: str, offset: int) -> str:
+    """编码续页游标（查询标识 + 下一条的位置）"""
+    payload = json.dumps([key, offset]).encode("ascii")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_page_cursor(cursor: str, key: str) -> int:
+    """解码续页游标，返回下一条的位置；游标不属于本次查询时抛出 CursorError"""
+    try:
+        padded = cursor.strip() + "=" * (-len(cursor.strip()) % 4)
+        owner, offset = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset = int(offset)
+    except (ValueError, TypeError):
+        raise CursorError("无效的续页游标")
+    if owner != key:
+        raise CursorError("续页游标已失效（查询参数或数据库已变化），请重新查询")
+    return max(offset, 0)
+
+
+def page_start(cursor: Optional[str], key: str, default: int = 0) -> int:
+    """本页起始位置：有游标时取游标位置，否则为 default"""
+    return decode_page_cursor(cursor, key) if cursor else max(default, 0)
+
+
+@dataclass
+class ResponseBudget:
+    """响应预算：条目数与字符数上限，None 表示不限"""
+    max_items: Optional[int] = None
+    max_chars: Optional[int] = None
+
+    @classmethod
+    def of(cls, max_items: Optional[int] = None, max_chars: Optional[int] = None) -> "ResponseBudget":
+        """由工具参数生成预算：未指定 max_chars 时使用 DEFAULT_MAX_CHARS，0 或负数表示不限"""
+        if max_chars is None:
+            max_chars = DEFAULT_MAX_CHARS
+        return cls(max_items if max_items is not None and max_items > 0 else None,
+                   max_chars if max_chars > 0 else None)
+
+
+@dataclass
+class Page:
+    """一页结果：已选条目及其格式化文本"""
+    items: List[Any]
+    chunks: List[str]
+    start: int
+    total: Optional[int]
+    cursor: Optional[str] = None
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.items)
+
+    @property
+    def truncated(self) -> bool:
+        """是否还有后续结果"""
+        return self.cursor is not None
+
+
+def paginate(items: Sequence, render: Callable[[Any], str], budget: ResponseBudget, start: int = 0,
+             total: Optional[int] = None, key: Optional[str] = None, reserve: int = 0,
+             group: Optional[Callable[[Any], Any]] = None) -> Page:
+    """按预算逐条格式化结果
+
+    items 为从 start 开始的剩余结果（已按相关性排序），total 为结果总数（默认 start + len(items)）。
+    超出条目数或字符数（扣除页眉页脚预留的 reserve）时停止，之后的条目不再格式化；
+    至少保留一条以保证翻页前进，因此只有单条结果本身超过预算时，本页才会超出 max_chars。
+    分组展示的结果（如期刊的各年份、学科的各名次）应按行传入，可在组内截断；
+    给出 group 时 max_items 按相邻条目 group(item) 的不同取值计数。给出 key 且还有剩余结果时生成下一页游标。
+    """
+    total = start + len(items) if total is None else total
+    limit = None if budget.max_chars is None else max(budget.max_chars - reserve, 0)
+    kept, chunks, used, groups = [], [], 0, 0
+    current = object()
+    for item in items:
+        label = group(item) if group is not None else object()
+        new_group = label != current
+        if budget.max_items is not None and new_group and groups >= budget.max_items:
+            break
+        text = render(item)
+        if limit is not None and kept and used + len(text) + 1 > limit:
+            break
+        kept.append(item)
+        chunks.append(text)
+        used += len(text) + 1
+        if new_group:
+            groups += 1
+            current = label
+
+    page = Page(kept, chunks, start, total)
+    if key is not None and page.end < total:
+        page.cursor = encode_page_cursor(key, page.end)
+    return page
+
+
+def text_footer(page: Page, unit: str = "条") -> List[str]:
+    """文本格式的分页提示，没有后续结果时为空"""
+    if not page.truncated:
+        return []
+    shown = f"显示第 {page.start + 1}-{page.end} {unit}" + (f"，共 {page.total} {unit}" if page.total else "")
+    return [f"\n📄 {shown}（已达响应预算）", f"💡 下一页: cursor=\"{page.cursor}\""]
+
+
+def compact_cell(value: Any) -> str:
+    """紧凑格式的单元格：空值为空串，布尔为1/0，列表以分号连接，转义竖线并去掉换行"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    if isinstance(value, dict):
+        return ";".join(f"{k}:{compact_cell(v)}" for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return ";".join(compact_cell(v) for v in value)
+    text = " ".join(str(value).split())
+    return text.replace("\\", "\\\\").replace("|", "\\|")
+
+
+def compact_row(values: Iterable[Any]) -> str:
+    """紧凑格式的一行"""
+    return "|".join(compact_cell(value) for value in values)
+
+
+def compact_table(title: str, columns: Sequence[str], page: Page, notes: Iterable[str] = ()) -> str:
+    """紧凑表格：标题行、表头、数据行与分页行，说明行以 # 开头"""
+    lines = [f"# {title}", "|".join(columns)]
+    lines.extend(page.chunks)
+    lines.extend(f"# {note}" for note in notes)
+    summary = f"# {page.start + 1}-{page.end}" if page.items else f"# {page.start}-{page.start}"
+    if page.total is not None:
+        summary += f"/{page.total}"
+    if page.cursor:
+        summary += f" next_cursor={page.cursor}"
+    lines.append(summary)
+    return "\n".join(lines)
+
+
+def compact_size(columns: Sequence[str], title: str = "") -> int:
+    """紧凑表格页眉与分页行的大致字符数，用作 paginate 的 reserve"""
+    return len(title) + sum(len(c) + 1 for c in columns) + 80
@@ -0,0 +1,386 @@
+"""
+JCR分区表MCP服务器运行时组件
+并发请求合并、定时刷新的缓存、查询期限、准入控制等与查询逻辑无关的运行时控制
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Iterable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# progress_handler 的检查间隔（SQLite虚拟机指令数）
+PROGRESS_INTERVAL = 10_000
+
+
+class SingleFlight:
+    """请求合并：相同键的并发请求共享同一次计算结果"""
+
+    def __init__(self):
+        # 键 -> (共享任务, 等待者数量)
+        self._inflight: Dict[Hashable, list] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行或加入同键的进行中计算
+
+        计算在独立任务中运行，单个等待者被取消不会影响其他等待者；
+        所有等待者都取消后才取消计算本身。
+        """
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(fn())
+            entry = [task, 0]
+            self._inflight[key] = entry
+            self.executions += 1
+            task.add_done_callback(lambda _, k=key, e=entry: self._finish(k, e))
+        else:
+            self.coalesced += 1
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not entry[0].done():
+                entry[0].cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    def _finish(self, key: Hashable, entry: list):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        """合并统计"""
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+
+class CachedValue:
+    """带TTL的异步缓存值
+
+    过期后由首个请求刷新，并发刷新合并为一次；可选的后台轮询定时刷新，
+    使请求路径总能直接命中缓存。刷新失败时不覆盖已有的值。
+    """
+
+    def __init__(self, fn: Callable[[], Awaitable[Any]], ttl: float):
+        self.fn = fn
+        self.ttl = ttl
+        self._value: Any = None
+        self._updated: Optional[float] = None
+        self._flight = SingleFlight()
+        self._poller: Optional[asyncio.Task] = None
+        self._pollers = 0
+        self.hits = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def age(self) -> Optional[float]:
+        """缓存值的存活时间（秒），尚未获取时为None"""
+        return None if self._updated is None else time.monotonic() - self._updated
+
+    def fresh(self) -> bool:
+        """缓存值是否在TTL内"""
+        age = self.age()
+        return age is not None and age < self.ttl
+
+    def set(self, value: Any):
+        """直接写入新值（如同步完成后已知远程状态）"""
+        self._value = value
+        self._updated = time.monotonic()
+
+    async def get(self, refresh: bool = False) -> Any:
+        """返回缓存值，过期或要求刷新时重新获取"""
+        if not refresh and self.fresh():
+            self.hits += 1
+            return self._value
+        return await self.refresh()
+
+    async def refresh(self) -> Any:
+        """重新获取并缓存，并发调用只执行一次"""
+        try:
+            value = await self._flight.do("refresh", self.fn)
+        except Exception:
+            self.errors += 1
+            raise
+        self.refreshes += 1
+        self.set(value)
+        return value
+
+    async def _poll(self, interval: float):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"后台刷新失败: {e}")
+            await asyncio.sleep(interval)
+
+    @asynccontextmanager
+    async def polling(self, interval: float) -> AsyncIterator["CachedValue"]:
+        """在上下文期间后台定时刷新（interval<=0时不轮询）；多个持有者共享同一个轮询任务"""
+        if interval <= 0:
+            yield self
+            return
+        self._pollers += 1
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll(interval))
+        try:
+            yield self
+        finally:
+            self._pollers -= 1
+            if self._pollers == 0 and self._poller is not None:
+                self._poller.cancel()
+                self._poller = None
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        age = self.age()
+        return {
+            "ttl": self.ttl,
+            "age": None if age is None else round(age, 1),
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "polling": self._poller is not None,
+        }
+
+
+class DeadlineExceeded(Exception):
+    """执行期限内未能完成（如冷启动时构建内存索引被中断），没有可返回的部分结果"""
+
+
+class QueryDeadline:
+    """单次请求的数据库执行期限
+
+    通过 sqlite3 的 progress_handler 在语句执行中定期检查：超过期限或请求被取消时返回非零值，
+    SQLite 随即中断当前语句并抛出 sqlite3.OperationalError（interrupted）。
+    调用方用 interrupted() 识别这类异常，返回已取得的部分结果并标记截断。
+    """
+
+    # 全进程的期限统计
+    expired_count = 0
+    cancelled_count = 0
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds if seconds and seconds > 0 else None
+        self._cancelled = threading.Event()
+        self.truncated = False
+
+    def cancel(self):
+        """取消请求，工作线程在下一次进度检查时中断当前语句"""
+        if not self._cancelled.is_set():
+            self._cancelled.set()
+            QueryDeadline.cancelled_count += 1
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def expired(self) -> bool:
+        """是否已超过期限或被取消"""
+        return self.cancelled or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def remaining(self) -> Optional[float]:
+        """剩余时间（秒），无期限时为None"""
+        return None if self.deadline is None else max(self.deadline - time.monotonic(), 0.0)
+
+    def attach(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        """在连接上安装进度检查"""
+        conn.set_progress_handler(lambda: int(self.expired()), PROGRESS_INTERVAL)
+        return conn
+
+    def check(self) -> bool:
+        """在语句之间检查期限（如逐表查询时），到期则标记截断"""
+        if self.expired():
+            self._truncate()
+            return True
+        return False
+
+    def ensure(self):
+        """在计算步骤之间检查期限，到期则标记截断并抛出 DeadlineExceeded"""
+        if self.check():
+            raise DeadlineExceeded()
+
+    def interrupted(self, error: sqlite3.Error) -> bool:
+        """判断异常是否由期限中断引起，是则标记结果截断"""
+        if isinstance(error, sqlite3.OperationalError) and "interrupt" in str(error) and self.expired():
+            self._truncate()
+            return True
+        return False
+
+    def _truncate(self):
+        if not self.truncated:
+            self.truncated = True
+            if not self.cancelled:
+                QueryDeadline.expired_count += 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """期限统计"""
+        return {"expired": cls.expired_count, "cancelled": cls.cancelled_count}
+
+
+async def run_with_deadline(fn: Callable[[QueryDeadline], T], seconds: Optional[float]) -> T:
+    """在线程池中执行 fn(deadline)
+
+    协程被取消（如客户端断开、上层超时）时取消期限，工作线程中的SQL随即中断，
+    不会在后台继续占用数据库连接与线程。
+    """
+    deadline = QueryDeadline(seconds)
+    try:
+        return await asyncio.to_thread(fn, deadline)
+    except asyncio.CancelledError:
+        deadline.cancel()
+        raise
+
+
+@dataclass
+class CostClass:
+    """工具调用的成本类别"""
+    name: str
+    # 优先级，数值越小越先出队
+    priority: int
+    # 本类别的最大并发
+    limit: int
+    # 排队上限，超出后直接拒绝
+    max_queue: int
+
+
+class SchedulerBusy(Exception):
+    """排队已满，拒绝新的调用"""
+
+
+class AdmissionScheduler:
+    """工具调用的准入控制与优先级调度
+
+    全局并发上限 capacity 之内，各成本类别另有并发上限。有空闲名额时按类别优先级出队，
+    同一类别内按客户端轮转（公平排队），单个客户端的大量调用不会挤占其他客户端；
+    排队数超过上限的调用直接拒绝，不再无限堆积。
+    """
+
+    # 每个类别保留的排队时间样本数
+    WAIT_SAMPLES = 1024
+
+    def __init__(self, capacity: int, classes: Iterable[CostClass]):
+        self.capacity = capacity
+        self.classes = {cost_class.name: cost_class for cost_class in classes}
+        self._order = sorted(self.classes.values(), key=lambda c: c.priority)
+        self.running = 0
+        self._running = {name: 0 for name in self.classes}
+        # 类别 -> {客户端: 等待队列}，客户端按轮转顺序排列
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {
+            name: OrderedDict() for name in self.classes}
+        self._queued = {name: 0 for name in self.classes}
+        self._admitted = {name: 0 for name in self.classes}
+        self._rejected = {name: 0 for name in self.classes}
+        self._waits: Dict[str, Deque[float]] = {name: deque(maxlen=self.WAIT_SAMPLES) for name in self.classes}
+
+    def _runnable(self, cost_class: CostClass) -> bool:
+        return self.running < self.capacity and self._running[cost_class.name] < cost_class.limit
+
+    def _waiting_ahead(self, cost_class: CostClass) -> bool:
+        """是否有同等或更高优先级的调用在排队（新调用不插队）"""
+        return any(self._queued[c.name] for c in self._order if c.priority <= cost_class.priority)
+
+    def _start(self, cost_class: CostClass):
+        self.running += 1
+        self._running[cost_class.name] += 1
+
+    def _finish(self, cost_class: CostClass):
+        self.running -= 1
+        self._running[cost_class.name] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """把空闲名额分配给优先级最高、且未达类别上限的排队调用"""
+        while self.running < self.capacity:
+            cost_class = next((c for c in self._order if self._queued[c.name] and self._runnable(c)), None)
+            if cost_class is None:
+                return
+            queue = self._queues[cost_class.name]
+            client, waiters = next(iter(queue.items()))
+            future = waiters.popleft()
+            if waiters:
+                queue.move_to_end(client)
+            else:
+                del queue[client]
+            self._queued[cost_class.name] -= 1
+            # 等待者可能在本轮事件循环中刚被取消、尚未执行 _withdraw，跳过它，名额留给下一个
+            if future.done():
+                continue
+            future.set_result(None)
+            self._start(cost_class)
+
+    def _withdraw(self, cost_class: CostClass, client: str, future: asyncio.Future):
+        """从队列中移除已取消的等待者"""
+        queue = self._queues[cost_class.name]
+        waiters = queue.get(client)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del queue[client]
+            self._queued[cost_class.name] -= 1
+
+    @asynccontextmanager
+    async def slot(self, name: str, client: str = "") -> AsyncIterator[None]:
+        """占用一个执行名额，名额不足时排队，排队已满时抛出 SchedulerBusy"""
+        cost_class = self.classes[name]
+        start = time.monotonic()
+        if self._runnable(cost_class) and not self._waiting_ahead(cost_class):
+            self._start(cost_class)
+        else:
+            if self._queued[name] >= cost_class.max_queue:
+                self._rejected[name] += 1
+                raise SchedulerBusy(f"{name} 类调用排队已满（{cost_class.max_queue}），请稍后重试")
+            future = asyncio.get_running_loop().create_future()
+            self._queues[name].setdefault(client, deque()).append(future)
+            self._queued[name] += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # 已分配到名额但调用方被取消，归还名额
+                    self._finish(cost_class)
+                else:
+                    self._withdraw(cost_class, client, future)
+                raise
+
+        self._waits[name].append(time.monotonic() - start)
+        self._admitted[name] += 1
+        try:
+            yield
+        finally:
+            self._finish(cost_class)
+
+    def stats(self) -> Dict[str, Any]:
+        """各类别的并发、排队与排队时间分位数（毫秒）"""
+        classes = {}
+        for name, cost_class in self.classes.items():
+            waits = sorted(self._waits[name])
+            def percentile(q):
+                return round(waits[min(int(len(waits) * q), len(waits) - 1)] * 1000, 2) if waits else 0.0
+            classes[name] = {
+                "priority": cost_class.priority,
+                "limit": cost_class.limit,
+                "running": self._running[name],
+                "queued": self._queued[name],
+                "clients_waiting": len(self._queues[name]),
+                "admitted": self._admitted[name],
+                "rejected": self._rejected[name],
+                "wait_ms": {"p50": percentile(0.5), "p99": percentile(0.99), "max": percentile(1.0)},
+            }
+        return {"capacity": self.capacity, "running": self.running, "classes": classes}
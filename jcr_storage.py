@@ -0,0 +1,238 @@
+"""
+JCR分区表分库存储
+每个数据源年度表（如 JCR2024、FQBJCR2025）存为独立的SQLite文件，派生表与同步记录存于 derived.db，
+catalog.db 记录各分库文件及其内容哈希。查询时按需ATTACH所需分库（不超过SQLite的ATTACH上限），
+同步时只替换内容有变化的分库文件。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "catalog.db"
+DERIVED_FILE = "derived.db"
+
+
+def _attach_limit() -> int:
+    """当前SQLite可ATTACH的数据库数量上限（默认编译为10）"""
+    conn = sqlite3.connect(":memory:")
+    try:
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    finally:
+        conn.close()
+
+
+ATTACH_LIMIT = _attach_limit()
+
+# 数据源年度表名：字母前缀 + 四位年份
+_SHARD_TABLE = re.compile(r"^([A-Za-z]+)(\d{4})$")
+
+
+def shard_key(table: str) -> Optional[Tuple[str, str]]:
+    """数据源年度表返回(数据源, 年份)，派生表等其他表返回None"""
+    match = _SHARD_TABLE.match(table)
+    return (match.group(1), match.group(2)) if match else None
+
+
+def table_hash(conn: sqlite3.Connection, table: str) -> str:
+    """数据表内容哈希（表结构、索引与全部行），用于判断分库是否需要替换"""
+    digest = hashlib.sha256()
+    for (sql,) in conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name=? AND sql IS NOT NULL "
+                               "ORDER BY type, name", (table,)):
+        digest.update(sql.encode())
+    for row in conn.execute(f'SELECT * FROM "{table}" ORDER BY rowid'):
+        digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+
+def copy_tables(source: sqlite3.Connection, tables: Iterable[str], target_path: str):
+    """把数据表（含索引与统计信息）复制到新的数据库文件"""
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    source.execute("ATTACH DATABASE ? AS target", (target_path,))
+    try:
+        # 分库沿用源库的页大小（优化阶段设定）
+        page_size = source.execute("PRAGMA main.page_size").fetchone()[0]
+        source.execute(f"PRAGMA target.page_size={page_size}")
+        for table in tables:
+            for (sql,) in source.execute(
+                    "SELECT sql FROM main.sqlite_master WHERE tbl_name=? AND sql IS NOT NULL "
+                    "ORDER BY type='index'", (table,)).fetchall():
+                # 在目标库中创建同名表与索引
+                target_sql = re.sub(r'^(CREATE\s+(?:UNIQUE\s+)?(?:TABLE|INDEX)\s+(?:IF\s+NOT\s+EXISTS\s+)?)',
+                                    r'\1target.', sql, flags=re.IGNORECASE)
+                source.execute(target_sql)
+                if sql.upper().startswith("CREATE TABLE"):
+                    source.execute(f'INSERT INTO target."{table}" SELECT * FROM main."{table}"')
+        source.commit()
+        if tables:
+            source.execute("ANALYZE target")
+            source.commit()
+    finally:
+        source.execute("DETACH DATABASE target")
+
+
+class ShardedStore:
+    """分库存储：catalog.db 目录 + derived.db 派生表 + 每个数据源年度一个分库文件
+
+    分库文件以原子替换（os.replace）更新，已打开的连接继续读取旧文件；
+    catalog.db 在所有文件就位后最后提交，其文件版本即整个存储的版本。
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = Path(data_dir).absolute()
+        self.catalog_path = str(self.data_dir / CATALOG_FILE)
+        self.derived_path = str(self.data_dir / DERIVED_FILE)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.catalog_path)
+
+    def ensure(self):
+        """创建空的分库目录与目录表"""
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        if not os.path.exists(self.derived_path):
+            sqlite3.connect(self.derived_path).close()
+        conn = sqlite3.connect(self.catalog_path)
+        try:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS catalog (
+                table_name TEXT PRIMARY KEY,
+                source TEXT,
+                year TEXT,
+                file TEXT,
+                content_hash TEXT,
+                record_count INTEGER,
+                updated TEXT
+            )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def generation(self) -> str:
+        """存储版本标识：目录表随每次同步提交而变化"""
+        try:
+            st = os.stat(self.catalog_path)
+        except OSError:
+            return "missing"
+        return f"{st.st_ino}-{st.st_size}-{st.st_mtime_ns}"
+
+    def shards(self) -> Dict[str, Dict]:
+        """目录中的全部分库: 表名 -> 记录"""
+        if not self.exists():
+            return {}
+        conn = sqlite3.connect(Path(self.catalog_path).as_uri() + "?mode=ro", uri=True)
+        try:
+            cursor = conn.execute("SELECT * FROM catalog ORDER BY table_name")
+            columns = [description[0] for description in cursor.description]
+            return {row[0]: dict(zip(columns, row)) for row in cursor}
+        finally:
+            conn.close()
+
+    def tables(self, prefix: Optional[str] = None, year: Optional[str] = None) -> List[str]:
+        """分库中的数据表，可按数据源前缀与年份过滤"""
+        return [name for name, record in self.shards().items()
+                if (not prefix or name.startswith(prefix)) and (not year or record["year"] == year)]
+
+    def route(self, tables: Iterable[str], limit: int = ATTACH_LIMIT) -> List[List[str]]:
+        """把需要访问的表按ATTACH上限分组，每组用一个连接查询"""
+        shards = self.shards()
+        tables = [table for table in tables if table in shards]
+        return [tables[i:i + limit] for i in range(0, len(tables), limit)] or [[]]
+
+    def connect(self, tables: Iterable[str] = (), mmap_size: int = 0) -> sqlite3.Connection:
+        """以 derived.db 为主库打开只读连接，并ATTACH所需的分库
+
+        未限定库名的表名由SQLite依次在主库和各附加库中查找，查询语句无需改写。
+        所需分库超过ATTACH上限时抛出 ValueError，调用方应先用 route() 分组。
+        """
+        shards = self.shards()
+        conn = sqlite3.connect(Path(self.derived_path).as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+        try:
+            if mmap_size:
+                conn.execute(f"PRAGMA mmap_size={mmap_size}")
+            needed = [table for table in dict.fromkeys(tables) if table in shards]
+            if len(needed) > ATTACH_LIMIT:
+                raise ValueError(f"需要的分库数 {len(needed)} 超过ATTACH上限 {ATTACH_LIMIT}")
+            for table in needed:
+                path = self.data_dir / shards[table]["file"]
+                conn.execute("ATTACH DATABASE ? AS ?", (path.as_uri() + "?mode=ro", table))
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def import_database(self, db_path: str) -> Dict[str, str]:
+        """把单文件数据库导入分库存储
+
+        数据源年度表按内容哈希比较，只有新增或变化的表写出新的分库文件并原子替换；
+        其余表（派生表、sync_metadata等）整体写入新的 derived.db。目录表最后提交，
+        随后删除已不存在的表对应的分库文件。返回 {表名: added/updated/unchanged/removed}。
+        """
+        self.ensure()
+        current = self.shards()
+        changes: Dict[str, str] = {}
+        records = []
+        replaced: List[Tuple[str, str]] = []
+
+        source = sqlite3.connect(db_path)
+        try:
+            tables = [row[0] for row in source.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+            derived = [table for table in tables if shard_key(table) is None]
+
+            for table in tables:
+                key = shard_key(table)
+                if key is None:
+                    continue
+                content_hash = table_hash(source, table)
+                previous = current.get(table)
+                count = source.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                if previous and previous["content_hash"] == content_hash and \
+                        os.path.exists(self.data_dir / previous["file"]):
+                    changes[table] = "unchanged"
+                    records.append((table, key[0], key[1], previous["file"], content_hash, count, previous["updated"]))
+                    continue
+
+                file_name = f"{table}.db"
+                temp_path = str(self.data_dir / (file_name + ".tmp"))
+                copy_tables(source, [table], temp_path)
+                replaced.append((temp_path, str(self.data_dir / file_name)))
+                changes[table] = "updated" if previous else "added"
+                records.append((table, key[0], key[1], file_name, content_hash, count,
+                                datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+            derived_temp = self.derived_path + ".tmp"
+            copy_tables(source, derived, derived_temp)
+            replaced.append((derived_temp, self.derived_path))
+        finally:
+            source.close()
+
+        for temp_path, path in replaced:
+            os.replace(temp_path, path)
+
+        removed = [table for table in current if table not in changes]
+        conn = sqlite3.connect(self.catalog_path)
+        try:
+            conn.execute("DELETE FROM catalog")
+            conn.executemany("INSERT INTO catalog VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+            conn.commit()
+        finally:
+            conn.close()
+
+        for table in removed:
+            changes[table] = "removed"
+            try:
+                os.remove(self.data_dir / current[table]["file"])
+            except OSError:
+                pass
+
+        logger.info("分库导入完成: " + ", ".join(f"{t}={c}" for t, c in sorted(changes.items()) if c != "unchanged"))
+        return changes
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+JCR分区表MCP服务器压测脚本
+打开多个并发MCP客户端会话（stdio或streamable-http），按加权工具组合或录制轨迹以目标速率回放，
+统计吞吐量、延迟分位数、错误率与服务端内存占用
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+
+# 默认工具权重；ping 不访问数据库，用于观察事件循环是否被阻塞
+DEFAULT_MIX = {
+    "search_journal": 5,
+    "compare_journals": 1,
+    "filter_journals": 2,
+    "batch_query_journals": 1,
+    "check_warning_journals": 1,
+    "ping": 1,
+}
+
+JOURNAL_POOL = ["Nature", "Science", "Cell", "PNAS", "Nature Communications", "Journal of Applied Physics",
+                "Advances in Machine Learning", "Annals of Clinical Oncology", "Reviews in Catalysis",
+                "IEEE Transactions on Pattern Analysis and Machine Intelligence"]
+PARTITIONS = ["1区", "2区", "3区", "Q1", "Q2"]
+CATEGORIES = ["计算机科学", "医学", "化学", "物理与天体物理", "生物学"]
+
+Call = Tuple[str, Dict]
+
+
+def synthetic_call(tool: str, rng: random.Random) -> Call:
+    """为指定工具生成随机参数"""
+    if tool == "search_journal":
+        return tool, {"journal_name": rng.choice(JOURNAL_POOL)}
+    if tool == "get_partition_trends":
+        return tool, {"journal_name": rng.choice(JOURNAL_POOL)}
+    if tool == "compare_journals":
+        return tool, {"journal_list": ",".join(rng.sample(JOURNAL_POOL, 3))}
+    if tool == "filter_journals":
+        return tool, {"partition": rng.choice(PARTITIONS), "category": rng.choice(CATEGORIES), "limit": 20}
+    if tool == "batch_query_journals":
+        return tool, {"journal_names": ",".join(rng.sample(JOURNAL_POOL, 5)), "output_format": "json"}
+    if tool == "check_warning_journals":
+        return tool, {"keywords": rng.choice(["Journal", "Advances", None]), "limit": 50}
+    return tool, {}
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, float]:
+    """解析权重，如 "search_journal=5,filter_journals=2,ping=1" """
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip():
+            mix[name.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def load_trace(path: str) -> List[Call]:
+    """读取录制轨迹（JSONL，每行 {"tool": ..., "arguments": {...}}）"""
+    calls = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                calls.append((record["tool"], record.get("arguments", {})))
+    return calls
+
+
+class CallSource:
+    """调用来源：按轨迹循环回放，或按权重随机生成"""
+
+    def __init__(self, mix: Dict[str, float], trace: Optional[List[Call]] = None, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.trace = trace
+        self.position = 0
+        self.tools = list(mix)
+        self.weights = [mix[t] for t in self.tools]
+
+    def next(self) -> Call:
+        if self.trace:
+            call = self.trace[self.position % len(self.trace)]
+            self.position += 1
+            return call
+        return synthetic_call(self.rng.choices(self.tools, self.weights)[0], self.rng)
+
+
+class LoadStats:
+    """按工具汇总的延迟与错误统计"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_samples: List[str] = []
+        self.rss_samples: List[int] = []
+
+    def record(self, tool: str, latency: float, error: Optional[str] = None):
+        self.latencies.setdefault(tool, []).append(latency)
+        if error:
+            self.errors[tool] = self.errors.get(tool, 0) + 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append(f"{tool}: {error}")
+
+    def summary(self, elapsed: float) -> Dict:
+        all_latencies = [v for values in self.latencies.values() for v in values]
+        total_errors = sum(self.errors.values())
+        report = {
+            "requests": len(all_latencies),
+            "errors": total_errors,
+            "error_rate": total_errors / len(all_latencies) if all_latencies else 0.0,
+            "rps": len(all_latencies) / elapsed if elapsed else 0.0,
+            **latency_summary(all_latencies),
+            "rss_peak_mb": max(self.rss_samples) / 1024 / 1024 if self.rss_samples else None,
+            "rss_last_mb": self.rss_samples[-1] / 1024 / 1024 if self.rss_samples else None,
+            "tools": {},
+            "error_samples": self.error_samples,
+        }
+        for tool, values in sorted(self.latencies.items()):
+            report["tools"][tool] = {
+                "requests": len(values),
+                "errors": self.errors.get(tool, 0),
+                **latency_summary(values),
+            }
+        return report
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """计算分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """延迟分位数（毫秒）"""
+    return {
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values) * 1000 if values else 0.0,
+    }
+
+
+def _children(pid: int) -> List[int]:
+    """读取 /proc 中的子进程（仅Linux）"""
+    children = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid: int, include_root: bool = True) -> int:
+    """进程树的常驻内存总量（字节），非Linux平台返回0"""
+    total = _rss(pid) if include_root else 0
+    pending = _children(pid)
+    while pending:
+        child = pending.pop()
+        total += _rss(child)
+        pending.extend(_children(child))
+    return total
+
+
+async def sample_rss(pid: int, include_root: bool, stats: LoadStats, stop: asyncio.Event):
+    """周期性采样服务端内存"""
+    while not stop.is_set():
+        rss = process_tree_rss(pid, include_root)
+        if rss:
+            stats.rss_samples.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def invoke(session: ClientSession, call: Call) -> Optional[str]:
+    """执行一次调用，返回错误信息"""
+    tool, arguments = call
+    try:
+        if tool == "ping":
+            await session.send_ping()
+            return None
+        result = await session.call_tool(tool, arguments)
+        if result.isError:
+            return result.content[0].text if result.content else "isError"
+    except Exception as e:
+        return str(e)
+    return None
+
+
+async def closed_loop(session: ClientSession, source: CallSource, deadline: float, stats: LoadStats):
+    """闭环：会话完成一次调用后立即发起下一次"""
+    while time.monotonic() < deadline:
+        call = source.next()
+        start = time.perf_counter()
+        error = await invoke(session, call)
+        stats.record(call[0], time.perf_counter() - start, error)
+
+
+async def open_loop(sessions: List[ClientSession], source: CallSource, rate: float, duration: float,
+                    stats: LoadStats):
+    """开环：按目标速率发起调用，延迟从计划发起时间算起（包含排队时间）"""
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def worker(session: ClientSession):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            scheduled, call = item
+            error = await invoke(session, call)
+            stats.record(call[0], time.perf_counter() - scheduled, error)
+
+    workers = [asyncio.create_task(worker(session)) for session in sessions]
+    start = time.perf_counter()
+    sent = 0
+    while True:
+        now = time.perf_counter()
+        if now - start >= duration:
+            break
+        due = int((now - start) * rate) + 1
+        while sent < due:
+            queue.put_nowait((start + sent / rate, source.next()))
+            sent += 1
+        await asyncio.sleep(min(1 / rate, 0.01))
+    for _ in workers:
+        queue.put_nowait(None)
+    await asyncio.gather(*workers)
+
+
+async def run_load(open_session, sessions: int, source: CallSource, duration: float, rate: float,
+                   rss_pid: Optional[int], rss_include_root: bool) -> Dict:
+    """打开并发会话并运行一轮压测"""
+    stats = LoadStats()
+    async with AsyncExitStack() as stack:
+        clients = []
+        for _ in range(sessions):
+            read, write = await stack.enter_async_context(open_session())
+            session = await stack.enter_async_context(ClientSession(read, write))
+            await session.initialize()
+            clients.append(session)
+
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_rss(rss_pid, rss_include_root, stats, stop)) if rss_pid else None
+
+        start = time.monotonic()
+        if rate > 0:
+            await open_loop(clients, source, rate, duration, stats)
+        else:
+            deadline = start + duration
+            await asyncio.gather(*(closed_loop(client, source, deadline, stats) for client in clients))
+        elapsed = time.monotonic() - start
+
+        stop.set()
+        if sampler:
+            await sampler
+    return stats.summary(elapsed)
+
+
+def http_session_factory(url: str):
+    """streamable-http会话"""
+    from contextlib import asynccontextmanager
+
+    @asynccontextmanager
+    async def open_session():
+        async with streamablehttp_client(url) as (read, write, _):
+            yield read, write
+    return open_session
+
+
+def stdio_session_factory(db_path: Optional[str]):
+    """stdio会话：每个会话启动一个服务器子进程"""
+    env = dict(os.environ)
+    if db_path:
+        env["JCR_DB_PATH"] = db_path
+    params = StdioServerParameters(command=sys.executable, args=[str(SCRIPT_DIR / "jcr_mcp_server.py")], env=env)
+    errlog = open(os.devnull, "w")
+    return lambda: stdio_client(params, errlog=errlog)
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30.0) -> bool:
+    """等待服务端口可连接"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_server(workers: int, host: str, port: int, db_path: str = None) -> subprocess.Popen:
+    """以指定worker数启动HTTP服务"""
+    env = dict(os.environ)
+    if db_path:
+        env["JCR_DB_PATH"] = db_path
+    return subprocess.Popen(
+        [sys.executable, str(SCRIPT_DIR / "jcr_mcp_server.py"), "--transport", "streamable-http",
+         "--host", host, "--port", str(port), "--workers", str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def print_report(label: str, report: Dict):
+    """打印一轮压测结果"""
+    rss = f"{report['rss_peak_mb']:.1f}" if report["rss_peak_mb"] is not None else "-"
+    print(f"{label:>10} {report['requests']:>8} {report['error_rate']:>8.2%} {report['rps']:>9.1f} "
+          f"{report['p50_ms']:>9.1f} {report['p95_ms']:>9.1f} {report['p99_ms']:>9.1f} {rss:>9}")
+    for tool, stats in report["tools"].items():
+        print(f"{'':>10}   · {tool:<24} n={stats['requests']:<6} err={stats['errors']:<4} "
+              f"p50={stats['p50_ms']:.1f} p99={stats['p99_ms']:.1f} ms")
+    for sample in report["error_samples"]:
+        print(f"{'':>10}   ❌ {sample[:120]}")
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="JCR分区表MCP服务器压测")
+    parser.add_argument("--transport", choices=["http", "stdio"], default="http", help="传输方式")
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count() or 4}",
+                        help="HTTP模式下要测试的worker数，逗号分隔")
+    parser.add_argument("--url", help="压测已运行的HTTP服务（如 http://127.0.0.1:8080/mcp），不自动启动服务")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发客户端会话数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每轮压测时长（秒）")
+    parser.add_argument("--rate", type=float, default=0.0, help="目标调用速率（次/秒），0表示闭环满负载")
+    parser.add_argument("--mix", help="工具权重，如 search_journal=5,filter_journals=2,ping=1")
+    parser.add_argument("--trace", help="回放录制的调用轨迹（JSONL）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--db", help="数据库路径（默认使用服务器配置）")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else None
+    mix = parse_mix(args.mix)
+    mode = f"开环 {args.rate:g} 次/秒" if args.rate > 0 else "闭环满负载"
+
+    print(f"🚀 JCR分区表MCP服务器压测（{args.transport}，{args.concurrency}个会话，{mode}）")
+    print("=" * 88)
+    print(f"{'':>10} {'请求数':>8} {'错误率':>8} {'req/s':>9} {'p50(ms)':>9} {'p95(ms)':>9} "
+          f"{'p99(ms)':>9} {'RSS(MB)':>9}")
+
+    results = {}
+    if args.transport == "stdio":
+        source = CallSource(mix, trace, args.seed)
+        report = await run_load(stdio_session_factory(args.db), args.concurrency, source, args.duration,
+                                args.rate, os.getpid(), rss_include_root=False)
+        print_report("stdio", report)
+        results["stdio"] = report
+    elif args.url:
+        source = CallSource(mix, trace, args.seed)
+        report = await run_load(http_session_factory(args.url), args.concurrency, source, args.duration,
+                                args.rate, None, rss_include_root=True)
+        print_report("http", report)
+        results["http"] = report
+    else:
+        for workers in sorted({int(w) for w in args.workers.split(',') if w.strip()}):
+            server = start_server(workers, args.host, args.port, args.db)
+            try:
+                if not wait_for_port(args.host, args.port):
+                    print(f"{workers:>10} ❌ 服务启动超时")
+                    continue
+                source = CallSource(mix, trace, args.seed)
+                report = await run_load(http_session_factory(f"http://{args.host}:{args.port}/mcp"),
+                                        args.concurrency, source, args.duration, args.rate,
+                                        server.pid, rss_include_root=True)
+                label = f"{workers} worker"
+                print_report(label, report)
+                results[label] = report
+            finally:
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,30 @@
+"""
+测试公共配置：导入服务器模块前把数据库路径指向临时目录，避免在仓库目录创建 jcr.db
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(REPO_DIR))
+
+os.environ.setdefault("JCR_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="jcr-test-"), "jcr.db"))
+
+from benchmarks.synthetic import generate_database  # noqa: E402
+from jcr_index import build_derived_tables  # noqa: E402
+
+# 测试用合成数据库的期刊数
+SYNTHETIC_JOURNALS = 400
+
+
+@pytest.fixture(scope="session")
+def synthetic_db(tmp_path_factory) -> str:
+    """按真实列名生成的多年份合成数据库（含派生表），各测试只读使用"""
+    path = str(tmp_path_factory.mktemp("synthetic") / "jcr.db")
+    generate_database(path, journals=SYNTHETIC_JOURNALS, seed=7)
+    build_derived_tables(path)
+    return path
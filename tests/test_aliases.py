@@ -0,0 +1,80 @@
+"""
+期刊别名归并：规范化刊名、共享ISSN的更名期刊（含传递合并）、缩写，以及规范刊名取最新写法
+"""
+
+import sqlite3
+
+import pytest
+
+from jcr_index import AliasIndex, build_alias_table, normalize_title
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "jcr.db")
+    conn.execute('CREATE TABLE JCR2022 (Journal TEXT, ISSN TEXT, eISSN TEXT)')
+    conn.execute('CREATE TABLE JCR2023 (Journal TEXT, ISSN TEXT, eISSN TEXT)')
+    conn.execute('CREATE TABLE FQBJCR2025 (Journal TEXT, "ISSN/EISSN" TEXT)')
+    conn.execute('CREATE TABLE CCF2022 (Journal TEXT, "刊物简称" TEXT)')
+    conn.executemany("INSERT INTO JCR2022 VALUES (?, ?, ?)", [
+        ("Journal of Old Studies", "1111-1111", None),
+        ("THE JOURNAL OF A & B", "2222-2222", None),
+        ("Unrelated Letters", "3333-3333", None),
+    ])
+    conn.executemany("INSERT INTO JCR2023 VALUES (?, ?, ?)", [
+        # 更名后沿用ISSN，并新增eISSN
+        ("Journal of Middle Studies", "1111-1111", "4444-4444"),
+        ("Journal of A and B", "2222-2222", None),
+        ("Unrelated Letters", "3333-3333", None),
+    ])
+    conn.executemany("INSERT INTO FQBJCR2025 VALUES (?, ?)", [
+        # 只与上一名称共享eISSN，经传递与最早的名称归为同一期刊
+        ("Journal of New Studies", "5555-5555/4444-4444"),
+        ("Pattern Analysis Transactions", "6666-6666/"),
+    ])
+    conn.execute("INSERT INTO CCF2022 VALUES ('Pattern Analysis Transactions', 'PAT')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_renamed_journals_merge_through_shared_issns(conn):
+    index = AliasIndex.load(conn)
+    ids = {index.resolve(name) for name in
+           ("Journal of Old Studies", "Journal of Middle Studies", "Journal of New Studies")}
+    assert len(ids) == 1
+    journal_id = ids.pop()
+    # 规范刊名取最新年份的写法，原始写法全部保留用于精确查询
+    assert index.canonical(journal_id) == "Journal of New Studies"
+    assert sorted(index.titles(journal_id)) == [
+        "Journal of Middle Studies", "Journal of New Studies", "Journal of Old Studies"]
+    assert index.resolve("Unrelated Letters") not in (None, journal_id)
+
+
+def test_normalized_spellings_share_one_journal(conn):
+    index = AliasIndex.load(conn)
+    journal_id = index.resolve("journal of a and b")
+    assert journal_id == index.resolve("The Journal of A & B")
+    assert index.canonical(journal_id) == "Journal of A and B"
+    assert sorted(index.titles(journal_id)) == ["Journal of A and B", "THE JOURNAL OF A & B"]
+    assert normalize_title("The Journal of A & B") == "journal of a and b"
+
+
+def test_abbreviations_resolve_to_journal(conn):
+    index = AliasIndex.load(conn)
+    assert index.resolve("pat") == index.resolve("Pattern Analysis Transactions") is not None
+    # 缩写不计入原始写法
+    assert index.titles(index.resolve("PAT")) == ["Pattern Analysis Transactions"]
+    assert index.canonical_name("Pat") == "Pattern Analysis Transactions"
+    assert index.canonical_name("Not Indexed") == "Not Indexed"
+
+
+def test_built_tables_match_source_scan(conn):
+    scanned = AliasIndex.load(conn)
+    build_alias_table(conn)
+    loaded = AliasIndex.load(conn)
+    assert dict(loaded.items()) == dict(scanned.items())
+    assert len(loaded) == len(scanned) == 4
+    for journal_id in range(1, len(loaded) + 1):
+        assert loaded.canonical(journal_id) == scanned.canonical(journal_id)
+        assert sorted(loaded.titles(journal_id)) == sorted(scanned.titles(journal_id))
@@ -0,0 +1,40 @@
+"""
+内存索引构建受执行期限约束：到期时中断构建且不写入缓存，之后的调用重新构建
+"""
+
+import sqlite3
+
+import pytest
+
+from jcr_mcp_server import JCRDatabase
+from jcr_runtime import DeadlineExceeded, QueryDeadline
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "jcr.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE GJQKYJMD2025 (Journal TEXT, 预警等级 TEXT)")
+    conn.executemany("INSERT INTO GJQKYJMD2025 VALUES (?, ?)", [("Bad Journal", "高"), ("Worse Journal", "中")])
+    conn.commit()
+    conn.close()
+    return JCRDatabase(str(path), data_dir=None)
+
+
+def test_expired_deadline_aborts_index_build(database):
+    deadline = QueryDeadline(1)
+    deadline.cancel()
+    with database.bounded(deadline), pytest.raises(DeadlineExceeded):
+        database.warning_index
+    assert deadline.truncated
+    assert "warning_index" not in database._cache
+
+
+def test_index_builds_within_deadline_and_is_cached(database):
+    deadline = QueryDeadline(60)
+    with database.bounded(deadline):
+        index = database.warning_index
+    assert index.is_warned("Bad Journal")
+    assert not deadline.truncated
+    # 期限只作用于 bounded 块内，缓存命中不再检查
+    assert database.warning_index is index
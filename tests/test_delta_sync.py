@@ -0,0 +1,143 @@
+"""
+增量下载：对本地支持Range的静态服务，以旧文件为基准重组新文件，只下载缺失的区间；
+无清单、服务器不支持Range、重组结果校验失败时抛出 DeltaUnavailable 并清理临时文件
+"""
+
+import asyncio
+import functools
+import json
+import os
+import random
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from delta_sync import DeltaUnavailable, RangeRequestHandler, delta_download, write_manifest
+from jcr_http import HttpClient
+
+BLOCK_SIZE = 4096
+
+
+@pytest.fixture
+def files(tmp_path):
+    """旧文件，以及在其中插入、修改并追加了数据的新文件（远程目录中）"""
+    rng = random.Random(47)
+    old = bytes(rng.getrandbits(8) for _ in range(64 * BLOCK_SIZE))
+    new = bytearray(old[:10000] + b"inserted bytes" + old[10000:])
+    new[40 * BLOCK_SIZE:41 * BLOCK_SIZE] = bytes(rng.getrandbits(8) for _ in range(BLOCK_SIZE))
+    new += bytes(rng.getrandbits(8) for _ in range(3000))
+
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    (remote / "jcr.db").write_bytes(new)
+    local = tmp_path / "jcr.db"
+    local.write_bytes(old)
+    return local, remote, bytes(new)
+
+
+def start_server(directory, handler_class):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler_class, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def run(directory, handler_class=RangeRequestHandler) -> str:
+        server = start_server(directory, handler_class)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/jcr.db"
+
+    yield run
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class QuietRangeHandler(RangeRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class NoRangeHandler(SimpleHTTPRequestHandler):
+    """忽略Range头、总是返回完整文件（200）的服务"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def download(url, local, **kwargs):
+    client = HttpClient(retries=0, backoff=0.0)
+    temp_path = str(local) + ".download"
+
+    async def run():
+        async with client.hold():
+            return await delta_download(client, url, str(local), temp_path, **kwargs)
+
+    return asyncio.run(run()), temp_path
+
+
+def test_reassembles_new_file_fetching_only_missing_ranges(files, serve):
+    local, remote, new = files
+    write_manifest(str(remote / "jcr.db"), block_size=BLOCK_SIZE)
+    url = serve(remote, QuietRangeHandler)
+
+    result, temp_path = download(url, local)
+
+    with open(temp_path, "rb") as f:
+        assert f.read() == new
+    assert result.size == len(new)
+    assert result.reused_bytes + result.fetched_bytes >= len(new)
+    # 插入点所在块、被修改的块与追加的尾部需要下载，其余块在本地按偏移找到
+    assert 0 < result.fetched_bytes <= 6 * BLOCK_SIZE
+    assert result.requests >= 2
+    assert result.etag
+
+
+def test_unchanged_when_sha256_matches_last_sync(files, serve):
+    local, remote, _ = files
+    manifest_path = write_manifest(str(remote / "jcr.db"), block_size=BLOCK_SIZE)
+    url = serve(remote, QuietRangeHandler)
+    with open(manifest_path) as f:
+        sha256 = json.load(f)["sha256"]
+
+    result, temp_path = download(url, local, known_sha256=sha256)
+
+    assert result.unchanged
+    assert result.fetched_bytes == 0
+    assert not os.path.exists(temp_path)
+
+
+def test_missing_manifest_is_unavailable(files, serve):
+    local, remote, _ = files
+    url = serve(remote, QuietRangeHandler)
+
+    with pytest.raises(DeltaUnavailable, match="清单不可用"):
+        download(url, local)
+
+
+def test_server_without_range_support_is_unavailable(files, serve):
+    local, remote, _ = files
+    write_manifest(str(remote / "jcr.db"), block_size=BLOCK_SIZE)
+    url = serve(remote, NoRangeHandler)
+
+    with pytest.raises(DeltaUnavailable, match="不支持Range"):
+        download(url, local)
+    assert not os.path.exists(str(local) + ".download")
+
+
+def test_sha256_mismatch_discards_reassembled_file(files, serve):
+    local, remote, new = files
+    write_manifest(str(remote / "jcr.db"), block_size=BLOCK_SIZE)
+    # 清单发布后远程文件又被修改（正在更新），下载的区间与清单不一致
+    changed = bytearray(new)
+    changed[40 * BLOCK_SIZE:40 * BLOCK_SIZE + 16] = b"\xff" * 16
+    (remote / "jcr.db").write_bytes(changed)
+    url = serve(remote, QuietRangeHandler)
+
+    with pytest.raises(DeltaUnavailable, match="SHA256"):
+        download(url, local)
+    assert not os.path.exists(str(local) + ".download")
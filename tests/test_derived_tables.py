@@ -0,0 +1,60 @@
+"""
+同步后构建的派生表：分面统计与源表聚合一致，学科列表与筛选计数取自内存副本
+"""
+
+import sqlite3
+
+import pytest
+
+from jcr_index import DERIVED_BUILDERS, DERIVED_TABLES, FacetTable, build_derived_tables, list_tables
+
+
+@pytest.fixture
+def conn(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    yield conn
+    conn.close()
+
+
+def test_builds_every_derived_table(synthetic_db, tmp_path, conn):
+    assert DERIVED_TABLES <= set(list_tables(conn))
+    # 重复构建是幂等的：先删除再重建，记录数不变
+    copy = tmp_path / "jcr.db"
+    copy.write_bytes(open(synthetic_db, "rb").read())
+    first = build_derived_tables(str(copy))
+    second = build_derived_tables(str(copy))
+    assert first == second
+    assert set(first) == {name for name, _ in DERIVED_BUILDERS}
+    assert all(count > 0 for count in first.values())
+
+
+def test_facets_match_source_table_aggregation(conn):
+    facets = FacetTable.load(conn)
+    expected = conn.execute("SELECT 大类, COUNT(*) FROM FQBJCR2025 WHERE 大类 IS NOT NULL "
+                            "GROUP BY 大类 ORDER BY 大类").fetchall()
+    assert facets.categories("FQBJCR", "2025") == expected
+
+    counts = facets.counts("FQBJCR", "2025")
+    assert counts["total"] == conn.execute("SELECT COUNT(*) FROM FQBJCR2025").fetchone()[0]
+    for partition, count in counts["partition"].items():
+        assert count == conn.execute("SELECT COUNT(*) FROM FQBJCR2025 WHERE 大类分区 = ?",
+                                     (partition,)).fetchone()[0]
+
+
+def test_facet_counts_apply_filters(conn):
+    facets = FacetTable.load(conn)
+    counts = facets.counts("FQBJCR", "2025", category="医学", partition="1区", is_top=True)
+    expected = conn.execute("SELECT COUNT(*) FROM FQBJCR2025 WHERE 大类 LIKE '%医学%' "
+                            "AND 大类分区 LIKE '%1区%' AND Top = '是'").fetchone()[0]
+    assert counts["total"] == expected
+    assert counts["top"] == ({"是": expected} if expected else {})
+
+
+def test_missing_facet_table_loads_empty(tmp_path):
+    conn = sqlite3.connect(tmp_path / "empty.db")
+    try:
+        facets = FacetTable.load(conn)
+    finally:
+        conn.close()
+    assert not facets
+    assert facets.categories("FQBJCR", "2025") == []
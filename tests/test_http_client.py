@@ -0,0 +1,144 @@
+"""
+共享HTTP客户端：通过注入的模拟传输层验证重试、总超时预算与下载失败时的清理
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from jcr_http import BudgetExceeded, HttpClient
+
+URL = "https://example.test/jcr.db"
+
+
+def make_client(handler, **kwargs) -> HttpClient:
+    kwargs.setdefault("backoff", 0.0)
+    return HttpClient(transport=httpx.MockTransport(handler), **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_retries_retryable_status_until_success():
+    statuses = iter([503, 429, 200])
+
+    def handler(request):
+        return httpx.Response(next(statuses), content=b"ok")
+
+    client = make_client(handler, retries=3)
+
+    async def fetch():
+        async with client.hold():
+            return await client.get(URL)
+
+    response = run(fetch())
+    assert response.status_code == 200
+    assert response.content == b"ok"
+    assert client.requests == 3
+    assert client.retried == 2
+
+
+def test_retries_transport_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200)
+
+    client = make_client(handler, retries=2)
+
+    async def fetch():
+        async with client.hold():
+            return await client.get(URL)
+
+    assert run(fetch()).status_code == 200
+    assert len(calls) == 2
+
+
+def test_gives_up_after_max_retries():
+    client = make_client(lambda request: httpx.Response(503), retries=2)
+
+    async def fetch():
+        async with client.hold():
+            return await client.get(URL)
+
+    # 重试次数用尽后返回最后一次响应，由调用方处理状态码
+    assert run(fetch()).status_code == 503
+    assert client.requests == 3
+
+
+def test_budget_exhausted_by_retries_and_backoff():
+    client = make_client(lambda request: httpx.Response(503), retries=100, backoff=0.05)
+
+    async def fetch():
+        async with client.hold():
+            return await client.get(URL, budget=0.3)
+
+    with pytest.raises(BudgetExceeded):
+        run(fetch())
+    assert 1 < client.requests < 100
+
+
+def test_budget_exhausted_by_slow_response():
+    async def handler(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200)
+
+    client = make_client(handler, retries=0)
+
+    async def fetch():
+        async with client.hold():
+            return await client.get(URL, budget=0.2)
+
+    with pytest.raises(BudgetExceeded):
+        run(fetch())
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """先返回部分数据，随后连接中断"""
+
+    async def __aiter__(self):
+        yield b"x" * 1024
+        raise httpx.ReadError("connection reset")
+
+
+def test_download_writes_file(tmp_path):
+    path = tmp_path / "jcr.db.download"
+    client = make_client(lambda request: httpx.Response(200, content=b"sqlite data"))
+
+    async def fetch():
+        async with client.hold():
+            return await client.download(URL, str(path))
+
+    assert run(fetch()).status_code == 200
+    assert path.read_bytes() == b"sqlite data"
+
+
+def test_failed_download_removes_partial_file(tmp_path):
+    path = tmp_path / "jcr.db.download"
+    client = make_client(lambda request: httpx.Response(200, stream=BrokenStream()))
+
+    async def fetch():
+        async with client.hold():
+            return await client.download(URL, str(path))
+
+    with pytest.raises(httpx.ReadError):
+        run(fetch())
+    assert not path.exists()
+
+
+def test_error_status_does_not_create_file(tmp_path):
+    path = tmp_path / "jcr.db.download"
+    client = make_client(lambda request: httpx.Response(304), retries=0)
+
+    async def fetch():
+        async with client.hold():
+            return await client.download(URL, str(path))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run(fetch())
+    assert not path.exists()
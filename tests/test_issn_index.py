@@ -0,0 +1,63 @@
+"""
+ISSN/eISSN反查：写法规范化、校验位错误时的回退，以及批量反查结果
+"""
+
+import sqlite3
+
+import pytest
+
+from jcr_index import IssnIndex, issn_is_valid, normalize_issn
+from jcr_mcp_server import JCRDatabase
+
+
+@pytest.fixture
+def index(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    try:
+        yield IssnIndex.load(conn)
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("1000-002x", "1000002X"), (" 1000 0003 ", "10000003"), ("1000003", None), ("abcd-efgh", None), (None, None),
+])
+def test_normalize_issn(value, expected):
+    assert normalize_issn(value) == expected
+
+
+def test_resolves_issn_and_eissn_in_any_spelling(index):
+    # 合成数据中第1个期刊为 Nature（ISSN 1000-0003，eISSN 5000-0004），第3个为 Cell（1000-002X）
+    assert index.resolve("1000-0003") == ("10000003", {"nature": "Nature"})
+    assert index.resolve("50000004") == ("50000004", {"nature": "Nature"})
+    assert index.resolve("1000002x") == ("1000002X", {"cell": "Cell"})
+
+
+def test_wrong_check_digit_falls_back_to_valid_issn(index):
+    assert not issn_is_valid("10000001")
+    assert index.resolve("1000-0001") == ("10000003", {"nature": "Nature"})
+
+
+def test_unknown_and_malformed_values(index):
+    assert index.resolve("0000-0000") == ("00000000", {})
+    assert index.resolve("not an issn") == (None, {})
+
+
+def test_journal_issn_records_both_kinds(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    try:
+        kinds = dict(conn.execute("SELECT DISTINCT kind, issn FROM journal_issn WHERE title_key = 'nature'"))
+    finally:
+        conn.close()
+    assert kinds == {"issn": "10000003", "eissn": "50000004"}
+
+
+def test_lookup_issns_returns_latest_profile(synthetic_db):
+    db = JCRDatabase(synthetic_db, data_dir=None)
+    found, missing, malformed = db.lookup_issns(["10000003", "0000-0000", "xyz"])
+    assert found["found"] and found["issn"] == "1000-0003"
+    assert found["journal_name"] == "Nature"
+    assert found["year"] == "2025"
+    assert found["cas_partition"].endswith("区")
+    assert missing == {"query": "0000-0000", "issn": "00000000", "found": False}
+    assert malformed == {"query": "xyz", "issn": None, "found": False}
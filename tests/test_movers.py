@@ -0,0 +1,113 @@
+"""
+跨年份升降榜：快照按规范化刊名连接、变化方向与阈值、起始分区筛选、新增/移除计数与学科分布
+"""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from jcr_query import MetricSnapshot, QueryError, compare_snapshots
+
+
+def make_snapshot(year, rows):
+    """rows: [(规范化刊名, 学科, 分区, 影响因子, 排名比例)]"""
+    rows = sorted(rows)
+    columns = {
+        "title_key": np.array([row[0] for row in rows], dtype=str),
+        "journal": np.array([row[0].title() for row in rows], dtype=object),
+        "category": np.array([row[1] for row in rows], dtype=object),
+        "partition": np.array([row[2] for row in rows], dtype=float),
+        "if": np.array([row[3] for row in rows], dtype=float),
+        "rank": np.array([row[4] for row in rows], dtype=float),
+        "warned": np.zeros(len(rows), dtype=bool),
+    }
+    return MetricSnapshot("cas", year, columns)
+
+
+@pytest.fixture
+def snapshots():
+    old = make_snapshot("2023", [
+        ("alpha", "医学", 1, 10.0, 0.1),
+        ("beta", "医学", 2, 4.0, 0.3),
+        ("gamma", "化学", 3, 2.0, 0.6),
+        ("delta", "化学", 2, 5.0, 0.4),
+        ("gone", "数学", 4, 1.0, 0.9),
+    ])
+    new = make_snapshot("2025", [
+        ("alpha", "医学", 1, 12.0, 0.1),
+        ("beta", "医学", 4, 3.0, 0.7),
+        ("gamma", None, 1, 2.0, 0.2),
+        ("delta", "化学", 3, 4.0, 0.5),
+        ("fresh", "物理", 2, 3.0, 0.3),
+    ])
+    return old, new
+
+
+def movers(result):
+    return [(mover["journal"], mover["change"]) for mover in result["movers"]]
+
+
+def test_partition_drops_sorted_by_size(snapshots):
+    result = compare_snapshots(*snapshots, metric="partition", direction="down")
+    assert movers(result) == [("Beta", -2.0), ("Delta", -1.0)]
+    assert (result["compared"], result["added"], result["removed"], result["matched"]) == (4, 1, 1, 2)
+    assert result["movers"][0]["partition_from"] == 2 and result["movers"][0]["partition_to"] == 4
+
+
+def test_rises_and_both_directions(snapshots):
+    assert movers(compare_snapshots(*snapshots, direction="up")) == [("Gamma", 2.0)]
+    both = compare_snapshots(*snapshots, direction="both")
+    # 按变化幅度排序，相同幅度保持刊名顺序
+    assert movers(both) == [("Beta", -2.0), ("Gamma", 2.0), ("Delta", -1.0)]
+
+
+def test_impact_factor_metrics_and_threshold(snapshots):
+    assert movers(compare_snapshots(*snapshots, metric="if", direction="up")) == [("Alpha", 2.0)]
+    assert movers(compare_snapshots(*snapshots, metric="if", direction="down", min_change=0.5)) == [
+        ("Beta", -1.0), ("Delta", -1.0)]
+    assert movers(compare_snapshots(*snapshots, metric="if_pct", direction="down")) == [
+        ("Beta", -0.25), ("Delta", -0.2)]
+    assert movers(compare_snapshots(*snapshots, metric="rank", direction="up")) == [("Gamma", 0.4)]
+
+
+def test_from_partition_and_category_filters(snapshots):
+    result = compare_snapshots(*snapshots, direction="both", from_partition=2)
+    assert [journal for journal, _ in movers(result)] == ["Beta", "Delta"]
+    # 新年份缺少学科时回退到旧年份
+    result = compare_snapshots(*snapshots, direction="both", category="化")
+    assert [mover["category"] for mover in result["movers"]] == ["化学", "化学"]
+    assert result["categories"] == [{"category": "化学", "up": 1, "down": 1}]
+
+
+def test_limit_and_invalid_arguments(snapshots):
+    result = compare_snapshots(*snapshots, direction="both", limit=1)
+    assert len(result["movers"]) == 1 and result["matched"] == 3
+    with pytest.raises(QueryError):
+        compare_snapshots(*snapshots, metric="citations")
+    with pytest.raises(QueryError):
+        compare_snapshots(*snapshots, direction="sideways")
+
+
+def test_load_from_derived_tables(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    try:
+        old = MetricSnapshot.load(conn, "jcr", "2023")
+        new = MetricSnapshot.load(conn, "jcr", "2024")
+        with pytest.raises(QueryError):
+            MetricSnapshot.load(conn, "scopus", "2024")
+        empty = MetricSnapshot.load(conn, "jcr", "1999")
+    finally:
+        conn.close()
+
+    assert old.size and new.size
+    keys = new.columns["title_key"]
+    assert list(keys) == sorted(keys)
+    result = compare_snapshots(old, new, metric="if", direction="both", limit=5)
+    assert result["compared"] + result["removed"] == old.size
+    assert result["compared"] + result["added"] == new.size
+    changes = [abs(mover["change"]) for mover in result["movers"]]
+    assert changes == sorted(changes, reverse=True)
+
+    assert empty.size == 0
+    assert compare_snapshots(empty, new)["added"] == new.size
@@ -0,0 +1,103 @@
+"""
+同步后优化：索引计划、删除早期版本遗留的旧索引、VACUUM INTO 替换后数据完整且查询改走索引
+"""
+
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from jcr_optimize import REPORT_TABLE, create_source_indexes, index_plan, optimize_database
+from jcr_storage import table_hash
+
+
+@pytest.fixture
+def database(synthetic_db, tmp_path):
+    """可修改的合成数据库副本"""
+    path = str(tmp_path / "jcr.db")
+    shutil.copyfile(synthetic_db, path)
+    return path
+
+
+def indexes(conn, table):
+    return sorted(row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=?", (table,)))
+
+
+def test_index_plan():
+    assert index_plan(['Journal', 'ISSN', 'eISSN', 'Category', 'IF(2024)', 'IF Quartile(2024)']) == [
+        ("journal", "Journal COLLATE NOCASE"),
+        ("issn", '"ISSN"'),
+        ("eissn", '"eISSN"'),
+        ("if", 'CAST("IF(2024)" AS REAL)'),
+    ]
+    assert index_plan(['Journal', 'ISSN/EISSN', '大类', '大类分区']) == [
+        ("journal", "Journal COLLATE NOCASE"), ("issn_eissn", '"ISSN/EISSN"')]
+    assert index_plan(['序号', '刊物简称']) == []
+
+
+def test_stale_indexes_are_dropped(database):
+    conn = sqlite3.connect(database)
+    try:
+        conn.execute('CREATE INDEX "idx_FQBJCR2025_partition" ON FQBJCR2025 ("大类分区")')
+        conn.execute('CREATE INDEX "user_FQBJCR2025_top" ON FQBJCR2025 ("Top")')
+        created = create_source_indexes(conn)
+        # 重复执行不重建已有索引
+        assert create_source_indexes(conn) == created
+        names = indexes(conn, "FQBJCR2025")
+    finally:
+        conn.close()
+    assert created["FQBJCR2025"] == ["idx_FQBJCR2025_journal", "idx_FQBJCR2025_issn_eissn"]
+    # 只删除本模块命名规则下的旧索引，其他索引保留
+    assert names == ["idx_FQBJCR2025_issn_eissn", "idx_FQBJCR2025_journal", "user_FQBJCR2025_top"]
+    assert created["GJQKYJMD2024"] == ["idx_GJQKYJMD2024_journal"]
+    assert "journal_metrics" not in created
+
+
+def test_optimize_keeps_data_intact(database):
+    conn = sqlite3.connect(database)
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table' "
+                                                "AND name NOT LIKE 'sqlite_%'")]
+        expected = {table: sorted(conn.execute(f'SELECT * FROM "{table}"'), key=repr) for table in tables}
+    finally:
+        conn.close()
+
+    report = optimize_database(database, page_size=8192)
+
+    conn = sqlite3.connect(database)
+    try:
+        assert conn.execute("PRAGMA page_size").fetchone()[0] == 8192
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        for table, rows in expected.items():
+            # VACUUM 可能重排rowid，按行内容比较
+            assert sorted(conn.execute(f'SELECT * FROM "{table}"'), key=repr) == rows, table
+        recorded = conn.execute(f"SELECT COUNT(*) FROM {REPORT_TABLE}").fetchone()[0]
+        assert "idx_JCR2024_journal" in indexes(conn, "JCR2024")
+    finally:
+        conn.close()
+
+    assert report["tables"] == 13 and report["page_size"] == 8192
+    assert recorded == len(report["queries"]) > 0
+    exact = next(row for row in report["queries"] if row["table"] == "JCR2024" and row["query"] == "search_exact")
+    assert "SCAN" in exact["plan_before"]
+    assert "idx_JCR2024_journal" in exact["plan_after"]
+    # 临时文件已原子替换为数据库文件
+    assert not os.path.exists(database + ".optimize")
+
+
+def test_optimize_is_idempotent(database):
+    optimize_database(database, measure=False)
+    conn = sqlite3.connect(database)
+    try:
+        first = {table: table_hash(conn, table) for table in ("JCR2024", "FQBJCR2025")}
+    finally:
+        conn.close()
+    optimize_database(database, measure=False)
+    conn = sqlite3.connect(database)
+    try:
+        assert {table: table_hash(conn, table) for table in first} == first
+        assert conn.execute(f"SELECT name FROM sqlite_master WHERE name = '{REPORT_TABLE}'").fetchone() is None
+    finally:
+        conn.close()
@@ -0,0 +1,113 @@
+"""
+响应预算与续页游标：按组计数的 max_items、字符预算、游标往返，以及数据库变化后旧游标失效
+"""
+
+import asyncio
+import shutil
+import sqlite3
+
+import pytest
+
+import jcr_mcp_server as server
+from jcr_mcp_server import JCRDatabase
+from jcr_response import (
+    CursorError, ResponseBudget, cursor_key, decode_page_cursor, encode_page_cursor, page_start, paginate
+)
+
+# (期刊, 年份) 按期刊分组的行
+ROWS = [("A", 2025), ("A", 2024), ("B", 2025), ("C", 2025), ("C", 2024), ("C", 2023), ("D", 2025)]
+
+
+def render(row):
+    return f"{row[0]}-{row[1]}"
+
+
+def test_max_items_counts_groups():
+    page = paginate(ROWS, render, ResponseBudget(max_items=2), key="k", group=lambda row: row[0])
+    assert page.chunks == ["A-2025", "A-2024", "B-2025"]
+    assert (page.start, page.end, page.total) == (0, 3, 7)
+    assert decode_page_cursor(page.cursor, "k") == 3
+    # 不分组时按条目计数
+    assert paginate(ROWS, render, ResponseBudget(max_items=2)).chunks == ["A-2025", "A-2024"]
+
+
+def test_char_budget_cuts_inside_group_and_keeps_one_row():
+    page = paginate(ROWS, render, ResponseBudget(max_chars=16), key="k", group=lambda row: row[0])
+    assert page.chunks == ["A-2025", "A-2024"]
+    # 单条超过预算时仍保留一条，保证翻页前进
+    page = paginate(ROWS[3:], render, ResponseBudget(max_chars=3), start=3, total=7, key="k")
+    assert page.chunks == ["C-2025"] and decode_page_cursor(page.cursor, "k") == 4
+
+
+def test_walking_pages_covers_every_row_once():
+    budget = ResponseBudget(max_items=2, max_chars=20)
+    seen, cursor = [], None
+    while True:
+        start = page_start(cursor, "k")
+        page = paginate(ROWS[start:], render, budget, start, len(ROWS), "k", group=lambda row: row[0])
+        seen.extend(page.items)
+        if not page.truncated:
+            break
+        cursor = page.cursor
+    assert seen == ROWS
+
+
+def test_cursor_round_trip_and_errors():
+    key = cursor_key("filter_journals", "gen-1", "医学", None)
+    assert key != cursor_key("filter_journals", "gen-2", "医学", None)
+    cursor = encode_page_cursor(key, 40)
+    assert page_start(cursor, key) == 40
+    assert page_start(None, key, default=15) == 15
+    with pytest.raises(CursorError, match="已失效"):
+        page_start(cursor, cursor_key("filter_journals", "gen-2", "医学", None))
+    with pytest.raises(CursorError, match="无效"):
+        page_start("not a cursor", key)
+
+
+def test_budget_defaults():
+    assert ResponseBudget.of() == ResponseBudget(None, 20000)
+    assert ResponseBudget.of(0, 0) == ResponseBudget(None, None)
+    assert ResponseBudget.of(5, -1) == ResponseBudget(5, None)
+
+
+@pytest.fixture
+def database(synthetic_db, tmp_path, monkeypatch):
+    """服务器使用可修改的合成数据库副本"""
+    path = str(tmp_path / "jcr.db")
+    shutil.copyfile(synthetic_db, path)
+    monkeypatch.setattr(server, "db", JCRDatabase(path, data_dir=None))
+    return path
+
+
+def search(**kwargs):
+    return asyncio.run(server.search_journal("journal", output_format="compact", **kwargs))
+
+
+def data_rows(output):
+    lines = output.splitlines()
+    return [line for line in lines[2:] if not line.startswith("#")], lines[-1]
+
+
+def test_tool_pages_match_unpaged_result(database):
+    expected, _ = data_rows(search(max_chars=0))
+    rows, cursor = [], None
+    while True:
+        page, summary = data_rows(search(max_items=5, max_chars=0, cursor=cursor))
+        rows.extend(page)
+        if "next_cursor=" not in summary:
+            break
+        cursor = summary.split("next_cursor=")[1]
+    assert rows == expected
+    assert len(expected) > 5
+
+
+def test_cursor_expires_when_database_changes(database):
+    _, summary = data_rows(search(max_items=2))
+    cursor = summary.split("next_cursor=")[1]
+    assert data_rows(search(max_items=2, cursor=cursor))[0]
+
+    conn = sqlite3.connect(database)
+    conn.execute("INSERT INTO GJQKYJMD2025 (Journal) VALUES ('Journal of Late Additions')")
+    conn.commit()
+    conn.close()
+    assert "已失效" in search(max_items=2, cursor=cursor)
@@ -0,0 +1,101 @@
+"""
+指标宽表合并JCR与中科院年度数据；组合查询引擎：条件解析、按选择性选择驱动索引（INDEXED BY），以及排序值大量相同时键集分页不重不漏
+"""
+
+import sqlite3
+
+import pytest
+
+from jcr_query import JournalQueryEngine, QueryError, parse_predicates
+
+YEAR = "2025"
+
+
+@pytest.fixture
+def engine(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    yield JournalQueryEngine(conn)
+    conn.close()
+
+
+def walk_pages(engine, where, order_by, descending, limit):
+    """沿游标逐页查询，返回各页的(rowid, 序号起点)"""
+    pages = []
+    cursor = None
+    while True:
+        plan = engine.plan(YEAR, parse_predicates(where), order_by=order_by, descending=descending,
+                           limit=limit, cursor=cursor)
+        rows, cursor = engine.execute(plan)
+        pages.append(([row["rowid"] for row in rows], plan.start))
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("order_by,descending", [("partition", True), ("partition", False), ("quartile", True)])
+def test_keyset_pages_have_no_duplicates_or_gaps_on_ties(engine, order_by, descending):
+    # 分区只有1-4四个取值，每页都落在大量相同排序值中间
+    where = "category~医学"
+    full = engine.plan(YEAR, parse_predicates(where), order_by=order_by, descending=descending, limit=100_000)
+    expected = [row["rowid"] for row in engine.execute(full)[0]]
+    assert len(expected) > 20
+
+    pages = walk_pages(engine, where, order_by, descending, limit=7)
+    walked = [rowid for rowids, _ in pages for rowid in rowids]
+    assert walked == expected
+    # 游标中的序号位置与已返回的行数一致
+    position = 0
+    for rowids, start in pages:
+        assert start == position
+        position += len(rowids)
+
+
+def test_offset_and_cursor_agree(engine):
+    first = engine.plan(YEAR, [], order_by="if", limit=10)
+    rows, cursor = engine.execute(first)
+    by_cursor = engine.execute(engine.plan(YEAR, [], order_by="if", limit=10, cursor=cursor))[0]
+    by_offset = engine.execute(engine.plan(YEAR, [], order_by="if", limit=10, offset=10))[0]
+    assert [row["rowid"] for row in by_cursor] == [row["rowid"] for row in by_offset]
+
+
+def test_selective_predicate_drives_index(engine):
+    plan = engine.plan(YEAR, parse_predicates("journal=Nature AND warned=0"), order_by="if")
+    assert plan.driving_index == "idx_journal_metrics_title_key"
+    # 选择性最高的条件排在最前
+    assert plan.predicates[0].name == "journal"
+    assert "INDEXED BY idx_journal_metrics_title_key" in plan.sql
+    rows, _ = engine.execute(plan)
+    assert [row["journal"] for row in rows] == ["Nature"]
+
+
+def test_unselective_predicate_falls_back_to_order_index(engine):
+    plan = engine.plan(YEAR, parse_predicates("warned=0"), order_by="if")
+    assert plan.driving_index == "idx_journal_metrics_jcr_if"
+    assert any("idx_journal_metrics_jcr_if" in line for line in engine.explain(plan))
+
+
+def test_parse_keeps_separators_inside_values():
+    predicates = parse_predicates('category~Science and Technology AND if>=2.5 & jcr_category~"R&D"')
+    assert [(p.name, p.op, p.value) for p in predicates] == [
+        ("category", "~", "Science and Technology"), ("if", ">=", 2.5), ("jcr_category", "~", "R&D")]
+
+
+@pytest.mark.parametrize("where", ["unknown=1", "if>abc", "partition=5区", "if>"])
+def test_invalid_conditions_raise_query_error(where):
+    with pytest.raises(QueryError):
+        parse_predicates(where)
+
+
+def test_invalid_cursor_raises_query_error(engine):
+    with pytest.raises(QueryError):
+        engine.plan(YEAR, [], cursor="not-a-cursor")
+
+
+def test_journal_metrics_merges_latest_jcr_and_cas_editions(engine):
+    conn = engine.conn
+    row = conn.execute("SELECT jcr_year, jcr_if, jcr_if_change, cas_partition FROM journal_metrics "
+                       "WHERE title_key = 'nature' AND year = ?", (YEAR,)).fetchone()
+    # 2025年没有JCR年度表，取不晚于2025的最新一年（2024），变化量相对2023
+    if_2024 = conn.execute('SELECT "IF(2024)" FROM JCR2024 WHERE Journal = ?', ("Nature",)).fetchone()[0]
+    if_2023 = conn.execute('SELECT "IF(2023)" FROM JCR2023 WHERE Journal = ?', ("Nature",)).fetchone()[0]
+    partition = conn.execute("SELECT 大类分区 FROM FQBJCR2025 WHERE Journal = ?", ("Nature",)).fetchone()[0]
+    assert row == ("2024", if_2024, round(if_2024 - if_2023, 3), int(partition[0]))
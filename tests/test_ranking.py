@@ -0,0 +1,88 @@
+"""
+学科内Top-K排名：堆选择的顺序、并列值的百分位（同 PERCENT_RANK）、越小越好的指标与预警过滤
+"""
+
+import sqlite3
+
+import pytest
+
+from jcr_query import QueryError, RankingStore
+
+
+def make_store(rows):
+    """rows: [(期刊, 大类, 影响因子, 排名, 学科总数, 预警)]"""
+    names = ["journal", "cas_category", "jcr_if", "jcr_rank", "jcr_rank_total", "warned"]
+    columns = {name: [row[i] for row in rows] for i, name in enumerate(names)}
+    columns["jcr_category"] = [None] * len(rows)
+    columns["jcr_if_change"] = [None] * len(rows)
+    columns["jcr_quartile"] = [None] * len(rows)
+    columns["cas_partition"] = [None] * len(rows)
+    columns["rank"] = [rank / total if rank and total else None
+                       for rank, total in zip(columns["jcr_rank"], columns["jcr_rank_total"])]
+    columns["if"] = columns["jcr_if"]
+    columns["if_change"] = columns["jcr_if_change"]
+    return RankingStore("2025", columns)
+
+
+@pytest.fixture
+def store():
+    return make_store([
+        ("A1", "医学", 1.0, 40, 100, 0),
+        ("A2", "医学", 2.0, 20, 100, 0),
+        ("A3", "医学", 2.0, 20, 100, 0),
+        ("A4", "医学", 4.0, 5, 100, 1),
+        ("B1", "化学", 3.0, 10, 50, 0),
+        ("C1", "数学", None, None, None, 0),
+    ])
+
+
+def test_top_k_orders_and_ranks_with_ties(store):
+    ranking = store.top_k("if", k=3)
+    medicine = ranking["医学"]
+    assert [entry["journal"] for entry in medicine] == ["A4", "A2", "A3"]
+    assert [entry["percentile"] for entry in medicine] == [100.0, 33.3, 33.3]
+    assert medicine[0]["category_size"] == 4
+    # 学科只有一个期刊时百分位为100；无指标值的期刊不参与排名
+    assert ranking["化学"][0]["percentile"] == 100.0
+    assert "数学" not in ranking
+
+
+def test_lower_is_better_metric(store):
+    medicine = store.top_k("rank", k=4)["医学"]
+    assert [entry["journal"] for entry in medicine][0] == "A4"
+    assert medicine[0]["percentile"] == 100.0
+    assert medicine[-1]["journal"] == "A1"
+    assert medicine[-1]["percentile"] == 0.0
+
+
+def test_exclude_warned_keeps_category_size(store):
+    medicine = store.top_k("if", k=10, exclude_warned=True, category="医")["医学"]
+    assert [entry["journal"] for entry in medicine] == ["A2", "A3", "A1"]
+    assert medicine[0]["category_size"] == 4
+    assert list(store.top_k("if", category="医")) == ["医学"]
+
+
+@pytest.mark.parametrize("kwargs", [{"metric": "citations"}, {"group_by": "publisher"}])
+def test_invalid_metric_or_group(store, kwargs):
+    with pytest.raises(QueryError):
+        store.top_k(**kwargs)
+
+
+def test_percentiles_match_sqlite_percent_rank(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    try:
+        store = RankingStore.load(conn, "2025")
+        expected = dict(conn.execute("""
+            SELECT journal, ROUND(PERCENT_RANK() OVER (PARTITION BY cas_category ORDER BY jcr_if) * 100, 1)
+            FROM journal_metrics WHERE year = '2025' AND cas_category IS NOT NULL AND jcr_if IS NOT NULL
+        """))
+    finally:
+        conn.close()
+
+    ranking = store.top_k("if", k=5)
+    assert ranking
+    for entries in ranking.values():
+        values = [entry["value"] for entry in entries]
+        assert values == sorted(values, reverse=True)
+        for entry in entries:
+            assert entry["percentile"] == expected[entry["journal"]]
@@ -0,0 +1,39 @@
+"""
+资源URI中的期刊标识解析：期刊ID、刊名与ISSN（含不带连字符的写法）
+"""
+
+import sqlite3
+
+import pytest
+
+from jcr_mcp_server import JCRDatabase
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "jcr.db"
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE JCR2024 (Journal TEXT, ISSN TEXT, eISSN TEXT, "IF(2024)" REAL)')
+    conn.executemany("INSERT INTO JCR2024 VALUES (?, ?, ?, ?)", [
+        ("Nature", "0028-0836", "1476-4687", 50.5),
+        ("Science", "0036-8075", "1095-9203", 44.7),
+    ])
+    conn.commit()
+    conn.close()
+    return JCRDatabase(str(path), data_dir=None)
+
+
+def test_issn_without_hyphen_is_not_taken_as_row_id(database):
+    nature = database.alias_index.resolve("Nature")
+    assert database.resolve_journal_id("00280836") == nature
+    assert database.resolve_journal_id("0028-0836") == nature
+    assert database.resolve_journal_id("14764687") == nature
+
+
+def test_names_and_row_ids_still_resolve(database):
+    science = database.alias_index.resolve("Science")
+    assert database.resolve_journal_id("science") == science
+    assert database.resolve_journal_id(str(science)) == science
+    # 未收录的8位数字仍按期刊ID处理
+    assert database.resolve_journal_id("12345678") == 12345678
+    assert database.resolve_journal_id("Unknown Journal") is None
@@ -0,0 +1,82 @@
+"""
+准入调度：排队中的调用在名额释放的同一轮事件循环中被取消时，不能让释放方出错或泄漏名额
+"""
+
+import asyncio
+
+import pytest
+
+from jcr_runtime import AdmissionScheduler, CostClass
+
+
+def make_scheduler(capacity: int = 1) -> AdmissionScheduler:
+    return AdmissionScheduler(capacity, [CostClass("standard", priority=1, limit=capacity, max_queue=10)])
+
+
+async def hold(scheduler: AdmissionScheduler, client: str, entered: list):
+    async with scheduler.slot("standard", client):
+        entered.append(client)
+
+
+def test_cancel_while_dispatching_does_not_leak_slot():
+    async def scenario():
+        scheduler = make_scheduler()
+        entered = []
+        async with scheduler.slot("standard", "a"):
+            waiter = asyncio.create_task(hold(scheduler, "b", entered))
+            await asyncio.sleep(0)
+            assert scheduler.stats()["classes"]["standard"]["queued"] == 1
+            # 取消排队者后立即释放名额：_dispatch 在 _withdraw 执行前看到已取消的等待者
+            waiter.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert entered == []
+        assert scheduler.running == 0
+        assert scheduler.stats()["classes"]["standard"]["queued"] == 0
+
+        # 名额没有泄漏，后续调用可以立即执行
+        await asyncio.wait_for(hold(scheduler, "c", entered), 1)
+        assert entered == ["c"]
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_passes_slot_to_next_in_queue():
+    async def scenario():
+        scheduler = make_scheduler()
+        entered = []
+        async with scheduler.slot("standard", "a"):
+            cancelled = asyncio.create_task(hold(scheduler, "b", entered))
+            queued = asyncio.create_task(hold(scheduler, "c", entered))
+            await asyncio.sleep(0)
+            assert scheduler.stats()["classes"]["standard"]["queued"] == 2
+            cancelled.cancel()
+
+        await asyncio.wait_for(queued, 1)
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert entered == ["c"]
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancel_after_admission_returns_slot():
+    async def scenario():
+        scheduler = make_scheduler()
+        entered = []
+        async with scheduler.slot("standard", "a"):
+            waiter = asyncio.create_task(hold(scheduler, "b", entered))
+            await asyncio.sleep(0)
+        # 名额已分配给 b，但 b 在恢复执行前被取消，名额应归还
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.running == 0
+
+        await asyncio.wait_for(hold(scheduler, "c", entered), 1)
+        assert entered == ["c"]
+
+    asyncio.run(scenario())
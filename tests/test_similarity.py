@@ -0,0 +1,83 @@
+"""
+相似期刊推荐：特征表构建、与逐行计算一致的加权距离、近邻排序与预警/同学科筛选
+"""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from jcr_index import normalize_title
+from jcr_query import CATEGORY_WEIGHTS, SimilarityIndex
+
+
+@pytest.fixture(scope="module")
+def index(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    try:
+        return SimilarityIndex.load(conn)
+    finally:
+        conn.close()
+
+
+def test_one_row_per_journal(index, synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    try:
+        journals = conn.execute("SELECT COUNT(DISTINCT title_key) FROM journal_metrics").fetchone()[0]
+    finally:
+        conn.close()
+    assert len(index) == journals
+    assert index.matrix.shape[0] == journals and index.matrix.dtype == np.float32
+    # 缺失值以中位数填充后，特征矩阵中没有NaN
+    assert not np.isnan(index.matrix).any()
+
+
+def test_distances_match_row_by_row(index):
+    row = index.position(normalize_title("Nature"))
+    distances = index.distances(row)
+    for other in (0, 7, len(index) - 1):
+        squared = float(np.square(index.matrix[other] - index.matrix[row]).sum())
+        for name, weight in CATEGORY_WEIGHTS.items():
+            codes = index.codes[name]
+            if codes[other] != codes[row] or codes[row] < 0:
+                squared += weight
+        assert distances[other] == pytest.approx(np.sqrt(squared), rel=1e-5)
+
+
+def test_neighbors_are_sorted_and_filtered(index):
+    row = index.position(normalize_title("Nature"))
+    neighbors = index.neighbors(row, k=10)
+    assert len(neighbors) == 10
+    assert row not in [i for i, _ in neighbors]
+    assert [d for _, d in neighbors] == sorted(d for _, d in neighbors)
+    assert not any(index.columns["warned"][i] for i, _ in neighbors)
+
+    # 近邻确实是全部候选中距离最小的K个
+    distances = index.distances(row)
+    candidates = [i for i in range(len(index)) if i != row and not index.columns["warned"][i]]
+    nearest = sorted(distances[i] for i in candidates)[:10]
+    assert [d for _, d in neighbors] == pytest.approx(nearest)
+
+    same = index.neighbors(row, k=5, same_category=True)
+    codes = index.codes["cas_category"]
+    assert all(codes[i] == codes[row] for i, _ in same)
+
+
+def test_record_and_unknown_journal(index):
+    row = index.position(normalize_title("Nature"))
+    record = index.record(row, distance=1.0)
+    assert record["journal"] == "Nature"
+    assert record["similarity"] == 0.5
+    assert index.position("no such journal") is None
+    # K超过期刊数时返回除自身外的全部期刊
+    assert len(index.neighbors(row, k=len(index) * 2, exclude_warned=False)) == len(index) - 1
+
+
+def test_empty_feature_table(tmp_path):
+    conn = sqlite3.connect(tmp_path / "jcr.db")
+    try:
+        index = SimilarityIndex.load(conn)
+    finally:
+        conn.close()
+    assert len(index) == 0
+    assert index.matrix.shape[0] == 0
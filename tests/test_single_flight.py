@@ -0,0 +1,90 @@
+"""
+相同搜索的并发合并：N 个并发的相同调用只访问一次数据库，不同查询不共享结果
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from jcr_mcp_server import JCRDatabase
+
+CONCURRENT_CALLS = 8
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "jcr.db"
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE JCR2024 (Journal TEXT, "IF(2024)" REAL, "IF Quartile(2024)" TEXT)')
+    conn.executemany("INSERT INTO JCR2024 VALUES (?, ?, ?)", [
+        ("Nature", 50.5, "Q1"),
+        ("Journal of A & B", 3.2, "Q2"),
+        ("Journal of A and B", 1.1, "Q3"),
+    ])
+    conn.commit()
+    conn.close()
+
+    db = JCRDatabase(str(path), data_dir=None)
+    # 预先构建别名索引，计数只统计搜索本身
+    db.alias_index
+    return db
+
+
+def count_searches(db: JCRDatabase) -> list:
+    """包装同步搜索（每次调用都会查询SQLite），记录调用次数并放慢执行让并发调用重叠"""
+    calls = []
+    lock = threading.Lock()
+    search = db.search_journal
+
+    def counted(*args, **kwargs):
+        with lock:
+            calls.append(args[0])
+        time.sleep(0.2)
+        return search(*args, **kwargs)
+
+    db.search_journal = counted
+    return calls
+
+
+def test_identical_concurrent_searches_hit_sqlite_once(database):
+    calls = count_searches(database)
+
+    async def run():
+        return await asyncio.gather(*(database.search_journal_async("nature", seconds=None)
+                                      for _ in range(CONCURRENT_CALLS)))
+
+    results = asyncio.run(run())
+    assert calls == ["nature"]
+    assert all(result == results[0] for result in results)
+    assert [info.journal_name for info in results[0][0]] == ["Nature"]
+    stats = database.single_flight.stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == CONCURRENT_CALLS - 1
+
+
+def test_case_variants_share_one_search(database):
+    calls = count_searches(database)
+
+    async def run():
+        return await asyncio.gather(database.search_journal_async("Nature", seconds=None),
+                                    database.search_journal_async("NATURE", seconds=None))
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert first == second
+
+
+def test_distinct_queries_are_not_coalesced(database):
+    calls = count_searches(database)
+
+    async def run():
+        return await asyncio.gather(database.search_journal_async("A & B", seconds=None),
+                                    database.search_journal_async("A and B", seconds=None))
+
+    ampersand, spelled = asyncio.run(run())
+    assert sorted(calls) == ["A & B", "A and B"]
+    assert [info.journal_name for info in ampersand[0]] == ["Journal of A & B"]
+    assert [info.journal_name for info in spelled[0]] == ["Journal of A and B"]
@@ -0,0 +1,94 @@
+"""
+分库存储：按内容哈希增量导入、ATTACH上限分组，以及分库模式下查询结果与单文件一致
+"""
+
+import shutil
+import sqlite3
+from dataclasses import asdict
+
+import pytest
+
+from jcr_mcp_server import JCRDatabase
+from jcr_storage import ATTACH_LIMIT, ShardedStore, shard_key
+
+
+@pytest.fixture
+def store(synthetic_db, tmp_path):
+    store = ShardedStore(str(tmp_path / "data"))
+    store.import_database(synthetic_db)
+    return store
+
+
+def source_tables(path):
+    conn = sqlite3.connect(path)
+    try:
+        names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    finally:
+        conn.close()
+    return sorted(name for name in names if shard_key(name))
+
+
+def test_shard_key():
+    assert shard_key("FQBJCR2025") == ("FQBJCR", "2025")
+    assert shard_key("journal_metrics") is None
+    assert shard_key("JCR24") is None
+
+
+def test_import_only_rewrites_changed_tables(synthetic_db, store, tmp_path):
+    tables = source_tables(synthetic_db)
+    assert store.tables() == tables
+    assert store.tables("GJQKYJMD", "2024") == ["GJQKYJMD2024"]
+    generation = store.generation()
+
+    source = str(tmp_path / "jcr.db")
+    shutil.copyfile(synthetic_db, source)
+    assert set(store.import_database(source).values()) == {"unchanged"}
+
+    conn = sqlite3.connect(source)
+    conn.execute("UPDATE JCR2024 SET Journal = Journal || ' ' WHERE rowid = 1")
+    conn.execute("DROP TABLE CCFT2022")
+    conn.commit()
+    conn.close()
+    changes = store.import_database(source)
+    assert changes["JCR2024"] == "updated"
+    assert changes["CCFT2022"] == "removed"
+    assert {change for table, change in changes.items() if table not in ("JCR2024", "CCFT2022")} == {"unchanged"}
+    assert not (store.data_dir / "CCFT2022.db").exists()
+    assert "CCFT2022" not in store.tables()
+    assert store.generation() != generation
+
+
+def test_route_groups_by_attach_limit(store):
+    tables = store.tables()
+    groups = store.route(tables + ["NOTSTORED2020"], limit=3)
+    assert [table for group in groups for table in group] == tables
+    assert all(len(group) <= 3 for group in groups)
+    assert len(groups) == -(-len(tables) // 3)
+    # 没有需要访问的分库时仍返回一组，只查询派生表
+    assert store.route([]) == [[]]
+
+
+def test_connect_attaches_requested_shards(store):
+    conn = store.connect(["JCR2024", "journal_metrics"])
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM JCR2024").fetchone()[0] > 0
+        assert conn.execute("SELECT COUNT(*) FROM journal_metrics").fetchone()[0] > 0
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("SELECT COUNT(*) FROM JCR2023")
+    finally:
+        conn.close()
+    # 超过ATTACH上限的分库数必须先经 route() 分组
+    assert len(store.tables()) > ATTACH_LIMIT
+    with pytest.raises(ValueError):
+        store.connect(store.tables())
+
+
+def test_sharded_queries_match_single_file(synthetic_db, store):
+    single = JCRDatabase(synthetic_db, data_dir=None)
+    sharded = JCRDatabase(data_dir=str(store.data_dir))
+    # 分库按表名顺序访问，比较时忽略结果顺序
+    for name, year in (("Nature", None), ("Cell", "2024"), ("journal", None)):
+        expected = sorted((asdict(info) for info in single.search_journal(name, year)), key=repr)
+        assert sorted((asdict(info) for info in sharded.search_journal(name, year)), key=repr) == expected
+        assert expected
+    assert sharded.table_names("FQBJCR") == single.table_names("FQBJCR")
@@ -0,0 +1,73 @@
+"""
+刊名前缀补全：二分定位前缀区间、按词前缀跳词匹配、完全匹配优先、同一期刊的多个写法只返回一次
+"""
+
+import sqlite3
+
+import pytest
+
+from jcr_index import AliasIndex, TitleSuggester, load_latest_profiles, normalize_title
+
+JOURNALS = {
+    1: ("Nature", 10.0),
+    2: ("Nature Communications", 20.0),
+    3: ("Nature Reviews Cancer", None),
+    4: ("IEEE Transactions on Pattern Analysis and Machine Intelligence", 23.6),
+    5: ("IEEE Transactions on Power Systems", 6.6),
+    6: ("Natural Hazards", 3.1),
+}
+
+
+@pytest.fixture
+def suggester():
+    entries = [(normalize_title(title), journal_id) for journal_id, (title, _) in JOURNALS.items()]
+    # 缩写与其他写法指向同一期刊
+    entries += [("ieee tpami", 4), ("nature comms", 2)]
+    canonical = {journal_id: title for journal_id, (title, _) in JOURNALS.items()}
+    scores = {journal_id: score for journal_id, (_, score) in JOURNALS.items() if score is not None}
+    return TitleSuggester(entries, canonical, scores)
+
+
+def names(results):
+    return [title for _, title, _ in results]
+
+
+def test_prefix_ranks_by_impact_factor(suggester):
+    # 无影响因子的期刊排在最后
+    assert names(suggester.suggest("Nat")) == [
+        "Nature Communications", "Nature", "Natural Hazards", "Nature Reviews Cancer"]
+    assert names(suggester.suggest("nat", limit=2)) == ["Nature Communications", "Nature"]
+
+
+def test_exact_match_comes_first(suggester):
+    assert names(suggester.suggest("nature"))[0] == "Nature"
+
+
+def test_each_journal_is_returned_once(suggester):
+    results = suggester.suggest("nature comm")
+    assert results == [(2, "Nature Communications", 20.0)]
+
+
+def test_word_prefixes_may_skip_words_but_keep_order(suggester):
+    assert names(suggester.suggest("IEEE Trans Pat")) == [
+        "IEEE Transactions on Pattern Analysis and Machine Intelligence"]
+    assert names(suggester.suggest("ieee tpa")) == ["IEEE Transactions on Pattern Analysis and Machine Intelligence"]
+    assert suggester.suggest("ieee pat trans") == []
+
+
+@pytest.mark.parametrize("prefix,limit", [("", 10), ("  ", 10), ("nature", 0), ("zzz", 10)])
+def test_empty_results(suggester, prefix, limit):
+    assert suggester.suggest(prefix, limit) == []
+
+
+def test_build_uses_latest_impact_factor(synthetic_db):
+    conn = sqlite3.connect(synthetic_db)
+    try:
+        aliases = AliasIndex.load(conn)
+        profiles = load_latest_profiles(conn)
+    finally:
+        conn.close()
+    suggester = TitleSuggester.build(aliases, profiles)
+    journal_id, title, score = suggester.suggest("nature")[0]
+    assert (journal_id, title) == (aliases.resolve("Nature"), "Nature")
+    assert score == profiles["nature"]["jcr_if"]
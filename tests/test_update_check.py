@@ -0,0 +1,114 @@
+"""
+远程更新检测：同步元数据表的原地升级、带ETag/Last-Modified的条件下载，以及远程状态的TTL缓存
+"""
+
+import asyncio
+import sqlite3
+
+import httpx
+
+from data_sync import DataSyncer
+from jcr_http import HttpClient
+from jcr_index import (
+    SYNC_METADATA_COLUMNS, ensure_sync_metadata, read_sync_metadata, table_columns, write_sync_metadata
+)
+from jcr_runtime import CachedValue
+
+URL = "https://example.test/JCR2024.csv"
+LAST_MODIFIED = "Mon, 06 Oct 2025 08:00:00 GMT"
+
+
+def test_sync_metadata_upgrades_old_table_in_place(tmp_path):
+    conn = sqlite3.connect(tmp_path / "jcr.db")
+    try:
+        conn.execute("CREATE TABLE sync_metadata (table_name TEXT PRIMARY KEY, last_updated TEXT, "
+                     "record_count INTEGER, file_hash TEXT)")
+        conn.execute("INSERT INTO sync_metadata VALUES ('JCR2023', '2025-01-01', 10, 'abc')")
+        ensure_sync_metadata(conn)
+        assert table_columns(conn, "sync_metadata") == list(SYNC_METADATA_COLUMNS)
+
+        write_sync_metadata(conn, "JCR2024", 20, "def", etag='"v1"', last_modified=LAST_MODIFIED, source_url=URL)
+        records = read_sync_metadata(conn)
+    finally:
+        conn.close()
+    assert records["JCR2023"]["record_count"] == 10
+    assert records["JCR2023"]["etag"] is None
+    assert (records["JCR2024"]["etag"], records["JCR2024"]["last_modified"]) == ('"v1"', LAST_MODIFIED)
+
+
+def make_syncer(tmp_path, requests):
+    def handler(request):
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"Journal\nNature\n",
+                              headers={"ETag": '"v2"', "Last-Modified": LAST_MODIFIED})
+
+    client = HttpClient(transport=httpx.MockTransport(handler), backoff=0.0)
+    return DataSyncer(str(tmp_path / "jcr.db"), http=client), client
+
+
+def download(syncer, client, path, validators):
+    async def run():
+        async with client.hold():
+            return await syncer.download_file(URL, str(path), validators)
+
+    return asyncio.run(run())
+
+
+def test_unchanged_remote_is_not_downloaded(tmp_path):
+    requests = []
+    syncer, client = make_syncer(tmp_path, requests)
+    path = tmp_path / "JCR2024.csv"
+
+    result = download(syncer, client, path, {"etag": '"v1"', "last_modified": LAST_MODIFIED})
+
+    assert result == {"not_modified": True, "etag": '"v1"', "last_modified": LAST_MODIFIED}
+    assert requests[0].headers["if-none-match"] == '"v1"'
+    assert requests[0].headers["if-modified-since"] == LAST_MODIFIED
+    assert not path.exists()
+
+
+def test_changed_remote_returns_new_validators(tmp_path):
+    requests = []
+    syncer, client = make_syncer(tmp_path, requests)
+    path = tmp_path / "JCR2024.csv"
+
+    result = download(syncer, client, path, {"etag": '"v0"'})
+
+    assert result == {"not_modified": False, "etag": '"v2"', "last_modified": LAST_MODIFIED}
+    assert path.read_bytes() == b"Journal\nNature\n"
+    # 没有记录时发送普通请求
+    download(syncer, client, path, None)
+    assert "if-none-match" not in requests[-1].headers
+
+
+def test_cached_value_merges_refreshes_and_keeps_value_on_error():
+    calls = []
+
+    async def probe():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if len(calls) == 2:
+            raise RuntimeError("unreachable")
+        return len(calls)
+
+    cached = CachedValue(probe, ttl=60)
+
+    async def run():
+        # 并发的首次获取合并为一次请求，TTL内直接命中缓存
+        first = await asyncio.gather(*(cached.get() for _ in range(5)))
+        assert first == [1] * 5
+        assert await cached.get() == 1
+        # 刷新失败时保留旧值
+        try:
+            await cached.get(refresh=True)
+        except RuntimeError:
+            pass
+        assert await cached.get() == 1
+        assert await cached.get(refresh=True) == 3
+
+    asyncio.run(run())
+    assert len(calls) == 3
+    assert cached.stats()["errors"] == 1
+    assert cached.stats()["hits"] == 2
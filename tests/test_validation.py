@@ -0,0 +1,73 @@
+"""
+数据完整性校验：表结构约定、影响因子取值范围、大表抽样与相邻年份延续性
+"""
+
+import shutil
+import sqlite3
+
+import pytest
+
+from data_sync import DataSyncer, check_table
+
+
+@pytest.fixture
+def database(synthetic_db, tmp_path):
+    """可修改的合成数据库副本"""
+    path = str(tmp_path / "jcr.db")
+    shutil.copyfile(synthetic_db, path)
+    return path
+
+
+def issues_by_table(validation):
+    issues = {}
+    for issue in validation["issues"]:
+        issues.setdefault(issue["table"], []).append(issue["issue"])
+    return issues
+
+
+def test_synthetic_database_passes(synthetic_db):
+    validation = DataSyncer(synthetic_db).validate_data_integrity()
+    assert validation["issues"] == []
+    assert validation["valid_tables"] == validation["total_tables"]
+    assert all(check["ok"] for check in validation["continuity"])
+    # 内部表不参与校验，派生表齐全时没有重建提示
+    assert "sync_metadata" not in validation["tables"]
+    assert validation["warnings"] == []
+
+
+def test_reports_contract_and_range_violations(database):
+    conn = sqlite3.connect(database)
+    conn.execute('UPDATE JCR2024 SET "IF(2024)" = -3 WHERE rowid % 10 = 0')
+    conn.execute('CREATE TABLE FQBJCR2026 ("Journal" TEXT)')
+    conn.execute("INSERT INTO FQBJCR2026 VALUES ('Nature')")
+    conn.execute('CREATE TABLE GJQKYJMD2026 ("Journal" TEXT, "预警原因" TEXT)')
+    conn.commit()
+    conn.close()
+
+    validation = DataSyncer(database).validate_data_integrity(workers=2)
+    issues = issues_by_table(validation)
+    assert any(issue.startswith("影响因子异常率") for issue in issues["JCR2024"])
+    assert issues["FQBJCR2026"] == ["缺少必需列: category, partition"]
+    assert issues["GJQKYJMD2026"] == ["无数据"]
+
+
+def test_reports_broken_continuity(database):
+    conn = sqlite3.connect(database)
+    conn.execute("UPDATE FQBJCR2025 SET Journal = 'Renamed ' || rowid")
+    conn.commit()
+    conn.close()
+
+    validation = DataSyncer(database).validate_data_integrity()
+    broken = [check for check in validation["continuity"] if not check["ok"]]
+    assert [(check["from"], check["to"]) for check in broken] == [("FQBJCR2023", "FQBJCR2025")]
+    assert any("重合度" in issue for issue in issues_by_table(validation)["FQBJCR2025"])
+
+
+def test_large_tables_are_sampled(synthetic_db):
+    full = check_table(synthetic_db, "JCR2024", sample_rows=0)
+    sampled = check_table(synthetic_db, "JCR2024", sample_rows=100)
+    assert not full["sampled"] and sampled["sampled"]
+    assert sampled["rows"] == full["rows"]
+    assert sampled["issues"] == full["issues"] == []
+    # 延续性检查总是使用完整的期刊名集合
+    assert sampled["title_keys"] == full["title_keys"]